@@ -1,18 +1,49 @@
+import os
+
 from flask import Flask, jsonify
 from flask_cors import CORS
 
 from api.routes.health import health_bp
+from api.routes.metrics import cache_metrics, metrics_bp
 from api.routes.scans import scans_bp
 from api.routes.servers import servers_bp
+from api.services.facets import ColumnSnapshot
+from api.services.mongo_client import get_ingest_generation, get_servers_collection
+from api.services.response_cache import IngestWatcher, ResponseCache
 
 
 def create_app() -> Flask:
     app = Flask(__name__)
-    app.config.from_mapping(JSON_SORT_KEYS=False)
+    app.config.from_mapping(
+        JSON_SORT_KEYS=False,
+        SERVER_LIST_CACHE_TTL_SECONDS=float(
+            os.getenv("SERVER_LIST_CACHE_TTL_SECONDS", "5")
+        ),
+        INGEST_WATCH_INTERVAL_SECONDS=float(
+            os.getenv("INGEST_WATCH_INTERVAL_SECONDS", "2")
+        ),
+        GZIP_MIN_BYTES=int(os.getenv("GZIP_MIN_BYTES", "1024")),
+        FACETS_REFRESH_SECONDS=float(os.getenv("FACETS_REFRESH_SECONDS", "10")),
+    )
+
+    CORS(app, expose_headers=["ETag"])
+
+    cache = ResponseCache(ttl_seconds=app.config["SERVER_LIST_CACHE_TTL_SECONDS"])
+    app.extensions["server_list_cache"] = cache
+    app.extensions["metrics_registry"] = cache_metrics(cache)
+    app.extensions["ingest_watcher"] = IngestWatcher(
+        cache,
+        get_ingest_generation,
+        interval_seconds=app.config["INGEST_WATCH_INTERVAL_SECONDS"],
+    )
 
-    CORS(app)
+    app.extensions["column_snapshot"] = ColumnSnapshot(
+        get_servers_collection,
+        refresh_seconds=app.config["FACETS_REFRESH_SECONDS"],
+    )
 
     app.register_blueprint(health_bp)
+    app.register_blueprint(metrics_bp)
     app.register_blueprint(servers_bp, url_prefix="/servers")
     app.register_blueprint(scans_bp, url_prefix="/scans")
 
@@ -1,12 +1,20 @@
 from __future__ import annotations
 
-from typing import Any, Dict, Iterable, List, Optional
+import csv
+import io
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
 
 try:
     from bson import ObjectId
 except Exception:  # pragma: no cover - bson may not be installed for tests
     ObjectId = None  # type: ignore
 
+try:
+    import orjson
+except Exception:  # pragma: no cover - fall back to the stdlib encoder
+    orjson = None  # type: ignore
+
 
 SUMMARY_FIELDS = [
     "host",
@@ -30,15 +38,67 @@ DETAIL_FIELDS = SUMMARY_FIELDS + [
     "favicon",
 ]
 
+EXPORT_FIELDS = list(dict.fromkeys(DETAIL_FIELDS))
+
+# change-tracking fields written by the scanner and the bot, not shown by clients
+INTERNAL_FIELDS = ["fingerprint", "updatedAt"]
+
+SUMMARY_PROJECTION = {field: 1 for field in SUMMARY_FIELDS}
+# the detail view renders every other field under "extra", so only the
+# change-tracking fields are left out
+DETAIL_PROJECTION = {field: 0 for field in INTERNAL_FIELDS}
+
 
-def _normalize_value(value: Any) -> Any:
+def _encode_default(value: Any) -> Any:
     if ObjectId is not None and isinstance(value, ObjectId):
         return str(value)
-    if isinstance(value, dict):
-        return {key: _normalize_value(val) for key, val in value.items()}
-    if isinstance(value, list):
-        return [_normalize_value(item) for item in value]
-    return value
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(payload: Any) -> bytes:
+    """Encodes a payload to JSON bytes, preferring orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_encode_default)
+    return json.dumps(payload, default=_encode_default, separators=(",", ":")).encode(
+        "utf-8"
+    )
+
+
+EXPORT_CHUNK_BYTES = 65536
+
+
+def iter_ndjson(rows: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    chunk = bytearray()
+    for row in rows:
+        chunk += dumps(row)
+        chunk += b"\n"
+        if len(chunk) >= EXPORT_CHUNK_BYTES:
+            yield bytes(chunk)
+            chunk.clear()
+    if chunk:
+        yield bytes(chunk)
+
+
+def iter_csv(rows: Iterable[Dict[str, Any]], fields: Sequence[str]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for row in rows:
+        writer.writerow(
+            [
+                (
+                    dumps(value).decode("utf-8")
+                    if isinstance(value, (dict, list))
+                    else ("" if value is None else value)
+                )
+                for value in (row.get(field) for field in fields)
+            ]
+        )
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
 
 
 def _resolve_host(document: Dict[str, Any]) -> Optional[str]:
@@ -81,10 +141,7 @@ def serialize_server_detail(document: Dict[str, Any]) -> Dict[str, Any]:
     )
 
     known_fields = set(DETAIL_FIELDS + ["_id", "extra"])
-    extra = {
-        key: _normalize_value(value)
-        for key, value in document.items()
-        if key not in known_fields
+    serialized["extra"] = {
+        key: value for key, value in document.items() if key not in known_fields
     }
-    serialized["extra"] = extra
     return serialized
@@ -0,0 +1,36 @@
+from flask import Blueprint, Response, current_app
+
+from metrics import CONTENT_TYPE, Counter, Gauge, Registry
+
+metrics_bp = Blueprint("metrics", __name__)
+
+# stat -> (kind, help); every value is read from the cache at scrape time
+CACHE_METRICS = {
+    "hits": (Counter, "Server list requests answered from the cache"),
+    "misses": (Counter, "Server list requests that loaded from Mongo"),
+    "coalesced": (Counter, "Server list requests that waited on another's load"),
+    "invalidations": (Counter, "Cache clears after the ingest marker moved"),
+    "not_modified": (Counter, "Server list requests answered with 304"),
+    "bytes_saved": (Counter, "Response bytes served without encoding them again"),
+    "gzip_bytes_saved": (Counter, "Response bytes saved by gzip"),
+    "entries": (Gauge, "Responses held in the cache"),
+    "hit_ratio": (Gauge, "Share of lookups answered without a load of their own"),
+}
+
+
+def cache_metrics(cache, registry: Registry = None) -> Registry:
+    """Exports the server list cache stats through a metrics Registry"""
+    registry = registry if registry is not None else Registry()
+    for stat, (kind, documentation) in CACHE_METRICS.items():
+        suffix = "_total" if kind is Counter else ""
+        metric = kind(
+            f"api_server_list_cache_{stat}{suffix}", documentation, registry=registry
+        )
+        metric.labels().set_function(lambda stat=stat: cache.snapshot()[stat])
+    return registry
+
+
+@metrics_bp.get("/metrics")
+def metrics():
+    registry = current_app.extensions["metrics_registry"]
+    return Response(registry.expose(), content_type=CONTENT_TYPE)
@@ -1,9 +1,28 @@
-from flask import Blueprint, jsonify, request
+import time
 
+from flask import (
+    Blueprint,
+    Response,
+    current_app,
+    jsonify,
+    request,
+    stream_with_context,
+)
+
+from api.models.server_serializers import (
+    EXPORT_FIELDS,
+    SUMMARY_FIELDS,
+    dumps,
+    iter_csv,
+    iter_ndjson,
+)
 from api.services.server_queries import (
+    EXPORT_BATCH_SIZE,
     get_server_detail,
+    get_server_history,
     get_server_list,
     get_servers_online_status,
+    iter_servers,
 )
 
 servers_bp = Blueprint("servers", __name__)
@@ -18,6 +37,36 @@ ALLOWED_SORT_FIELDS = {
 }
 ALLOWED_SORT_ORDERS = {"asc", "desc"}
 MAX_STATUS_HOSTS = 200
+HISTORY_DEFAULT_SECONDS = 7 * 86400
+HISTORY_MAX_SECONDS = 366 * 86400
+EXPORT_FORMATS = {"ndjson", "csv"}
+MIN_EXPORT_BATCH_SIZE = 100
+MAX_EXPORT_BATCH_SIZE = 10000
+
+
+def _json_response(payload, status: int = 200) -> Response:
+    return Response(dumps(payload), status=status, mimetype="application/json")
+
+
+def _cached_response(cache, cached) -> Response:
+    use_gzip = (
+        len(cached.body) >= current_app.config["GZIP_MIN_BYTES"]
+        and "gzip" in request.accept_encodings
+    )
+    etag = cached.gzip_etag if use_gzip else cached.etag
+    if etag in request.if_none_match:
+        cache.record("not_modified")
+        response = Response(status=304)
+    elif use_gzip:
+        body = cached.gzipped()
+        cache.record("gzip_bytes_saved", len(cached.body) - len(body))
+        response = Response(body, mimetype="application/json")
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = Response(cached.body, mimetype="application/json")
+    response.set_etag(etag)
+    response.vary.add("Accept-Encoding")
+    return response
 
 
 def _parse_int(value: str | None, default: int) -> int:
@@ -49,58 +98,121 @@ def _parse_optional_bool(value: str | None) -> bool | None:
     return None
 
 
-@servers_bp.get("")
-def list_servers():
-    query = request.args.get("q")
-    limit = _parse_int(request.args.get("limit"), 100)
-    offset = _parse_int(request.args.get("offset"), 0)
-    sort_field = request.args.get("sort") or "lastOnlinePlayers"
-    sort_order = request.args.get("order") or "desc"
+def _parse_filters() -> tuple[dict, str | None]:
     min_players = _parse_optional_int(request.args.get("minPlayers"))
     max_players = _parse_optional_int(request.args.get("maxPlayers"))
     last_online_after = _parse_optional_int(request.args.get("lastOnlineAfter"))
     last_online_before = _parse_optional_int(request.args.get("lastOnlineBefore"))
-    version = request.args.get("version") or None
-    server_type = request.args.get("serverType") or None
     whitelisted = _parse_optional_bool(request.args.get("whitelisted"))
     cracked = _parse_optional_bool(request.args.get("cracked"))
 
-    if sort_field not in ALLOWED_SORT_FIELDS:
-        return jsonify({"error": "Invalid sort field"}), 400
-    if sort_order not in ALLOWED_SORT_ORDERS:
-        return jsonify({"error": "Invalid sort order"}), 400
     if request.args.get("minPlayers") and min_players is None:
-        return jsonify({"error": "Invalid minPlayers value"}), 400
+        return {}, "Invalid minPlayers value"
     if request.args.get("maxPlayers") and max_players is None:
-        return jsonify({"error": "Invalid maxPlayers value"}), 400
+        return {}, "Invalid maxPlayers value"
     if request.args.get("lastOnlineAfter") and last_online_after is None:
-        return jsonify({"error": "Invalid lastOnlineAfter value"}), 400
+        return {}, "Invalid lastOnlineAfter value"
     if request.args.get("lastOnlineBefore") and last_online_before is None:
-        return jsonify({"error": "Invalid lastOnlineBefore value"}), 400
+        return {}, "Invalid lastOnlineBefore value"
     if request.args.get("whitelisted") and whitelisted is None:
-        return jsonify({"error": "Invalid whitelisted value"}), 400
+        return {}, "Invalid whitelisted value"
     if request.args.get("cracked") and cracked is None:
-        return jsonify({"error": "Invalid cracked value"}), 400
+        return {}, "Invalid cracked value"
+
+    return {
+        "query": request.args.get("q"),
+        "min_players": min_players,
+        "max_players": max_players,
+        "last_online_after": last_online_after,
+        "last_online_before": last_online_before,
+        "version": request.args.get("version") or None,
+        "server_type": request.args.get("serverType") or None,
+        "whitelisted": whitelisted,
+        "cracked": cracked,
+    }, None
+
+
+@servers_bp.get("")
+def list_servers():
+    limit = _parse_int(request.args.get("limit"), 100)
+    offset = _parse_int(request.args.get("offset"), 0)
+    sort_field = request.args.get("sort") or "lastOnlinePlayers"
+    sort_order = request.args.get("order") or "desc"
+
+    if sort_field not in ALLOWED_SORT_FIELDS:
+        return jsonify({"error": "Invalid sort field"}), 400
+    if sort_order not in ALLOWED_SORT_ORDERS:
+        return jsonify({"error": "Invalid sort order"}), 400
+    filters, error = _parse_filters()
+    if error:
+        return jsonify({"error": error}), 400
+    archived = _parse_optional_bool(request.args.get("archived"))
+    if request.args.get("archived") and archived is None:
+        return jsonify({"error": "Invalid archived value"}), 400
 
     limit = max(1, min(limit, 1000))
     offset = max(0, offset)
 
-    payload = get_server_list(
-        query=query,
-        limit=limit,
-        offset=offset,
-        sort_field=sort_field,
-        sort_order=sort_order,
-        min_players=min_players,
-        max_players=max_players,
-        last_online_after=last_online_after,
-        last_online_before=last_online_before,
-        version=version,
-        server_type=server_type,
-        whitelisted=whitelisted,
-        cracked=cracked,
+    params = {
+        "limit": limit,
+        "offset": offset,
+        "sort_field": sort_field,
+        "sort_order": sort_order,
+        "archived": bool(archived),
+        **filters,
+    }
+    current_app.extensions["ingest_watcher"].ensure_started()
+    cache = current_app.extensions["server_list_cache"]
+    cached = cache.get_or_load(
+        tuple(params.items()), lambda: dumps(get_server_list(**params))
+    )
+    return _cached_response(cache, cached)
+
+
+@servers_bp.get("/facets")
+def server_facets():
+    filters, error = _parse_filters()
+    if error:
+        return jsonify({"error": error}), 400
+    top = max(1, min(_parse_int(request.args.get("top"), 25), 200))
+    snapshot = current_app.extensions["column_snapshot"]
+    snapshot.refresh()
+    return _json_response(snapshot.facets(filters, top=top))
+
+
+@servers_bp.get("/export")
+def export_servers():
+    export_format = (request.args.get("format") or "ndjson").lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": "Invalid export format"}), 400
+    fields = [
+        field.strip()
+        for field in (request.args.get("fields") or "").split(",")
+        if field.strip()
+    ] or list(SUMMARY_FIELDS)
+    if any(field not in EXPORT_FIELDS for field in fields):
+        return jsonify({"error": "Invalid export field"}), 400
+    batch_size = max(
+        MIN_EXPORT_BATCH_SIZE,
+        min(
+            _parse_int(request.args.get("batchSize"), EXPORT_BATCH_SIZE),
+            MAX_EXPORT_BATCH_SIZE,
+        ),
+    )
+    filters, error = _parse_filters()
+    if error:
+        return jsonify({"error": error}), 400
+
+    rows = iter_servers(fields=fields, batch_size=batch_size, **filters)
+    if export_format == "csv":
+        body, mimetype = iter_csv(rows, fields), "text/csv"
+    else:
+        body, mimetype = iter_ndjson(rows), "application/x-ndjson"
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers["Content-Disposition"] = (
+        f"attachment; filename=servers.{export_format}"
     )
-    return jsonify(payload)
+    return response
 
 
 @servers_bp.post("/status")
@@ -114,13 +226,32 @@ def get_servers_status():
     ]
     if len(normalized_hosts) > MAX_STATUS_HOSTS:
         return jsonify({"error": "Too many hosts requested."}), 400
-    statuses = get_servers_online_status(normalized_hosts)
-    return jsonify({"statuses": statuses})
+    statuses, pending = get_servers_online_status(normalized_hosts)
+    return jsonify({"statuses": statuses, "pending": pending})
 
 
 @servers_bp.get("/<host>")
 def get_server(host: str):
-    detail = get_server_detail(host)
+    include_extra = _parse_optional_bool(request.args.get("extra")) or False
+    detail = get_server_detail(host, include_extra=include_extra)
     if detail is None:
         return jsonify({"error": "Not found"}), 404
-    return jsonify(detail)
+    return _json_response(detail)
+
+
+@servers_bp.get("/<host>/history")
+def get_history(host: str):
+    now = int(time.time())
+    end = _parse_optional_int(request.args.get("to"))
+    start = _parse_optional_int(request.args.get("from"))
+    if request.args.get("to") and end is None:
+        return jsonify({"error": "Invalid to value"}), 400
+    if request.args.get("from") and start is None:
+        return jsonify({"error": "Invalid from value"}), 400
+    end = now if end is None else end
+    start = end - HISTORY_DEFAULT_SECONDS if start is None else start
+    if start > end:
+        return jsonify({"error": "from must not be after to"}), 400
+    if end - start > HISTORY_MAX_SECONDS:
+        return jsonify({"error": "Range too large"}), 400
+    return _json_response(get_server_history(host, start, end))
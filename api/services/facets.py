@@ -0,0 +1,368 @@
+from __future__ import annotations
+
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+PLAYER_BUCKETS = [0, 1, 2, 6, 11, 21, 51, 101, 501]
+PLAYER_BUCKET_LABELS = [
+    "0",
+    "1",
+    "2-5",
+    "6-10",
+    "11-20",
+    "21-50",
+    "51-100",
+    "101-500",
+    "501+",
+]
+SNAPSHOT_FIELDS = {
+    "host": 1,
+    "hostname": 1,
+    "lastOnline": 1,
+    "updatedAt": 1,
+    "lastOnlinePlayers": 1,
+    "lastOnlineVersion": 1,
+    "serverType": 1,
+    "whitelisted": 1,
+    "cracked": 1,
+}
+DEFAULT_TOP_VALUES = 25
+
+
+class _Dictionary:
+    """Interns strings to dense integer codes, -1 standing for missing."""
+
+    def __init__(self) -> None:
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+    def copy(self) -> "_Dictionary":
+        copied = _Dictionary()
+        copied.values = list(self.values)
+        copied._codes = dict(self._codes)
+        return copied
+
+    def encode(self, value) -> int:
+        if value is None:
+            return -1
+        value = str(value)
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self._codes[value] = code
+            self.values.append(value)
+        return code
+
+    def matching_codes(self, pattern: str) -> np.ndarray:
+        regex = re.compile(pattern, re.IGNORECASE)
+        return np.array(
+            [code for code, value in enumerate(self.values) if regex.search(value)],
+            dtype=np.int32,
+        )
+
+
+def _tristate(value) -> int:
+    if value is None:
+        return -1
+    return 1 if value else 0
+
+
+class _Columns:
+    """One version of the snapshot.
+
+    A version is filled by a single refresh and never changed once it is
+    published, so a reader that took it sees arrays of one consistent size.
+    """
+
+    def __init__(self) -> None:
+        self.size = 0
+        self.rows: Dict[str, int] = {}
+        # hosts and hostnames share one dictionary, a query is matched once
+        # per distinct name rather than twice per row
+        self.names = _Dictionary()
+        self.versions = _Dictionary()
+        self.server_types = _Dictionary()
+        self.host = np.full(0, -1, dtype=np.int32)
+        self.hostname = np.full(0, -1, dtype=np.int32)
+        self.players = np.full(0, -1, dtype=np.int32)
+        self.last_online = np.zeros(0, dtype=np.float64)
+        self.version = np.full(0, -1, dtype=np.int32)
+        self.server_type = np.full(0, -1, dtype=np.int32)
+        self.whitelisted = np.full(0, -1, dtype=np.int8)
+        self.cracked = np.full(0, -1, dtype=np.int8)
+        self.watermark = 0.0
+
+    def copy(self) -> "_Columns":
+        copied = _Columns()
+        copied.size = self.size
+        copied.rows = dict(self.rows)
+        copied.names = self.names.copy()
+        copied.versions = self.versions.copy()
+        copied.server_types = self.server_types.copy()
+        copied.host = self.host.copy()
+        copied.hostname = self.hostname.copy()
+        copied.players = self.players.copy()
+        copied.last_online = self.last_online.copy()
+        copied.version = self.version.copy()
+        copied.server_type = self.server_type.copy()
+        copied.whitelisted = self.whitelisted.copy()
+        copied.cracked = self.cracked.copy()
+        copied.watermark = self.watermark
+        return copied
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self.players)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 1024)
+
+        def grow(array: np.ndarray, fill) -> np.ndarray:
+            grown = np.full(new_capacity, fill, dtype=array.dtype)
+            grown[:capacity] = array
+            return grown
+
+        self.host = grow(self.host, -1)
+        self.hostname = grow(self.hostname, -1)
+        self.players = grow(self.players, -1)
+        self.last_online = grow(self.last_online, 0)
+        self.version = grow(self.version, -1)
+        self.server_type = grow(self.server_type, -1)
+        self.whitelisted = grow(self.whitelisted, -1)
+        self.cracked = grow(self.cracked, -1)
+
+    def apply(self, document: dict) -> None:
+        host = document.get("host") or str(document.get("_id"))
+        row = self.rows.get(host)
+        if row is None:
+            row = self.size
+            self._grow(row + 1)
+            self.rows[host] = row
+            self.host[row] = self.names.encode(host)
+            self.size += 1
+        players = document.get("lastOnlinePlayers")
+        last_online = document.get("lastOnline") or 0
+        self.hostname[row] = self.names.encode(document.get("hostname") or None)
+        self.players[row] = players if isinstance(players, int) and players >= 0 else -1
+        self.last_online[row] = float(last_online)
+        self.version[row] = self.versions.encode(document.get("lastOnlineVersion"))
+        self.server_type[row] = self.server_types.encode(document.get("serverType"))
+        self.whitelisted[row] = _tristate(document.get("whitelisted"))
+        self.cracked[row] = _tristate(document.get("cracked"))
+        changed = max(float(last_online), float(document.get("updatedAt") or 0))
+        if changed > self.watermark:
+            self.watermark = changed
+
+
+class ColumnSnapshot:
+    """NumPy-backed copy of the summary fields used for facet counts.
+
+    Rows are keyed by host and updated incrementally from documents whose
+    lastOnline or updatedAt moved past the snapshot watermark; a periodic full
+    reload drops rows that were removed from the collection. Past the first
+    load, both run on a background thread: every refresh builds a new
+    _Columns there and swaps it in with one assignment, while requests keep
+    reading the version they took.
+    """
+
+    def __init__(
+        self,
+        collection_factory: Callable,
+        refresh_seconds: float = 10.0,
+        full_reload_seconds: float = 3600.0,
+        batch_size: int = 5000,
+    ) -> None:
+        self._collection_factory = collection_factory
+        self.refresh_seconds = refresh_seconds
+        self.full_reload_seconds = full_reload_seconds
+        self.batch_size = batch_size
+        self._refresh_lock = threading.Lock()
+        self._columns = _Columns()
+        self._reloader: Optional[threading.Thread] = None
+        self._reloader_lock = threading.Lock()
+        self.refreshed_at = 0.0
+        self.loaded_at = 0.0
+
+    @property
+    def size(self) -> int:
+        return self._columns.size
+
+    def refresh(self, force: bool = False) -> None:
+        """Starts a refresh when the snapshot is older than refresh_seconds.
+
+        Only the first load and a forced refresh run on the calling thread,
+        otherwise the caller is served the current version right away.
+        """
+        if not self.loaded_at:
+            with self._refresh_lock:
+                if not self.loaded_at:
+                    self._reload()
+            return
+        if force:
+            with self._refresh_lock:
+                self._refresh()
+            return
+        if time.time() - self.refreshed_at >= self.refresh_seconds:
+            self._start_refresh()
+
+    def _find(self, query: dict):
+        collection = self._collection_factory()
+        return collection.find(query, SNAPSHOT_FIELDS, batch_size=self.batch_size)
+
+    def _refresh(self) -> None:
+        """Builds and publishes the next version; the refresh lock is held."""
+        if time.time() - self.loaded_at >= self.full_reload_seconds:
+            self._reload()
+        else:
+            self._update()
+
+    def _update(self) -> None:
+        """Applies documents changed since the watermark to a copy."""
+        started = time.time()
+        columns = self._columns.copy()
+        watermark = columns.watermark
+        query = {
+            "$or": [
+                {"lastOnline": {"$gte": watermark}},
+                {"updatedAt": {"$gte": watermark}},
+            ]
+        }
+        for document in self._find(query):
+            columns.apply(document)
+        self._columns = columns
+        self.refreshed_at = started
+
+    def _reload(self) -> None:
+        """Loads every document into a fresh version."""
+        started = time.time()
+        columns = _Columns()
+        for document in self._find({}):
+            columns.apply(document)
+        # documents written while the cursor ran are picked up incrementally
+        columns.watermark = min(columns.watermark, started)
+        self._columns = columns
+        self.loaded_at = self.refreshed_at = started
+
+    def _start_refresh(self) -> None:
+        with self._reloader_lock:
+            if self._reloader is not None and self._reloader.is_alive():
+                return
+            self._reloader = threading.Thread(
+                target=self._refresh_in_background,
+                name="Facet snapshot refresh",
+                daemon=True,
+            )
+            self._reloader.start()
+
+    def _refresh_in_background(self) -> None:
+        with self._refresh_lock:
+            now = time.time()
+            try:
+                self._refresh()
+            except Exception:
+                # keep serving the old version, try again next interval
+                if now - self.loaded_at >= self.full_reload_seconds:
+                    self.loaded_at = now
+                self.refreshed_at = now
+
+    @staticmethod
+    def _masks(columns: _Columns, filters: dict) -> Dict[str, np.ndarray]:
+        size = columns.size
+        masks: Dict[str, np.ndarray] = {}
+        query = filters.get("query")
+        if query:
+            # /servers matches the query against hostname too
+            codes = columns.names.matching_codes(query)
+            masks["query"] = np.isin(columns.host[:size], codes) | np.isin(
+                columns.hostname[:size], codes
+            )
+        players = columns.players[:size]
+        min_players = filters.get("min_players")
+        max_players = filters.get("max_players")
+        if min_players is not None or max_players is not None:
+            mask = players >= 0
+            if min_players is not None:
+                mask &= players >= min_players
+            if max_players is not None:
+                mask &= players <= max_players
+            masks["players"] = mask
+        after = filters.get("last_online_after")
+        before = filters.get("last_online_before")
+        if after is not None or before is not None:
+            last_online = columns.last_online[:size]
+            mask = np.ones(size, dtype=bool)
+            if after is not None:
+                mask &= last_online >= after
+            if before is not None:
+                mask &= last_online <= before
+            masks["lastOnline"] = mask
+        if filters.get("version"):
+            codes = columns.versions.matching_codes(filters["version"])
+            masks["version"] = np.isin(columns.version[:size], codes)
+        if filters.get("server_type"):
+            codes = columns.server_types.matching_codes(filters["server_type"])
+            masks["serverType"] = np.isin(columns.server_type[:size], codes)
+        for name in ("whitelisted", "cracked"):
+            if filters.get(name) is not None:
+                masks[name] = getattr(columns, name)[:size] == int(filters[name])
+        return masks
+
+    @staticmethod
+    def _combine(masks: Dict[str, np.ndarray], size: int, skip: Optional[str] = None):
+        combined = np.ones(size, dtype=bool)
+        for name, mask in masks.items():
+            if name != skip:
+                combined &= mask
+        return combined
+
+    def facets(self, filters: dict, top: int = DEFAULT_TOP_VALUES) -> dict:
+        """Counts each facet over rows matching every filter except its own."""
+        columns = self._columns
+        size = columns.size
+        masks = self._masks(columns, filters)
+
+        def coded_counts(codes: np.ndarray, dictionary: _Dictionary, skip: str):
+            selected = codes[:size][self._combine(masks, size, skip)]
+            counts = np.bincount(
+                selected[selected >= 0], minlength=len(dictionary.values)
+            )
+            order = np.argsort(-counts, kind="stable")[:top]
+            return [
+                {"value": dictionary.values[code], "count": int(counts[code])}
+                for code in order
+                if counts[code] > 0
+            ]
+
+        def flag_counts(values: np.ndarray, skip: str):
+            selected = values[:size][self._combine(masks, size, skip)]
+            return {
+                "true": int(np.count_nonzero(selected == 1)),
+                "false": int(np.count_nonzero(selected == 0)),
+            }
+
+        players = columns.players[:size][self._combine(masks, size, "players")]
+        players = players[players >= 0]
+        bucket_counts = np.bincount(
+            np.searchsorted(PLAYER_BUCKETS, players, side="right") - 1,
+            minlength=len(PLAYER_BUCKETS),
+        )
+
+        return {
+            "total": int(np.count_nonzero(self._combine(masks, size))),
+            "facets": {
+                "version": coded_counts(columns.version, columns.versions, "version"),
+                "serverType": coded_counts(
+                    columns.server_type, columns.server_types, "serverType"
+                ),
+                "cracked": flag_counts(columns.cracked, "cracked"),
+                "whitelisted": flag_counts(columns.whitelisted, "whitelisted"),
+                "players": [
+                    {"bucket": label, "count": int(count)}
+                    for label, count in zip(PLAYER_BUCKET_LABELS, bucket_counts)
+                ],
+            },
+            "snapshotAgeSeconds": round(time.time() - self.refreshed_at, 1),
+        }
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 import os
-from typing import Optional
+import threading
+from typing import Dict, Optional
 
 from dotenv import load_dotenv
 from pymongo import MongoClient
@@ -10,6 +11,12 @@ from pymongo.server_api import ServerApi
 DEFAULT_MONGO_URL = "mongodb://mongo:27017/mc"
 DEFAULT_DB_NAME = "mc"
 DEFAULT_COLLECTION_NAME = "servers"
+# Shared with the scanner, which bumps the marker whenever ingest writes land.
+META_COLLECTION_NAME = "meta"
+INGEST_MARKER_ID = "ingest"
+
+_clients: Dict[str, MongoClient] = {}
+_clients_lock = threading.Lock()
 
 
 load_dotenv()
@@ -17,7 +24,14 @@ load_dotenv()
 
 def get_mongo_client(mongo_url: Optional[str] = None) -> MongoClient:
     url = mongo_url or os.getenv("MONGO_URL", DEFAULT_MONGO_URL)
-    return MongoClient(url, server_api=ServerApi("1"))
+    client = _clients.get(url)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(url)
+            if client is None:
+                client = MongoClient(url, server_api=ServerApi("1"))
+                _clients[url] = client
+    return client
 
 
 def get_servers_collection(
@@ -27,3 +41,12 @@ def get_servers_collection(
 ):
     client = get_mongo_client(mongo_url)
     return client[db_name][collection_name]
+
+
+def get_ingest_generation(mongo_url: Optional[str] = None) -> Optional[int]:
+    marker = get_servers_collection(
+        mongo_url, collection_name=META_COLLECTION_NAME
+    ).find_one({"_id": INGEST_MARKER_ID}, {"generation": 1})
+    if not marker:
+        return None
+    return marker.get("generation")
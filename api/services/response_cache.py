@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "created_at", "_gzipped")
+
+    def __init__(self, body: bytes) -> None:
+        self.body = body
+        self.etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+        self.created_at = time.time()
+        self._gzipped: Optional[bytes] = None
+
+    @property
+    def gzip_etag(self) -> str:
+        # The gzip body is a different representation and gets its own tag.
+        return self.etag + "-gz"
+
+    def gzipped(self) -> bytes:
+        # Compressed once per entry and shared by every hit that accepts gzip.
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.body, compresslevel=5)
+        return self._gzipped
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Optional[CachedResponse] = None
+        self.error: Optional[BaseException] = None
+
+
+class ResponseCache:
+    """Short-lived cache of encoded responses with single-flight loading.
+
+    Concurrent misses for the same key wait on the first caller's load
+    instead of issuing their own query.
+    """
+
+    def __init__(self, ttl_seconds: float = 5.0, max_entries: int = 256) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._generation = 0
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "invalidations": 0,
+            "not_modified": 0,
+            "bytes_saved": 0,
+            "gzip_bytes_saved": 0,
+        }
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], bytes]) -> CachedResponse:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry.created_at < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                self.stats["bytes_saved"] += len(entry.body)
+                return entry
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.stats["coalesced"] += 1
+                leader = False
+            else:
+                flight = _Flight()
+                self._flights[key] = flight
+                self.stats["misses"] += 1
+                leader = True
+            generation = self._generation
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            with self._lock:
+                self.stats["bytes_saved"] += len(flight.result.body)
+            return flight.result
+
+        try:
+            flight.result = CachedResponse(loader())
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+                # Results loaded across an invalidation may already be stale.
+                if flight.result is not None and generation == self._generation:
+                    self._entries[key] = flight.result
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            flight.done.set()
+        return flight.result
+
+    def record(self, stat: str, amount: int = 1) -> None:
+        with self._lock:
+            self.stats[stat] += amount
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self.stats["invalidations"] += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_ratio"] = (
+            (stats["hits"] + stats["coalesced"]) / lookups if lookups else 0.0
+        )
+        return stats
+
+
+class IngestWatcher:
+    """Polls the ingest marker and invalidates a cache when it moves."""
+
+    def __init__(
+        self,
+        cache: ResponseCache,
+        read_generation: Callable[[], Optional[int]],
+        interval_seconds: float = 2.0,
+    ) -> None:
+        self.cache = cache
+        self.read_generation = read_generation
+        self.interval_seconds = interval_seconds
+        self._last: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def ensure_started(self) -> None:
+        if self._thread is not None or self.interval_seconds <= 0:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="Ingest watcher", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def poll(self) -> None:
+        try:
+            generation = self.read_generation()
+        except Exception:
+            return
+        if generation is None:
+            return
+        if self._last is not None and generation != self._last:
+            self.cache.invalidate()
+        self._last = generation
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            self.poll()
@@ -1,51 +1,102 @@
 from __future__ import annotations
 
-import time
-from concurrent.futures import ThreadPoolExecutor
-from typing import List, Optional
+import threading
+from typing import Iterator, List, Optional, Sequence, Tuple
 
 from mcstatus import JavaServer
 
 from api.models.server_serializers import (
+    DETAIL_PROJECTION,
+    SUMMARY_FIELDS,
+    SUMMARY_PROJECTION,
     serialize_server_detail,
     serialize_server_summary,
 )
 from api.services.mongo_client import get_servers_collection
+from api.services.status_refresher import StatusRefresher
 
 CACHE_TTL_SECONDS = 60
 MAX_STATUS_WORKERS = 8
-_status_cache: dict[str, tuple[bool, float]] = {}
+MAX_STATUS_CACHE_ENTRIES = 10000
+EXPORT_BATCH_SIZE = 1000
+SIGHTINGS_COLLECTION_NAME = "sightings"
+ARCHIVE_COLLECTION_NAME = "servers_archive"
+SECONDS_PER_DAY = 86400
+_status_refresher: Optional[StatusRefresher] = None
+_status_refresher_lock = threading.Lock()
 
 
 def _check_online(host: str) -> bool:
-    now = time.time()
-    cached = _status_cache.get(host)
-    if cached and now - cached[1] < CACHE_TTL_SECONDS:
-        return cached[0]
     try:
         server = JavaServer.lookup(host, timeout=1.5)
         server.status()
-        is_online = True
+        return True
     except Exception:
-        is_online = False
-    _status_cache[host] = (is_online, now)
-    return is_online
+        return False
 
 
-def get_server_detail(host: str) -> Optional[dict]:
-    collection = get_servers_collection()
-    document = collection.find_one({"$or": [{"host": host}, {"hostname": host}]})
+def get_status_refresher() -> StatusRefresher:
+    global _status_refresher
+    if _status_refresher is None:
+        with _status_refresher_lock:
+            if _status_refresher is None:
+                _status_refresher = StatusRefresher(
+                    _check_online,
+                    ttl_seconds=CACHE_TTL_SECONDS,
+                    max_entries=MAX_STATUS_CACHE_ENTRIES,
+                    max_workers=MAX_STATUS_WORKERS,
+                )
+    return _status_refresher
+
+
+def get_server_detail(host: str, include_extra: bool = False) -> Optional[dict]:
+    """Looks host up in the primary collection, then in the archive.
+
+    include_extra also returns the scanner's internal fields.
+    """
+    filter_query = {"$or": [{"host": host}, {"hostname": host}]}
+    projection = None if include_extra else DETAIL_PROJECTION
+    document = get_servers_collection().find_one(filter_query, projection)
+    if document:
+        return serialize_server_detail(document)
+    archive = get_servers_collection(collection_name=ARCHIVE_COLLECTION_NAME)
+    document = archive.find_one(filter_query, projection)
     if not document:
         return None
-    return serialize_server_detail(document)
+    detail = serialize_server_detail(document)
+    detail["archived"] = True
+    return detail
 
 
-def get_server_list(
+def get_server_history(host: str, start: float, end: float) -> dict:
+    """Returns [timestamp, players, ping] samples for host between start and end.
+
+    Sightings are bucketed per host per day, so the range is served by one
+    query on the (host, day) index.
+    """
+    collection = get_servers_collection(collection_name=SIGHTINGS_COLLECTION_NAME)
+    cursor = collection.find(
+        {
+            "host": host,
+            "day": {
+                "$gte": int(start // SECONDS_PER_DAY),
+                "$lte": int(end // SECONDS_PER_DAY),
+            },
+        },
+        {"_id": 0, "samples": 1, "resolution": 1},
+    ).sort("day", 1)
+    samples: List[list] = []
+    for bucket in cursor:
+        samples.extend(
+            sample
+            for sample in bucket.get("samples") or []
+            if start <= sample[0] <= end
+        )
+    return {"host": host, "from": start, "to": end, "samples": samples}
+
+
+def build_server_filter(
     query: str | None = None,
-    limit: int = 100,
-    offset: int = 0,
-    sort_field: str = "lastOnlinePlayers",
-    sort_order: str = "desc",
     min_players: int | None = None,
     max_players: int | None = None,
     last_online_after: int | None = None,
@@ -55,7 +106,6 @@ def get_server_list(
     whitelisted: bool | None = None,
     cracked: bool | None = None,
 ) -> dict:
-    collection = get_servers_collection()
     filter_query: dict = {}
     if query:
         filter_query = {
@@ -86,10 +136,27 @@ def get_server_list(
         filter_query["whitelisted"] = whitelisted
     if cracked is not None:
         filter_query["cracked"] = cracked
+    return filter_query
+
+
+def get_server_list(
+    query: str | None = None,
+    limit: int = 100,
+    offset: int = 0,
+    sort_field: str = "lastOnlinePlayers",
+    sort_order: str = "desc",
+    archived: bool = False,
+    **filters,
+) -> dict:
+    if archived:
+        collection = get_servers_collection(collection_name=ARCHIVE_COLLECTION_NAME)
+    else:
+        collection = get_servers_collection()
+    filter_query = build_server_filter(query, **filters)
 
     sort_direction = -1 if sort_order == "desc" else 1
     cursor = (
-        collection.find(filter_query)
+        collection.find(filter_query, SUMMARY_PROJECTION)
         .sort(sort_field, sort_direction)
         .skip(offset)
         .limit(limit)
@@ -99,13 +166,45 @@ def get_server_list(
     return {"total": total, "items": items}
 
 
-def get_servers_online_status(hosts: list[str]) -> dict[str, bool]:
+def iter_servers(
+    fields: Sequence[str] = SUMMARY_FIELDS,
+    batch_size: int = EXPORT_BATCH_SIZE,
+    collection=None,
+    **filters,
+) -> Iterator[dict]:
+    """Yields every matching server from a single cursor, projected to fields.
+
+    Documents are fetched batch_size at a time, so memory stays flat no matter
+    how many servers match.
+    """
+    if collection is None:
+        collection = get_servers_collection()
+    projection = {field: 1 for field in fields}
+    cursor = collection.find(
+        build_server_filter(**filters),
+        projection,
+        batch_size=batch_size,
+        no_cursor_timeout=True,
+    )
+    try:
+        for document in cursor:
+            row = {field: document.get(field) for field in fields}
+            if "host" in row:
+                row["host"] = document.get("host") or str(document.get("_id"))
+            yield row
+    finally:
+        cursor.close()
+
+
+def get_servers_online_status(
+    hosts: list[str],
+) -> Tuple[dict[str, bool], list[str]]:
+    """Returns cached online flags plus the hosts that have not been probed yet.
+
+    Stale and unknown hosts are refreshed in the background, so this never
+    waits on a remote server.
+    """
     if not hosts:
-        return {}
+        return {}, []
     unique_hosts = [host for host in dict.fromkeys(hosts) if host]
-    results: dict[str, bool] = {}
-    with ThreadPoolExecutor(max_workers=MAX_STATUS_WORKERS) as executor:
-        futures = {executor.submit(_check_online, host): host for host in unique_hosts}
-        for future, host in futures.items():
-            results[host] = future.result()
-    return results
+    return get_status_refresher().get_statuses(unique_hosts)
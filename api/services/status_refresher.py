@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class _Entry:
+    __slots__ = ("online", "checked_at", "requested_at")
+
+    def __init__(self, requested_at: float) -> None:
+        self.online: Optional[bool] = None
+        self.checked_at = 0.0
+        self.requested_at = requested_at
+
+
+class StatusRefresher:
+    """Bounded TTL/LRU cache of online flags kept warm by a background thread.
+
+    Lookups only read the cache and queue refreshes; probes run on a worker
+    pool, most recently requested hosts first, and a host is never probed by
+    more than one worker at a time.
+    """
+
+    def __init__(
+        self,
+        probe: Callable[[str], bool],
+        ttl_seconds: float = 60,
+        max_entries: int = 10000,
+        max_workers: int = 8,
+        active_window_seconds: float = 300,
+        poll_interval: float = 1.0,
+    ) -> None:
+        self._probe = probe
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_workers = max_workers
+        self.active_window_seconds = active_window_seconds
+        self.poll_interval = poll_interval
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._pending: Dict[str, float] = {}
+        self._inflight: set[str] = set()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def get_statuses(self, hosts: Iterable[str]) -> Tuple[Dict[str, bool], List[str]]:
+        """Returns cached flags and the hosts still waiting on a first probe."""
+        now = time.time()
+        statuses: Dict[str, bool] = {}
+        pending: List[str] = []
+        with self._lock:
+            for host in hosts:
+                entry = self._touch(host, now)
+                if entry.online is not None:
+                    statuses[host] = entry.online
+                else:
+                    pending.append(host)
+                if now - entry.checked_at >= self.ttl_seconds:
+                    self._enqueue(host, now)
+            if self._pending:
+                self._wakeup.notify()
+        self._ensure_started()
+        return statuses, pending
+
+    def stop(self) -> None:
+        with self._lock:
+            self._stopped = True
+            self._wakeup.notify_all()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def _touch(self, host: str, now: float) -> _Entry:
+        entry = self._entries.get(host)
+        if entry is None:
+            entry = _Entry(now)
+            self._entries[host] = entry
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._pending.pop(evicted, None)
+        else:
+            entry.requested_at = now
+            self._entries.move_to_end(host)
+        return entry
+
+    def _enqueue(self, host: str, requested_at: float) -> None:
+        if host not in self._inflight:
+            self._pending[host] = requested_at
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None or self._stopped:
+                return
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="status-probe"
+            )
+            self._thread = threading.Thread(
+                target=self._run, name="Status refresher", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if self._stopped:
+                    return
+                self._requeue_active(time.time())
+                batch = self._take_batch()
+                if not batch:
+                    self._wakeup.wait(self.poll_interval)
+                    continue
+            for host in batch:
+                self._executor.submit(self._refresh, host)
+
+    def _requeue_active(self, now: float) -> None:
+        # Hosts clients asked about recently are refreshed before they expire.
+        for host, entry in reversed(self._entries.items()):
+            if now - entry.requested_at > self.active_window_seconds:
+                break
+            if now - entry.checked_at >= self.ttl_seconds * 0.8:
+                self._enqueue(host, entry.requested_at)
+
+    def _take_batch(self) -> List[str]:
+        free = self.max_workers - len(self._inflight)
+        if free <= 0 or not self._pending:
+            return []
+        ordered = sorted(self._pending.items(), key=lambda item: item[1], reverse=True)
+        batch = [host for host, _ in ordered[:free]]
+        for host in batch:
+            del self._pending[host]
+            self._inflight.add(host)
+        return batch
+
+    def _refresh(self, host: str) -> None:
+        try:
+            online = bool(self._probe(host))
+        except Exception:
+            online = False
+        with self._lock:
+            self._inflight.discard(host)
+            entry = self._entries.get(host)
+            if entry is not None:
+                entry.online = online
+                entry.checked_at = time.time()
+            self._wakeup.notify()
@@ -0,0 +1,40 @@
+from api.app import create_app
+from api.routes import servers as servers_routes
+
+
+def test_metrics_expose_cache_stats_with_help(monkeypatch):
+    app = create_app()
+    app.extensions["ingest_watcher"].interval_seconds = 0
+    client = app.test_client()
+    monkeypatch.setattr(
+        servers_routes,
+        "get_server_list",
+        lambda **params: {"total": 1, "items": [{"host": "127.0.0.1"}]},
+    )
+    client.get("/servers")
+    client.get("/servers")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    lines = response.get_data(as_text=True).splitlines()
+    assert "# TYPE api_server_list_cache_hits_total counter" in lines
+    assert "api_server_list_cache_hits_total 1" in lines
+    assert "api_server_list_cache_misses_total 1" in lines
+    assert "# TYPE api_server_list_cache_hit_ratio gauge" in lines
+    assert "api_server_list_cache_hit_ratio 0.5" in lines
+    assert "api_server_list_cache_entries 1" in lines
+    assert all(
+        any(line.startswith(f"# HELP {name} ") for line in lines)
+        for name in (line.split()[2] for line in lines if line.startswith("# TYPE"))
+    )
+
+
+def test_each_app_has_its_own_registry():
+    first, second = create_app(), create_app()
+
+    assert (
+        first.extensions["metrics_registry"]
+        is not second.extensions["metrics_registry"]
+    )
@@ -0,0 +1,116 @@
+import gzip
+import json
+import threading
+
+from api.app import create_app
+from api.routes import servers as servers_routes
+from api.services.response_cache import IngestWatcher, ResponseCache
+
+
+def _create_client():
+    app = create_app()
+    app.extensions["ingest_watcher"].interval_seconds = 0
+    app.config["GZIP_MIN_BYTES"] = 64
+    return app, app.test_client()
+
+
+def test_list_servers_cached_with_etag(monkeypatch):
+    app, client = _create_client()
+    calls = []
+
+    def fake_list(**params):
+        calls.append(params)
+        return {"total": 1, "items": [{"host": "127.0.0.1"}]}
+
+    monkeypatch.setattr(servers_routes, "get_server_list", fake_list)
+
+    first = client.get("/servers?sort=lastOnlinePlayers&order=desc&limit=100")
+    second = client.get("/servers?limit=100&order=desc&sort=lastOnlinePlayers")
+    assert first.status_code == second.status_code == 200
+    assert len(calls) == 1
+    assert first.headers["ETag"] == second.headers["ETag"]
+
+    not_modified = client.get(
+        "/servers", headers={"If-None-Match": first.headers["ETag"]}
+    )
+    assert not_modified.status_code == 304
+    assert app.extensions["server_list_cache"].snapshot()["hits"] == 2
+
+
+def test_list_servers_gzip_large_responses(monkeypatch):
+    _, client = _create_client()
+    items = [{"host": f"10.0.0.{idx}"} for idx in range(50)]
+    monkeypatch.setattr(
+        servers_routes,
+        "get_server_list",
+        lambda **params: {"total": len(items), "items": items},
+    )
+
+    response = client.get("/servers", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(response.data))["total"] == 50
+
+
+def test_gzip_and_identity_bodies_have_their_own_etags(monkeypatch):
+    _, client = _create_client()
+    items = [{"host": f"10.0.0.{idx}"} for idx in range(50)]
+    monkeypatch.setattr(
+        servers_routes,
+        "get_server_list",
+        lambda **params: {"total": len(items), "items": items},
+    )
+
+    zipped = client.get("/servers", headers={"Accept-Encoding": "gzip"})
+    identity = client.get("/servers")
+    assert zipped.headers["ETag"] == identity.headers["ETag"][:-1] + '-gz"'
+
+    # a tag only revalidates the representation it was sent with
+    crossed = client.get("/servers", headers={"If-None-Match": zipped.headers["ETag"]})
+    assert crossed.status_code == 200
+    assert "Content-Encoding" not in crossed.headers
+    revalidated = client.get(
+        "/servers",
+        headers={
+            "Accept-Encoding": "gzip",
+            "If-None-Match": zipped.headers["ETag"],
+        },
+    )
+    assert revalidated.status_code == 304
+
+
+def test_concurrent_misses_share_one_load():
+    cache = ResponseCache()
+    release = threading.Event()
+    loads = []
+
+    def loader():
+        loads.append(1)
+        release.wait(2)
+        return b"{}"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_load("k", loader)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(loads) == 1
+    assert len({id(result) for result in results}) == 1
+
+
+def test_ingest_marker_change_invalidates():
+    cache = ResponseCache()
+    cache.get_or_load("k", lambda: b"{}")
+    generations = iter([1, 1, 2])
+    watcher = IngestWatcher(cache, lambda: next(generations), interval_seconds=0)
+
+    watcher.poll()
+    watcher.poll()
+    assert cache.snapshot()["entries"] == 1
+    watcher.poll()
+    assert cache.snapshot()["entries"] == 0
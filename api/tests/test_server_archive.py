@@ -0,0 +1,57 @@
+from api.app import create_app
+from api.routes import servers as servers_routes
+from api.services import server_queries
+
+
+class _FakeCollection:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def find_one(self, filter_query, projection=None):
+        return self.documents[0] if self.documents else None
+
+
+def _fake_collections(monkeypatch, live, archived):
+    collections = {
+        "servers": _FakeCollection(live),
+        server_queries.ARCHIVE_COLLECTION_NAME: _FakeCollection(archived),
+    }
+    monkeypatch.setattr(
+        server_queries,
+        "get_servers_collection",
+        lambda collection_name="servers": collections[collection_name],
+    )
+
+
+def test_server_detail_falls_back_to_archive(monkeypatch):
+    _fake_collections(monkeypatch, [], [{"host": "127.0.0.1", "lastOnline": 1}])
+
+    detail = server_queries.get_server_detail("127.0.0.1")
+
+    assert detail["host"] == "127.0.0.1"
+    assert detail["archived"] is True
+
+
+def test_server_detail_prefers_primary_collection(monkeypatch):
+    _fake_collections(monkeypatch, [{"host": "127.0.0.1"}], [{"host": "127.0.0.1"}])
+
+    detail = server_queries.get_server_detail("127.0.0.1")
+
+    assert "archived" not in detail
+
+
+def test_list_servers_archived_is_opt_in(monkeypatch):
+    app = create_app()
+    client = app.test_client()
+    captured = []
+
+    def fake_list(**params):
+        captured.append(params["archived"])
+        return {"total": 0, "items": []}
+
+    monkeypatch.setattr(servers_routes, "get_server_list", fake_list)
+
+    assert client.get("/servers").status_code == 200
+    assert client.get("/servers?archived=true").status_code == 200
+    assert client.get("/servers?archived=maybe").status_code == 400
+    assert captured == [False, True]
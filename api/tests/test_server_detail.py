@@ -1,5 +1,19 @@
 from api.app import create_app
 from api.routes import servers as servers_routes
+from api.services import server_queries
+
+
+class _ProjectingCollection:
+    def __init__(self, document):
+        self.document = document
+        self.projections = []
+
+    def find_one(self, filter_query, projection=None):
+        self.projections.append(projection)
+        excluded = {key for key, value in (projection or {}).items() if not value}
+        return {
+            key: value for key, value in self.document.items() if key not in excluded
+        }
 
 
 def test_server_detail_returns_payload(monkeypatch):
@@ -23,7 +37,9 @@ def test_server_detail_returns_payload(monkeypatch):
         "extra": {"region": "us-east"},
     }
 
-    monkeypatch.setattr(servers_routes, "get_server_detail", lambda host: sample)
+    monkeypatch.setattr(
+        servers_routes, "get_server_detail", lambda host, include_extra=False: sample
+    )
 
     response = client.get("/servers/127.0.0.1")
     assert response.status_code == 200
@@ -37,9 +53,46 @@ def test_server_detail_not_found(monkeypatch):
     app = create_app()
     client = app.test_client()
 
-    monkeypatch.setattr(servers_routes, "get_server_detail", lambda host: None)
+    monkeypatch.setattr(
+        servers_routes, "get_server_detail", lambda host, include_extra=False: None
+    )
 
     response = client.get("/servers/203.0.113.10")
     assert response.status_code == 404
     body = response.get_json()
     assert body["error"] == "Not found"
+
+
+def test_server_detail_keeps_extra_fields(monkeypatch):
+    collection = _ProjectingCollection(
+        {"host": "127.0.0.1", "edition": "java", "fingerprint": {"motd": "ab"}}
+    )
+    monkeypatch.setattr(
+        server_queries,
+        "get_servers_collection",
+        lambda collection_name="servers": collection,
+    )
+
+    detail = server_queries.get_server_detail("127.0.0.1")
+    full = server_queries.get_server_detail("127.0.0.1", include_extra=True)
+
+    assert detail["extra"] == {"edition": "java"}
+    assert full["extra"] == {"edition": "java", "fingerprint": {"motd": "ab"}}
+    assert collection.projections == [{"fingerprint": 0, "updatedAt": 0}, None]
+
+
+def test_server_detail_route_passes_extra_flag(monkeypatch):
+    app = create_app()
+    client = app.test_client()
+    calls = []
+
+    def fake_detail(host, include_extra=False):
+        calls.append(include_extra)
+        return {"host": host, "extra": {}}
+
+    monkeypatch.setattr(servers_routes, "get_server_detail", fake_detail)
+
+    client.get("/servers/127.0.0.1")
+    client.get("/servers/127.0.0.1?extra=1")
+
+    assert calls == [False, True]
@@ -0,0 +1,49 @@
+from api.app import create_app
+from api.routes import servers as servers_routes
+
+
+def test_export_streams_ndjson(monkeypatch):
+    app = create_app()
+    client = app.test_client()
+    captured = {}
+
+    def fake_iter(fields, batch_size, **filters):
+        captured["fields"] = fields
+        captured["filters"] = filters
+        yield {"host": "127.0.0.1", "lastOnlinePlayers": 3}
+        yield {"host": "127.0.0.2", "lastOnlinePlayers": 0}
+
+    monkeypatch.setattr(servers_routes, "iter_servers", fake_iter)
+
+    response = client.get("/servers/export?fields=host,lastOnlinePlayers&minPlayers=0")
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = response.data.decode().splitlines()
+    assert lines[0] == '{"host":"127.0.0.1","lastOnlinePlayers":3}'
+    assert len(lines) == 2
+    assert captured["fields"] == ["host", "lastOnlinePlayers"]
+    assert captured["filters"]["min_players"] == 0
+
+
+def test_export_csv_and_invalid_field(monkeypatch):
+    app = create_app()
+    client = app.test_client()
+    monkeypatch.setattr(
+        servers_routes,
+        "iter_servers",
+        lambda fields, batch_size, **filters: iter(
+            [{"host": "127.0.0.1", "lastOnlinePlayersList": [{"name": "steve"}]}]
+        ),
+    )
+
+    response = client.get(
+        "/servers/export?format=csv&fields=host,lastOnlinePlayersList"
+    )
+    assert response.status_code == 200
+    assert response.data.decode().splitlines() == [
+        "host,lastOnlinePlayersList",
+        '127.0.0.1,"[{""name"":""steve""}]"',
+    ]
+
+    invalid = client.get("/servers/export?fields=host,password")
+    assert invalid.status_code == 400
@@ -0,0 +1,162 @@
+import threading
+import time
+
+from api.app import create_app
+from api.services.facets import ColumnSnapshot
+
+
+class _FakeCollection:
+    def __init__(self, documents):
+        self.documents = documents
+        self.queries = []
+
+    def find(self, query, projection=None, batch_size=None):
+        self.queries.append(query)
+        if not query:
+            return list(self.documents)
+        watermark = query["$or"][0]["lastOnline"]["$gte"]
+        return [
+            doc
+            for doc in self.documents
+            if doc["lastOnline"] >= watermark or doc.get("updatedAt", 0) >= watermark
+        ]
+
+
+DOCUMENTS = [
+    {
+        "host": "10.0.0.1",
+        "lastOnline": 100,
+        "lastOnlinePlayers": 0,
+        "lastOnlineVersion": "1.20.4",
+        "cracked": True,
+        "whitelisted": False,
+    },
+    {
+        "host": "10.0.0.2",
+        "lastOnline": 200,
+        "lastOnlinePlayers": 7,
+        "lastOnlineVersion": "1.20.4",
+        "cracked": False,
+        "whitelisted": False,
+    },
+    {
+        "host": "10.0.0.3",
+        "lastOnline": 300,
+        "lastOnlinePlayers": 600,
+        "lastOnlineVersion": "Paper 1.8.8",
+        "cracked": False,
+    },
+]
+
+
+def test_facets_exclude_their_own_filter():
+    collection = _FakeCollection(list(DOCUMENTS))
+    snapshot = ColumnSnapshot(lambda: collection)
+    snapshot.refresh()
+
+    result = snapshot.facets({"cracked": False, "version": "1.20"})
+
+    assert result["total"] == 1
+    facets = result["facets"]
+    assert facets["cracked"] == {"true": 1, "false": 1}
+    assert facets["version"] == [
+        {"value": "1.20.4", "count": 1},
+        {"value": "Paper 1.8.8", "count": 1},
+    ]
+    buckets = {item["bucket"]: item["count"] for item in facets["players"]}
+    assert buckets["6-10"] == 1
+    assert buckets["501+"] == 0
+
+
+def test_incremental_refresh_updates_rows_in_place():
+    collection = _FakeCollection(list(DOCUMENTS))
+    snapshot = ColumnSnapshot(lambda: collection, refresh_seconds=0)
+    snapshot.refresh()
+    collection.documents.append(
+        dict(DOCUMENTS[0], lastOnline=400, lastOnlinePlayers=12)
+    )
+
+    snapshot.refresh()
+    snapshot._reloader.join(5)
+
+    assert collection.queries[-1] == {
+        "$or": [{"lastOnline": {"$gte": 300.0}}, {"updatedAt": {"$gte": 300.0}}]
+    }
+    assert snapshot.size == 3
+    assert snapshot.facets({"min_players": 10})["total"] == 2
+
+
+def test_incremental_refresh_sees_flag_changes_by_updated_at():
+    collection = _FakeCollection([dict(doc) for doc in DOCUMENTS])
+    snapshot = ColumnSnapshot(lambda: collection, refresh_seconds=0)
+    snapshot.refresh()
+    collection.documents[0].update(whitelisted=True, updatedAt=500)
+
+    snapshot.refresh()
+    snapshot._reloader.join(5)
+
+    assert snapshot.facets({"whitelisted": True})["total"] == 1
+
+
+def test_query_matches_hostname_like_the_server_list():
+    documents = [dict(DOCUMENTS[0], hostname="play.example.net"), DOCUMENTS[1]]
+    snapshot = ColumnSnapshot(lambda: _FakeCollection(documents))
+    snapshot.refresh()
+
+    assert snapshot.facets({"query": "example"})["total"] == 1
+    assert snapshot.facets({"query": "10.0.0"})["total"] == 2
+    assert snapshot.facets({"query": "^10.0.0.2$"})["total"] == 1
+
+
+def test_requests_do_not_wait_for_an_incremental_refresh():
+    collection = _FakeCollection(list(DOCUMENTS))
+    snapshot = ColumnSnapshot(lambda: collection, refresh_seconds=0)
+    snapshot.refresh()
+    release = threading.Event()
+    find = collection.find
+
+    def slow_find(query, projection=None, batch_size=None):
+        release.wait(5)
+        return find(query, projection, batch_size)
+
+    collection.find = slow_find
+    collection.documents.append(dict(DOCUMENTS[0], host="10.0.0.4", lastOnline=400))
+
+    snapshot.refresh()
+    # the request is answered from the current version meanwhile
+    assert snapshot.facets({})["total"] == 3
+    release.set()
+    snapshot._reloader.join(5)
+
+    assert snapshot.facets({})["total"] == 4
+
+
+def test_full_reload_runs_in_background_and_swaps_whole_snapshot():
+    collection = _FakeCollection(list(DOCUMENTS))
+    snapshot = ColumnSnapshot(
+        lambda: collection, refresh_seconds=0, full_reload_seconds=0.01
+    )
+    snapshot.refresh()
+    before = snapshot._columns
+    collection.documents = DOCUMENTS[1:]
+    time.sleep(0.02)
+
+    snapshot.refresh()
+    snapshot._reloader.join(5)
+
+    # readers holding the old version keep a consistent copy
+    assert before.size == 3 and len(before.rows) == 3
+    assert snapshot.size == 2
+    assert snapshot.facets({})["total"] == 2
+    assert collection.queries[-1] == {}
+
+
+def test_facets_route(monkeypatch):
+    app = create_app()
+    client = app.test_client()
+    collection = _FakeCollection(list(DOCUMENTS))
+    app.extensions["column_snapshot"] = ColumnSnapshot(lambda: collection)
+
+    response = client.get("/servers/facets?minPlayers=1")
+    assert response.status_code == 200
+    assert response.get_json()["total"] == 2
@@ -0,0 +1,53 @@
+from api.app import create_app
+from api.routes import servers as servers_routes
+from api.services import server_queries
+
+
+class _FakeCursor(list):
+    def sort(self, *args):
+        return self
+
+
+class _FakeCollection:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        return _FakeCursor(self.buckets)
+
+
+def test_history_reads_day_buckets_in_range(monkeypatch):
+    collection = _FakeCollection(
+        [
+            {"samples": [[86300.0, 1, 40], [86500.0, 2, 41]]},
+            {"samples": [[172900.0, 3, 42]]},
+        ]
+    )
+    monkeypatch.setattr(
+        server_queries, "get_servers_collection", lambda **kwargs: collection
+    )
+
+    history = server_queries.get_server_history("10.0.0.1", 86400, 172800)
+
+    assert collection.queries == [{"host": "10.0.0.1", "day": {"$gte": 1, "$lte": 2}}]
+    assert history["samples"] == [[86500.0, 2, 41]]
+
+
+def test_history_route_validates_range(monkeypatch):
+    app = create_app()
+    client = app.test_client()
+    captured = {}
+
+    def fake_history(host, start, end):
+        captured.update(host=host, start=start, end=end)
+        return {"host": host, "from": start, "to": end, "samples": []}
+
+    monkeypatch.setattr(servers_routes, "get_server_history", fake_history)
+
+    response = client.get("/servers/10.0.0.1/history?from=100&to=200")
+    assert response.status_code == 200
+    assert captured == {"host": "10.0.0.1", "start": 100, "end": 200}
+
+    assert client.get("/servers/10.0.0.1/history?from=300&to=200").status_code == 400
@@ -0,0 +1,57 @@
+import json
+
+from bson import ObjectId
+
+from api.models.server_serializers import (
+    SUMMARY_PROJECTION,
+    dumps,
+    serialize_server_detail,
+)
+from api.services import server_queries
+
+
+class _FakeCursor(list):
+    def sort(self, *args):
+        return self
+
+    def skip(self, *args):
+        return self
+
+    def limit(self, *args):
+        return self
+
+
+class _FakeCollection:
+    def __init__(self, documents):
+        self.documents = documents
+        self.projections = []
+
+    def find(self, filter_query, projection=None):
+        self.projections.append(projection)
+        return _FakeCursor(self.documents)
+
+    def count_documents(self, filter_query):
+        return len(self.documents)
+
+
+def test_server_list_uses_summary_projection(monkeypatch):
+    collection = _FakeCollection([{"_id": ObjectId(), "host": "127.0.0.1"}])
+    monkeypatch.setattr(server_queries, "get_servers_collection", lambda: collection)
+
+    payload = server_queries.get_server_list()
+
+    assert collection.projections == [SUMMARY_PROJECTION]
+    assert payload["total"] == 1
+    assert payload["items"][0]["host"] == "127.0.0.1"
+
+
+def test_dumps_encodes_object_ids_in_extra():
+    object_id = ObjectId()
+    detail = serialize_server_detail(
+        {"_id": object_id, "host": "127.0.0.1", "owner": {"ref": object_id}}
+    )
+
+    body = json.loads(dumps(detail))
+
+    assert body["extra"]["owner"]["ref"] == str(object_id)
+    assert body["lastOnlinePlayersList"] == []
@@ -0,0 +1,71 @@
+import threading
+import time
+
+from api.app import create_app
+from api.routes import servers as servers_routes
+from api.services.status_refresher import StatusRefresher
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_refresher_answers_from_cache_and_coalesces_probes():
+    release = threading.Event()
+    calls = []
+
+    def probe(host):
+        calls.append(host)
+        release.wait(2)
+        return host == "online.example"
+
+    refresher = StatusRefresher(probe, poll_interval=0.01)
+    try:
+        statuses, pending = refresher.get_statuses(["online.example", "down.example"])
+        assert statuses == {}
+        assert pending == ["online.example", "down.example"]
+
+        refresher.get_statuses(["online.example"])
+        release.set()
+        assert _wait_for(
+            lambda: refresher.get_statuses(["online.example", "down.example"])[0]
+            == {"online.example": True, "down.example": False}
+        )
+        assert calls.count("online.example") == 1
+    finally:
+        refresher.stop()
+
+
+def test_refresher_evicts_least_recently_requested():
+    refresher = StatusRefresher(lambda host: True, max_entries=2, poll_interval=0.01)
+    try:
+        refresher.get_statuses(["a", "b"])
+        refresher.get_statuses(["a"])
+        refresher.get_statuses(["c"])
+        assert list(refresher._entries) == ["a", "c"]
+    finally:
+        refresher.stop()
+
+
+def test_status_route_reports_pending_hosts(monkeypatch):
+    app = create_app()
+    client = app.test_client()
+
+    monkeypatch.setattr(
+        servers_routes,
+        "get_servers_online_status",
+        lambda hosts: ({"127.0.0.1": True}, ["203.0.113.10"]),
+    )
+
+    response = client.post(
+        "/servers/status", json={"hosts": ["127.0.0.1", "203.0.113.10"]}
+    )
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["statuses"] == {"127.0.0.1": True}
+    assert body["pending"] == ["203.0.113.10"]
@@ -0,0 +1,180 @@
+"""Closed-loop tuning of the scan rate.
+
+Completed chunks are grouped into windows. Each window is judged on its
+open-port yield per packet sent, the rate masscan reported and the NIC's
+transmit drops. A healthy window raises the rate additively. A window whose
+yield fell below the baseline of earlier healthy windows, whose masscan
+process could not reach the requested rate, or that dropped packets, cuts the
+rate multiplicatively. The rate settles just under the point where pushing
+harder stops finding more servers.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+DEFAULT_WINDOW = 8
+DEFAULT_INCREASE = 0.1
+DEFAULT_DECREASE = 0.5
+# relative yield loss, share of requested rate and tx drop ratio tolerated
+YIELD_TOLERANCE = 0.2
+RATE_TOLERANCE = 0.85
+DROP_TOLERANCE = 0.001
+BASELINE_WEIGHT = 0.3
+# decisions kept for the curve, a long scan makes thousands
+HISTORY_SIZE = 256
+
+
+def read_tx_dropped(interface):
+    """Transmit drops counted by the kernel for interface, None if unreadable"""
+    try:
+        with open(f"/sys/class/net/{interface}/statistics/tx_dropped") as handle:
+            return int(handle.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+class RateTuner:
+    """AIMD controller for a scan's packets per second
+
+    Args:
+        rate (float): starting packets per second for the whole scan
+        min_rate (float): lower bound
+        max_rate (float): upper bound
+        window (int, optional): chunks per decision. Defaults to 8.
+        increase (float, optional): share of rate added after a healthy window
+        decrease (float, optional): factor applied after an unhealthy window
+        interface (str, optional): NIC whose tx_dropped counter is watched
+        history_size (int, optional): latest decisions kept. Defaults to 256.
+    """
+
+    def __init__(
+        self,
+        rate,
+        min_rate,
+        max_rate,
+        window=DEFAULT_WINDOW,
+        increase=DEFAULT_INCREASE,
+        decrease=DEFAULT_DECREASE,
+        interface=None,
+        scan_logger=None,
+        history_size=HISTORY_SIZE,
+    ):
+        if min_rate > max_rate:
+            raise ValueError("min_rate must not exceed max_rate")
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate = min(max(rate, min_rate), max_rate)
+        self.window = window
+        self.step = increase * self.rate
+        self.decrease = decrease
+        self.interface = interface
+        self.logger = scan_logger or logging.getLogger("scanCore")
+
+        self.baseline = None
+        self.history = deque(maxlen=history_size)
+        self._lock = threading.Lock()
+        self._reset_window()
+
+    def snapshot(self):
+        """The latest decisions, oldest first"""
+        with self._lock:
+            return list(self.history)
+
+    def _reset_window(self):
+        self._chunks = 0
+        self._packets = 0
+        self._open_ports = 0
+        self._seconds = 0.0
+        self._reported = []
+        self._dropped_at_start = (
+            read_tx_dropped(self.interface) if self.interface else None
+        )
+
+    def observe(self, packets, open_ports, seconds, requested_rate, reported_rate=None):
+        """Records one finished chunk and decides once a window is full
+
+        Args:
+            packets (int): probes sent, addresses times ports
+            open_ports (int): open ports masscan found
+            seconds (float): wall time of the masscan run
+            requested_rate (float): --max-rate the chunk ran with
+            reported_rate (float, optional): last rate masscan printed
+
+        Returns:
+            float: the scan rate to use for upcoming chunks
+        """
+        with self._lock:
+            self._chunks += 1
+            self._packets += packets
+            self._open_ports += open_ports
+            self._seconds += seconds
+            if reported_rate is not None and requested_rate:
+                self._reported.append(reported_rate / requested_rate)
+            if self._chunks >= self.window:
+                self._decide()
+            return self.rate
+
+    def _decide(self):
+        yield_rate = self._open_ports / self._packets if self._packets else 0.0
+        drops = None
+        if self._dropped_at_start is not None:
+            dropped = read_tx_dropped(self.interface)
+            if dropped is not None:
+                drops = dropped - self._dropped_at_start
+        reached = sum(self._reported) / len(self._reported) if self._reported else None
+
+        reason = None
+        if drops is not None and drops > self._packets * DROP_TOLERANCE:
+            reason = "tx drops"
+        elif reached is not None and reached < RATE_TOLERANCE:
+            reason = "rate not reached"
+        elif self.baseline and yield_rate < self.baseline * (1 - YIELD_TOLERANCE):
+            reason = "yield fell"
+
+        previous = self.rate
+        if reason is None:
+            self.rate = min(self.max_rate, self.rate + self.step)
+            self.baseline = (
+                yield_rate
+                if self.baseline is None
+                else (1 - BASELINE_WEIGHT) * self.baseline
+                + BASELINE_WEIGHT * yield_rate
+            )
+            decision = "increase" if self.rate > previous else "hold"
+        else:
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            decision = "decrease"
+
+        entry = {
+            "at": time.time(),
+            "decision": decision,
+            "reason": reason,
+            "rate": round(previous, 1),
+            "nextRate": round(self.rate, 1),
+            "chunks": self._chunks,
+            "packets": self._packets,
+            "openPorts": self._open_ports,
+            "yield": yield_rate,
+            "baseline": self.baseline,
+            "rateReached": reached,
+            "txDropped": drops,
+            "seconds": round(self._seconds, 1),
+        }
+        self.history.append(entry)
+        self.logger.info(
+            "Autotune {}: {:.0f} -> {:.0f} pps ({}; yield {:.2e}, baseline {}, "
+            "reached {}, drops {}, {} chunks)".format(
+                decision,
+                previous,
+                self.rate,
+                reason or "healthy",
+                yield_rate,
+                "-" if self.baseline is None else "{:.2e}".format(self.baseline),
+                "-" if reached is None else "{:.0%}".format(reached),
+                "-" if drops is None else drops,
+                self._chunks,
+            )
+        )
+        self._reset_window()
@@ -0,0 +1,152 @@
+"""Benchmark the server list endpoint against a seeded collection.
+
+Compares the legacy path (full documents, recursive normalization, Flask
+jsonify) with the projected path (SUMMARY_PROJECTION and the fast encoder).
+
+Usage:
+    MONGO_URL=mongodb://localhost:27017/mc python benchmarks/bench_server_list.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import bson
+from flask import jsonify
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.app import create_app  # noqa: E402
+from api.models import server_serializers  # noqa: E402
+from api.services.mongo_client import get_mongo_client  # noqa: E402
+
+BENCH_COLLECTION = "bench_servers"
+
+
+def _legacy_normalize(value):
+    if isinstance(value, bson.ObjectId):
+        return str(value)
+    if isinstance(value, dict):
+        return {key: _legacy_normalize(val) for key, val in value.items()}
+    if isinstance(value, list):
+        return [_legacy_normalize(item) for item in value]
+    return value
+
+
+def seed(collection, count: int) -> None:
+    collection.drop()
+    favicon = "data:image/png;base64," + "A" * 8192
+    batch = []
+    for idx in range(count):
+        players = [
+            {"name": f"player{idx}_{n}", "uuid": f"{idx:016x}{n:016x}"}
+            for n in range(random.randint(0, 50))
+        ]
+        batch.append(
+            {
+                "host": f"10.{idx >> 16 & 255}.{idx >> 8 & 255}.{idx & 255}",
+                "hostname": f"mc{idx}.example.net",
+                "lastOnline": time.time() - random.randint(0, 86400 * 30),
+                "lastOnlinePlayers": len(players),
+                "lastOnlinePlayersMax": 100,
+                "lastOnlinePlayersList": players,
+                "lastOnlineVersion": random.choice(["1.20.4", "1.19.2", "1.8.9"]),
+                "lastOnlineVersionProtocol": "765",
+                "lastOnlineDescription": "A Minecraft Server " * 4,
+                "lastOnlinePing": random.randint(10, 400),
+                "cracked": random.random() < 0.2,
+                "whitelisted": random.random() < 0.1,
+                "favicon": favicon,
+            }
+        )
+        if len(batch) >= 1000:
+            collection.insert_many(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch)
+
+
+def legacy_list(collection, limit: int) -> dict:
+    cursor = collection.find({}).sort("lastOnlinePlayers", -1).limit(limit)
+    documents = list(cursor)
+    items = [
+        _legacy_normalize(server_serializers.serialize_server_summary(doc))
+        for doc in documents
+    ]
+    return {
+        "total": collection.count_documents({}),
+        "items": items,
+        "_bson_bytes": sum(len(bson.encode(doc)) for doc in documents),
+    }
+
+
+def projected_list(collection, limit: int) -> dict:
+    cursor = (
+        collection.find({}, server_serializers.SUMMARY_PROJECTION)
+        .sort("lastOnlinePlayers", -1)
+        .limit(limit)
+    )
+    documents = list(cursor)
+    return {
+        "total": collection.count_documents({}),
+        "items": [server_serializers.serialize_server_summary(d) for d in documents],
+        "_bson_bytes": sum(len(bson.encode(doc)) for doc in documents),
+    }
+
+
+def run(label: str, collection, limit: int, seconds: float, legacy: bool) -> None:
+    app = create_app()
+    requests_done = 0
+    mongo_bytes = 0
+    response_bytes = 0
+    with app.test_request_context():
+        deadline = time.perf_counter() + seconds
+        started = time.perf_counter()
+        while time.perf_counter() < deadline:
+            if legacy:
+                payload = legacy_list(collection, limit)
+                mongo_bytes += payload.pop("_bson_bytes")
+                body = jsonify(payload).get_data()
+            else:
+                payload = projected_list(collection, limit)
+                mongo_bytes += payload.pop("_bson_bytes")
+                body = server_serializers.dumps(payload)
+            response_bytes += len(body)
+            requests_done += 1
+        elapsed = time.perf_counter() - started
+    print(
+        "{:<10} {:>8.1f} req/s  mongo {:>10.1f} KB/req  response {:>8.1f} KB/req".format(
+            label,
+            requests_done / elapsed,
+            mongo_bytes / requests_done / 1024,
+            response_bytes / requests_done / 1024,
+        )
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=20000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--no-seed", action="store_true")
+    args = parser.parse_args(argv)
+
+    client = get_mongo_client()
+    collection = client[os.getenv("BENCH_DB", "mc_bench")][BENCH_COLLECTION]
+    if not args.no_seed:
+        print(f"Seeding {args.count} documents into {collection.full_name}")
+        seed(collection, args.count)
+    collection.create_index("lastOnlinePlayers")
+
+    run("before", collection, args.limit, args.seconds, legacy=True)
+    run("after", collection, args.limit, args.seconds, legacy=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+"""Replay captured status responses through the parse-and-normalize pipeline.
+
+Every record in the corpus goes through the probe's field limits,
+parseStatus, player dedupe and the markdown/ANSI MOTD rendering the Discord
+embeds use. The corpus holds statuses as received, so the limits run here. Nothing touches the
+network. Throughput is measured over the whole corpus. Allocation peaks are
+measured with tracemalloc over a sample, because tracing slows every
+allocation down.
+
+Capture a corpus by scanning with SCAN_CAPTURE_CORPUS=/data/status.jsonl.gz,
+or synthesize one.
+
+Usage:
+    python benchmarks/bench_status_parse.py /data/status.jsonl.gz
+    python benchmarks/bench_status_parse.py --synthesize 1000000 /tmp/synthetic.jsonl.gz
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import logging
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.corpus import readCorpus  # noqa: E402
+from utils.probe import Probe  # noqa: E402
+from utils.status import dedupePlayers, parseStatus  # noqa: E402
+from utils.text import Text  # noqa: E402
+
+COLORS = "0123456789abcdefklmnor"
+NAMED_COLORS = ["gold", "aqua", "red", "green", "yellow", "white", "gray"]
+WORDS = ["Survival", "Factions", "SkyBlock", "PvP", "Network", "1.20", "Join", "Now!"]
+
+
+def _colored(words: int) -> str:
+    return " ".join(
+        "§{}{}".format(random.choice(COLORS), random.choice(WORDS))
+        for _ in range(words)
+    )
+
+
+def _synthetic_raw() -> dict:
+    if random.random() < 0.5:
+        description = _colored(random.randint(2, 12))
+    else:
+        description = {
+            "text": _colored(2),
+            "extra": [
+                {
+                    "text": random.choice(WORDS) + " ",
+                    "color": random.choice(NAMED_COLORS),
+                }
+                for _ in range(random.randint(0, 20))
+            ],
+        }
+    online = random.randint(0, 500)
+    return {
+        "version": {
+            "name": random.choice(
+                ["Paper 1.20.4", "§cBungeeCord 1.8.x-1.20.x", "1.8.9"]
+            ),
+            "protocol": random.choice([47, 754, 765]),
+        },
+        "players": {
+            "online": online,
+            "max": 1000,
+            "sample": [
+                {"name": "§7player{}".format(random.randint(0, 50)), "id": "0" * 32}
+                for _ in range(min(online, 12))
+            ],
+        },
+        "description": description,
+        "favicon": "data:image/png;base64," + "A" * random.choice([0, 4096, 8192]),
+    }
+
+
+def synthesize(path: str, count: int) -> None:
+    with gzip.open(path, "wt", encoding="utf-8") as handle:
+        for idx in range(count):
+            ip = f"10.{idx >> 16 & 255}.{idx >> 8 & 255}.{idx & 255}"
+            record = {
+                "at": time.time(),
+                "host": ip,
+                "port": 25565,
+                "ip": ip,
+                "hostname": ip,
+                "latency": random.uniform(5, 400),
+                "raw": _synthetic_raw(),
+            }
+            handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def pipeline(raw: dict, text: Text, limits: Probe) -> dict:
+    limits.limit(raw)
+    parsed = parseStatus(raw, text)
+    parsed["lastOnlinePlayersList"] = dedupePlayers(
+        [{"name": text.cFilter(name).lower()} for name in parsed.pop("sample")]
+    )
+    parsed["embedDescription"] = text.markFilter(parsed["lastOnlineDescription"])
+    return parsed
+
+
+def replay(path: str, text: Text, limits: Probe, limit: int) -> None:
+    records = 0
+    failures = 0
+    parse_seconds = 0.0
+    started = time.perf_counter()
+    for record in readCorpus(path):
+        raw = record.get("raw")
+        before = time.perf_counter()
+        try:
+            pipeline(raw, text, limits)
+        except Exception:
+            failures += 1
+        parse_seconds += time.perf_counter() - before
+        records += 1
+        if limit and records >= limit:
+            break
+    elapsed = time.perf_counter() - started
+    if not records:
+        print("corpus is empty")
+        return
+    print(
+        "replayed {} records ({} failed) in {:.1f}s, {:.1f}s parsing".format(
+            records, failures, elapsed, parse_seconds
+        )
+    )
+    print(
+        "throughput {:>10.0f} records/s  {:>8.2f} us/record".format(
+            records / parse_seconds, parse_seconds / records * 1e6
+        )
+    )
+
+
+def trace(path: str, text: Text, limits: Probe, sample: int) -> None:
+    raws = []
+    for record in readCorpus(path):
+        raws.append(record.get("raw"))
+        if len(raws) >= sample:
+            break
+    if not raws:
+        return
+    peaks = []
+    tracemalloc.start()
+    try:
+        for raw in raws:
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            try:
+                pipeline(raw, text, limits)
+            except Exception:
+                continue
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - baseline)
+    finally:
+        tracemalloc.stop()
+    peaks.sort()
+    print(
+        "allocation peak per record over {}: mean {:.1f} KB  p50 {:.1f} KB  "
+        "p99 {:.1f} KB  max {:.1f} KB".format(
+            len(peaks),
+            sum(peaks) / len(peaks) / 1024,
+            peaks[len(peaks) // 2] / 1024,
+            peaks[int(len(peaks) * 0.99)] / 1024,
+            peaks[-1] / 1024,
+        )
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", help="gzip JSONL corpus file")
+    parser.add_argument(
+        "--synthesize",
+        type=int,
+        default=0,
+        metavar="N",
+        help="write N synthetic records to the corpus file first",
+    )
+    parser.add_argument("--limit", type=int, default=0, help="replay at most N")
+    parser.add_argument("--trace-sample", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    if args.synthesize:
+        print(f"Synthesizing {args.synthesize} records into {args.corpus}")
+        synthesize(args.corpus, args.synthesize)
+
+    text = Text(logging.getLogger("bench"))
+    limits = Probe(logging.getLogger("bench"))
+    replay(args.corpus, text, limits, args.limit)
+    if args.trace_sample:
+        trace(args.corpus, text, limits, args.trace_sample)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
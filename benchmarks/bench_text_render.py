@@ -0,0 +1,174 @@
+"""Benchmark MOTD rendering against a captured status corpus.
+
+Compares the legacy path with the single-pass renderer in utils/text.py.
+The legacy path is one-level flattening in Finder.check, per-call re.sub in
+cFilter, 21 str.replace passes in colorAnsi and per-character NFKD in
+markFilter. The new path renders plain, ANSI and markdown together, once per
+description and in batches.
+
+Usage:
+    python benchmarks/bench_text_render.py /data/status.jsonl.gz
+    python benchmarks/bench_text_render.py --synthesize 200000 /tmp/synthetic.jsonl.gz
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import random
+import re
+import sys
+import time
+import unicodedata
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_status_parse import synthesize  # noqa: E402
+from utils.corpus import readCorpus  # noqa: E402
+from utils.text import Text, renderComponents  # noqa: E402
+
+LEGACY_ANSI = {
+    "§0": "\u001b[30m",
+    "§1": "\u001b[34m",
+    "§2": "\u001b[32m",
+    "§3": "\u001b[36m",
+    "§4": "\u001b[31m",
+    "§5": "\u001b[35m",
+    "§6": "\u001b[33m",
+    "§7": "\u001b[30m",
+    "§9": "\u001b[34m",
+    "§a": "\u001b[32m",
+    "§b": "\u001b[36m",
+    "§c": "\u001b[31m",
+    "§d": "\u001b[35m",
+    "§e": "\u001b[33m",
+    "§f": "\u001b[37m",
+    "§l": "",
+    "§k": "",
+    "§m": "",
+    "§n": "",
+    "§o": "",
+    "§r": "",
+}
+
+
+def _legacy_cFilter(text: str) -> str:
+    text = re.sub(r"§[0-9a-fk-or]*", "", text).replace("|", "")
+    return text.strip().replace("@", "@ ")
+
+
+def _legacy_colorAnsi(text: str) -> str:
+    for color in LEGACY_ANSI:
+        text = text.replace(color, LEGACY_ANSI[color])
+    return re.sub(r"§[0-9a-fk-or]*", "", text)
+
+
+def _legacy_markFilter(text: str) -> str:
+    text = "```ansi\n" + _legacy_colorAnsi(text) + "\n```"
+    return "".join(
+        [
+            (
+                char
+                if char == "\u001b" or char == "\n"
+                else unicodedata.normalize("NFKD", char)
+            )
+            for char in text
+        ]
+    )
+
+
+def _legacy_flatten(rawMotd) -> str:
+    if isinstance(rawMotd, dict):
+        motd = str(rawMotd.get("text", ""))
+        for extra in rawMotd.get("extra", []):
+            if isinstance(extra, dict):
+                motd += str(extra.get("text", ""))
+            else:
+                motd += str(extra)
+    else:
+        motd = str(rawMotd)
+    return re.sub(r"§.", "", motd)
+
+
+def _legacy_embed(rawMotd, text: Text) -> str:
+    if isinstance(rawMotd, dict) and "text" in rawMotd and "extra" in rawMotd:
+        motd = rawMotd["text"]
+        for extra in rawMotd["extra"]:
+            if "color" in extra:
+                motd += text.colorMine(extra["color"]) + extra["text"]
+            else:
+                motd += extra["text"]
+    elif isinstance(rawMotd, dict) and "text" in rawMotd:
+        motd = rawMotd["text"]
+    else:
+        motd = rawMotd
+    return _legacy_markFilter(str(motd))
+
+
+def legacy(descriptions, text: Text) -> None:
+    for description in descriptions:
+        _legacy_cFilter(_legacy_flatten(description))
+        _legacy_embed(description, text)
+
+
+def single(descriptions, text: Text) -> None:
+    for description in descriptions:
+        plain, _, _ = text.render(description)
+        text.cFilter(plain)
+
+
+def batch(descriptions, text: Text) -> None:
+    for plain, _, _ in renderComponents(descriptions):
+        text.cFilter(plain)
+
+
+def run(label: str, fn, descriptions, text: Text, repeat: int) -> None:
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(descriptions, text)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(
+        "{:<8} {:>10.0f} descriptions/s  {:>7.2f} us/description".format(
+            label, len(descriptions) / best, best / len(descriptions) * 1e6
+        )
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", help="gzip JSONL corpus file")
+    parser.add_argument("--synthesize", type=int, default=0, metavar="N")
+    parser.add_argument("--limit", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    if args.synthesize:
+        print(f"Synthesizing {args.synthesize} records into {args.corpus}")
+        synthesize(args.corpus, args.synthesize)
+
+    descriptions = []
+    for record in readCorpus(args.corpus):
+        description = (record.get("raw") or {}).get("description")
+        if description is not None:
+            descriptions.append(description)
+        if len(descriptions) >= args.limit:
+            break
+    if not descriptions:
+        print("no descriptions in corpus")
+        return 1
+    print(f"{len(descriptions)} descriptions")
+
+    text = Text(logging.getLogger("bench"))
+    run("legacy", legacy, descriptions, text, args.repeat)
+    run("single", single, descriptions, text, args.repeat)
+    run("batch", batch, descriptions, text, args.repeat)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -23,8 +23,12 @@ type ServerListResponse = {
 
 type ServerStatusResponse = {
   statuses: Record<string, boolean>
+  pending?: string[]
 }
 
+const STATUS_RETRY_LIMIT = 3
+const STATUS_RETRY_DELAY_MS = 1500
+
 export type ServersState = {
   data: ServerListResponse | null
   loading: boolean
@@ -115,28 +119,41 @@ export const useServers = ({
         if (hosts.length > 0) {
           void (async () => {
             try {
-              const statusResponse = await fetchJson<ServerStatusResponse>(
-                '/servers/status',
-                {
-                  method: 'POST',
-                  headers: { 'Content-Type': 'application/json' },
-                  body: JSON.stringify({ hosts }),
-                  signal: controller.signal,
-                },
-              )
-              if (!active) {
-                return
-              }
-              setData((prev) => {
-                if (!prev) {
-                  return prev
+              let requested = hosts
+              for (let attempt = 0; attempt < STATUS_RETRY_LIMIT; attempt++) {
+                const statusResponse = await fetchJson<ServerStatusResponse>(
+                  '/servers/status',
+                  {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ hosts: requested }),
+                    signal: controller.signal,
+                  },
+                )
+                if (!active) {
+                  return
                 }
-                const updatedItems = prev.items.map((item) => ({
-                  ...item,
-                  isOnline: statusResponse.statuses[item.host],
-                }))
-                return { ...prev, items: updatedItems }
-              })
+                const { statuses } = statusResponse
+                setData((prev) => {
+                  if (!prev) {
+                    return prev
+                  }
+                  const updatedItems = prev.items.map((item) =>
+                    item.host in statuses
+                      ? { ...item, isOnline: statuses[item.host] }
+                      : item,
+                  )
+                  return { ...prev, items: updatedItems }
+                })
+                // Unprobed hosts are refreshed server-side; ask again shortly.
+                requested = statusResponse.pending ?? []
+                if (requested.length === 0) {
+                  break
+                }
+                await new Promise((resolve) =>
+                  setTimeout(resolve, STATUS_RETRY_DELAY_MS),
+                )
+              }
             } catch (statusError) {
               if (
                 statusError instanceof DOMException &&
@@ -0,0 +1,341 @@
+"""Counters, gauges and histograms for the scan pipeline.
+
+Every stage of a sweep records into the metrics below: masscan chunks, open
+ports, probes by codec and outcome, per-stage probe latency, DNS and Mojang
+lookups, Mongo writes and the depth of the queues between stages.
+scanner_control serves them at GET /metrics in the Prometheus text
+exposition format.
+
+Recording is a dict lookup for the label values and an update under a
+per-series lock. Nothing is formatted until a scrape asks for it.
+"""
+
+import math
+import threading
+import time
+from bisect import bisect_left
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# seconds, from a fast local connect to a masscan chunk of a /16
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    300.0,
+)
+SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _labels(names, values, extra=()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Registry:
+    """The metrics exported together"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric) -> None:
+        with self.lock:
+            if metric.name in self.metrics:
+                raise ValueError(f"metric {metric.name} already registered")
+            self.metrics[metric.name] = metric
+
+    def expose(self) -> str:
+        """Every metric in the text exposition format"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+        self.lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, *values):
+        """The series for these label values, created on first use"""
+        child = self.children.get(values)
+        if child is not None:
+            return child
+        if len(values) != len(self.labelnames):
+            raise ValueError(
+                f"{self.name} takes labels {self.labelnames}, got {values}"
+            )
+        with self.lock:
+            child = self.children.get(values)
+            if child is None:
+                child = self.children[values] = self._child()
+        return child
+
+    def _child(self):
+        raise NotImplementedError
+
+    def _series(self):
+        with self.lock:
+            series = list(self.children.items())
+        return sorted(series, key=lambda item: tuple(map(str, item[0])))
+
+
+class _Value:
+    __slots__ = ("value", "lock", "function")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+        self.function = None
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        with self.lock:
+            self.value = float(value)
+
+    def set_function(self, function) -> None:
+        """Reads the value from function at scrape time instead"""
+        self.function = function
+
+    def get(self) -> float:
+        if self.function is not None:
+            try:
+                return float(self.function())
+            except Exception:
+                return math.nan
+        return self.value
+
+
+class Counter(_Metric):
+    """A value that only goes up"""
+
+    kind = "counter"
+
+    def _child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def samples(self):
+        for values, child in self._series():
+            yield f"{self.name}{_labels(self.labelnames, values)} {_number(child.get())}"
+
+
+class Gauge(Counter):
+    """A value that goes up and down, e.g. a queue depth"""
+
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def set_function(self, function) -> None:
+        self.labels().set_function(function)
+
+
+class _Buckets:
+    __slots__ = ("bounds", "counts", "sum", "lock")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("target", "started")
+
+    def __init__(self, target):
+        self.target = target
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.target.observe(time.perf_counter() - self.started)
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets, with their sum"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name,
+        documentation,
+        labelnames=(),
+        buckets=LATENCY_BUCKETS,
+        registry=REGISTRY,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _child(self):
+        return _Buckets(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self):
+        """Context manager observing the seconds its block took"""
+        return self.labels().time()
+
+    def samples(self):
+        for values, child in self._series():
+            with child.lock:
+                counts = list(child.counts)
+                total = child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                labels = _labels(self.labelnames, values, [("le", _number(bound))])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _labels(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_number(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+def expose(registry: Registry = REGISTRY) -> str:
+    return registry.expose()
+
+
+# Scan
+SCAN_CHUNKS = Counter(
+    "minescan_scan_chunks_total", "Masscan chunks finished, by result", ["result"]
+)
+SCAN_CHUNKS_ACTIVE = Gauge(
+    "minescan_scan_chunks_active", "Masscan chunks being scanned right now"
+)
+MASSCAN_SECONDS = Histogram(
+    "minescan_masscan_seconds", "Wall time of one masscan chunk"
+)
+OPEN_PORTS = Counter(
+    "minescan_open_ports_total", "Open ports reported by masscan", ["proto"]
+)
+HOSTS_PENDING = Gauge(
+    "minescan_hosts_pending",
+    "Hosts with open ports waiting for or in the probe pool",
+)
+
+# Probe
+PROBES_STARTED = Counter(
+    "minescan_probes_started_total", "Status probes started, by codec", ["codec"]
+)
+PROBES = Counter(
+    "minescan_probes_total",
+    "Status probes finished, by codec and result "
+    "(ok, timeout, refused, invalid, error)",
+    ["codec", "result"],
+)
+PROBE_SECONDS = Histogram(
+    "minescan_probe_stage_seconds",
+    "Latency of each probe stage that completed (connect, status, legacy, "
+    "bedrock, query, join, tablist)",
+    ["stage"],
+)
+TABLIST_SESSIONS = Gauge(
+    "minescan_tablist_sessions", "Tab list sessions queued or connected"
+)
+
+# Lookups
+DNS_LOOKUPS = Counter(
+    "minescan_dns_lookups_total",
+    "Forward and reverse DNS lookups, by cache result (hit, miss, error)",
+    ["kind", "result"],
+)
+DNS_SECONDS = Histogram(
+    "minescan_dns_seconds", "Latency of DNS lookups that missed the cache", ["kind"]
+)
+MOJANG_LOOKUPS = Counter(
+    "minescan_mojang_lookups_total",
+    "Mojang profile lookups, by cache result (hit, miss, error)",
+    ["result"],
+)
+MOJANG_SECONDS = Histogram(
+    "minescan_mojang_seconds", "Latency of Mojang lookups that missed the cache"
+)
+
+# Storage
+MONGO_SECONDS = Histogram(
+    "minescan_mongo_write_seconds",
+    "Latency of Mongo writes, by collection and operation",
+    ["collection", "op"],
+)
+MONGO_BATCH = Histogram(
+    "minescan_mongo_batch_size",
+    "Operations per Mongo write",
+    ["collection"],
+    buckets=SIZE_BUCKETS,
+)
+BUFFERED = Gauge(
+    "minescan_write_buffer",
+    "Writes buffered for the next bulk flush, by collection",
+    ["collection"],
+)
@@ -23,6 +23,8 @@ from interactions.ext.files import (
 )
 
 import utils
+from utils.events import AuthRequired, Joined, Kicked, SessionEnded
+from utils.server import AUTH_TIMEOUT, JOIN_TIMEOUT
 
 autoRestart = False
 allowJoin = False
@@ -734,71 +736,54 @@ async def emailModalResponse(
 
     await ctx.defer(ephemeral=True)
 
-    serverLib.start(
+    with serverLib.start(
         ip=host,
         port=25565,
         username=email,
-    )
-
-    while serverLib.getState() == "NOT_CONNECTED":
-        await asyncio.sleep(0.1)
-
-    if "AUTHENTICATING:" in serverLib.getState():
-        code = serverLib.getState().split("AUTHENTICATING:")[1]
-        logger.print("Code: " + code)
-
-        await command_send(
-            ctx,
-            embeds=[
-                interactions.Embed(
-                    label="Authentication required",
-                    description="Please enter the code `{}` at https://www.microsoft.com/link in order to authenticate.\nYou will have three minutes before the code expires.".format(
-                        code
-                    ),
-                    color=finderLib.BLUE,
-                )
-            ],
-            ephemeral=True,
-        )
+    ) as events:
+        event = await events.next(timeout=JOIN_TIMEOUT)
+        if event is None:
+            # nothing happened in time, don't leave the bot connecting
+            serverLib.bot.quit()
 
-        tStart = time.time()
-        while "AUTHENTICATING:" in serverLib.getState() and time.time() - tStart < 180:
-            await asyncio.sleep(1)
+        if isinstance(event, AuthRequired):
+            logger.print("Code: " + event.code)
 
-        if "AUTHENTICATING:" in serverLib.getState():
             await command_send(
                 ctx,
                 embeds=[
                     interactions.Embed(
                         label="Authentication required",
-                        description="The code has expired. Please try again.",
-                        color=finderLib.RED,
+                        description="Please enter the code `{}` at {} in order to authenticate.\nYou will have three minutes before the code expires.".format(
+                            event.code, event.url
+                        ),
+                        color=finderLib.BLUE,
                     )
                 ],
                 ephemeral=True,
             )
-            return
-        else:
-            await command_send(
-                ctx,
-                embeds=[
-                    interactions.Embed(
-                        label="Join server",
-                        description="Connecting to {}...".format(host),
-                        color=finderLib.ORANGE,
-                    )
-                ],
-                ephemeral=True,
-            ) if DEBUG else None
 
-    logger.print("state: " + serverLib.getState())
-    while serverLib.getState() == "CONNECTING":
-        await asyncio.sleep(0.1)
+            event = await events.next(timeout=AUTH_TIMEOUT)
+            if event is None:
+                serverLib.bot.quit()
+                await command_send(
+                    ctx,
+                    embeds=[
+                        interactions.Embed(
+                            label="Authentication required",
+                            description="The code has expired. Please try again.",
+                            color=finderLib.RED,
+                        )
+                    ],
+                    ephemeral=True,
+                )
+                return
 
-    if serverLib.getState() == "CONNECTED":
+    logger.print("join: {}".format(event))
+    if isinstance(event, Joined):
         print("Connected")
 
-        serverInfo = serverLib.getInfo()
+        serverInfo = event.info
         players = serverInfo["names"]
         position = serverInfo["position"]
         heldItem = serverInfo["heldItem"]
@@ -828,7 +813,12 @@ async def emailModalResponse(
         plyOnline = len(players)
         col.update_one(
             {"host": host},
-            {"$set": {"players": dbVal["lastOnlinePlayersList"]}},
+            {
+                "$set": {
+                    "players": dbVal["lastOnlinePlayersList"],
+                    "updatedAt": time.time(),
+                }
+            },
             upsert=True,
         )
 
@@ -860,31 +850,28 @@ async def emailModalResponse(
         serverLib.clearNMPCache()
         return
 
-    if serverLib.getState().startswith("DISCONNECTED"):
-        reason = serverLib.getState().split("DISCONNECTED:")[1]
-        if reason == "WHITELISTED":
-            # update the server to be whitelisted
-            col.update_one(
-                {"host": host},
-                {"$set": {"whitelisted": True}},
-                upsert=True,
-            )
-
-            await command_send(
-                ctx,
-                embeds=[
-                    interactions.Embed(
-                        title="Join Server",
-                        description="Error: This server is whitelisted or you are banned. Please contact the server owner to be allowed back in.",
-                        color=finderLib.YELLOW,
-                        timestamp=timeNow(),
-                    )
-                ],
-                ephemeral=True,
-            )
-        else:
-            print("Error")
+    if isinstance(event, Kicked) or (
+        isinstance(event, SessionEnded) and not event.reason.startswith("error")
+    ):
+        # update the server to be whitelisted
+        col.update_one(
+            {"host": host},
+            {"$set": {"whitelisted": True, "updatedAt": time.time()}},
+            upsert=True,
+        )
 
+        await command_send(
+            ctx,
+            embeds=[
+                interactions.Embed(
+                    title="Join Server",
+                    description="Error: This server is whitelisted or you are banned. Please contact the server owner to be allowed back in.",
+                    color=finderLib.YELLOW,
+                    timestamp=timeNow(),
+                )
+            ],
+            ephemeral=True,
+        )
         serverLib.clearNMPCache()
         return
 
@@ -893,7 +880,9 @@ async def emailModalResponse(
         embeds=[
             interactions.Embed(
                 title="Join Server",
-                description="Error: {}".format(serverLib.getState()),
+                description="Error: {}".format(
+                    event.reason if event is not None else "timed out"
+                ),
                 color=finderLib.RED,
                 timestamp=timeNow(),
             )
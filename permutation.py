@@ -0,0 +1,68 @@
+"""Keyed permutations of index ranges for randomized scan ordering.
+
+This is the construction masscan calls blackrock: an unbalanced Feistel
+network over [0, a * b) with a * b just above the range size, plus cycle
+walking to stay inside the range. Any index maps to its shuffled position in
+O(rounds) without materializing the permutation, and the same seed always
+gives the same order, so a scan can be resumed or split into leases by index.
+"""
+
+import hashlib
+import math
+
+DEFAULT_ROUNDS = 4
+# seeds are 64-bit, like masscan's; larger ones are reduced modulo this
+SEED_MODULUS = 1 << 64
+
+
+def seed_from(value):
+    """Derives a 64-bit seed from a scan id or any other string"""
+    digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+class KeyedPermutation:
+    """Bijection of range(size) onto itself, keyed by seed"""
+
+    def __init__(self, size, seed, rounds=DEFAULT_ROUNDS):
+        if size < 0:
+            raise ValueError("size must not be negative")
+        self.size = size
+        self.seed = seed % SEED_MODULUS
+        self.rounds = rounds
+        split = math.isqrt(size)
+        self.a = max(2, split - 1)
+        self.b = max(2, split + 1)
+        while self.a * self.b <= size:
+            self.b += 1
+        self._key = self.seed.to_bytes(8, "big", signed=False)
+
+    def __len__(self):
+        return self.size
+
+    def _round(self, round_index, value):
+        digest = hashlib.blake2b(
+            value.to_bytes(8, "big") + bytes((round_index,)),
+            digest_size=8,
+            key=self._key,
+        ).digest()
+        return int.from_bytes(digest, "big")
+
+    def _encrypt(self, index):
+        a, b = self.a, self.b
+        left, right = index % a, index // a
+        for round_index in range(1, self.rounds + 1):
+            modulus = a if round_index & 1 else b
+            left, right = right, (left + self._round(round_index, right)) % modulus
+        if self.rounds & 1:
+            return a * left + right
+        return a * right + left
+
+    def __call__(self, index):
+        if not 0 <= index < self.size:
+            raise IndexError("permutation index out of range")
+        # cycle-walk until the value falls back inside the range
+        value = self._encrypt(index)
+        while value >= self.size:
+            value = self._encrypt(value)
+        return value
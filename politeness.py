@@ -0,0 +1,236 @@
+"""Per-destination rate caps for the scan scheduler.
+
+Every chunk is charged against its /16 and, when a prefix table is loaded,
+its origin ASN. A worker only gets a chunk once both destinations have
+headroom for it, and the masscan rate for that chunk is capped at the
+smallest headroom. Chunks that would push a busy destination over its cap are
+skipped in favour of later ones from other destinations, so the global rate
+is kept up by interleaving rather than by bursting at one provider.
+
+A chunk is charged to the ASN announcing its first address only. Chunks are
+at most a few /24s and rarely straddle providers, and when they do the rest
+of the chunk goes uncounted rather than the chunk being split.
+"""
+
+import csv
+import ipaddress
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from collections import deque
+
+DEFAULT_PREFIX_LEN = 16
+DEFAULT_LOOKAHEAD = 256
+# walk back this many rows to find an enclosing prefix in overlapping tables
+MAX_OVERLAP_WALK = 8
+
+
+class PrefixTable:
+    """IPv4 prefix to ASN lookups over packed, sorted range arrays"""
+
+    def __init__(self):
+        self.starts = array("I")
+        self.ends = array("I")
+        self.asns = array("I")
+
+    def __len__(self):
+        return len(self.starts)
+
+    @classmethod
+    def load(cls, path):
+        """Reads a CSV of "prefix,asn" rows, e.g. "1.0.0.0/24,13335" or "AS13335"
+
+        Header rows, comments and IPv6 prefixes are skipped.
+        """
+        rows = []
+        with open(path, newline="") as handle:
+            for row in csv.reader(handle):
+                if len(row) < 2 or row[0].lstrip().startswith("#"):
+                    continue
+                try:
+                    net = ipaddress.ip_network(row[0].strip(), strict=False)
+                    asn = int(row[1].strip().upper().removeprefix("AS"))
+                except ValueError:
+                    continue
+                if net.version != 4:
+                    continue
+                rows.append((int(net.network_address), int(net.broadcast_address), asn))
+        rows.sort()
+        table = cls()
+        for start, end, asn in rows:
+            table.starts.append(start)
+            table.ends.append(end)
+            table.asns.append(asn)
+        return table
+
+    def lookup(self, address):
+        """Returns the ASN announcing address (an int), None if unknown"""
+        idx = bisect_right(self.starts, address) - 1
+        stop = max(-1, idx - MAX_OVERLAP_WALK)
+        while idx > stop:
+            if self.ends[idx] >= address:
+                return self.asns[idx]
+            idx -= 1
+        return None
+
+
+class Lease:
+    __slots__ = ("chunk", "rate", "prefix", "asn", "started")
+
+    def __init__(self, chunk, rate, prefix, asn):
+        self.chunk = chunk
+        self.rate = rate
+        self.prefix = prefix
+        self.asn = asn
+        self.started = time.time()
+
+
+class _Counter:
+    __slots__ = ("packets", "chunks", "deferred", "inflight")
+
+    def __init__(self):
+        self.packets = 0.0
+        self.chunks = 0
+        self.deferred = 0
+        self.inflight = 0.0
+
+    def as_dict(self):
+        return {
+            "packets": int(self.packets),
+            "chunks": self.chunks,
+            "deferred": self.deferred,
+            "inflightRate": round(self.inflight, 1),
+        }
+
+
+class PolitenessScheduler:
+    """Hands out chunks with a masscan rate that respects per-destination caps"""
+
+    def __init__(
+        self,
+        chunks,
+        worker_rate,
+        prefix_rate=None,
+        asn_rate=None,
+        prefix_table=None,
+        prefix_len=DEFAULT_PREFIX_LEN,
+        lookahead=DEFAULT_LOOKAHEAD,
+    ):
+        self.worker_rate = worker_rate
+        self.prefix_rate = prefix_rate
+        self.asn_rate = asn_rate
+        self.prefix_table = prefix_table
+        self.prefix_len = prefix_len
+        self.lookahead = lookahead
+        caps = [rate for rate in (worker_rate, prefix_rate, asn_rate) if rate]
+        # below this a chunk waits for headroom instead of starting as a trickle
+        self.min_rate = max(1.0, min(caps) / 4)
+
+        self._chunks = iter(chunks)
+        self._window = deque()
+        self._cond = threading.Condition()
+        self.prefixes = {}
+        self.asns = {}
+
+    def _destinations(self, chunk):
+        """The chunk's /prefix_len and the ASN of its first address"""
+        net = ipaddress.ip_network(chunk, strict=False)
+        if net.version != 4:
+            return str(net), None
+        address = int(net.network_address)
+        prefix_len = min(self.prefix_len, net.prefixlen)
+        prefix = "{}/{}".format(
+            ipaddress.IPv4Address(address >> (32 - prefix_len) << (32 - prefix_len)),
+            prefix_len,
+        )
+        asn = self.prefix_table.lookup(address) if self.prefix_table else None
+        return prefix, asn
+
+    def _counter(self, table, key):
+        counter = table.get(key)
+        if counter is None:
+            counter = table[key] = _Counter()
+        return counter
+
+    def _headroom(self, prefix, asn):
+        room = self.worker_rate
+        if self.prefix_rate:
+            room = min(
+                room, self.prefix_rate - self._counter(self.prefixes, prefix).inflight
+            )
+        if self.asn_rate and asn is not None:
+            room = min(room, self.asn_rate - self._counter(self.asns, asn).inflight)
+        return room
+
+    def acquire(self, stop_event=None, timeout=1.0):
+        """Blocks until a chunk has headroom and leases it
+
+        Returns:
+            Lease | None: None once every chunk was handed out or the scan stopped
+        """
+        with self._cond:
+            while stop_event is None or not stop_event.is_set():
+                while len(self._window) < self.lookahead:
+                    chunk = next(self._chunks, None)
+                    if chunk is None:
+                        break
+                    # the last item marks chunks already counted as deferred
+                    self._window.append([chunk, *self._destinations(chunk), False])
+                if not self._window:
+                    return None
+                for idx, entry in enumerate(self._window):
+                    chunk, prefix, asn, deferred = entry
+                    rate = self._headroom(prefix, asn)
+                    if rate >= self.min_rate:
+                        del self._window[idx]
+                        return self._lease(chunk, rate, prefix, asn)
+                    if not deferred:
+                        entry[3] = True
+                        self._counter(self.prefixes, prefix).deferred += 1
+                        if asn is not None:
+                            self._counter(self.asns, asn).deferred += 1
+                self._cond.wait(timeout)
+            return None
+
+    def _lease(self, chunk, rate, prefix, asn):
+        for table, key in ((self.prefixes, prefix), (self.asns, asn)):
+            if key is None:
+                continue
+            counter = self._counter(table, key)
+            counter.inflight += rate
+            counter.chunks += 1
+        return Lease(chunk, rate, prefix, asn)
+
+    def release(self, lease):
+        """Returns a lease's rate to its destinations once its chunk is done"""
+        packets = lease.rate * (time.time() - lease.started)
+        with self._cond:
+            for table, key in ((self.prefixes, lease.prefix), (self.asns, lease.asn)):
+                if key is None:
+                    continue
+                counter = self._counter(table, key)
+                counter.inflight = max(0.0, counter.inflight - lease.rate)
+                counter.packets += packets
+            self._cond.notify_all()
+
+    def snapshot(self, top=20):
+        """Busiest destinations by packets sent, for tuning the caps"""
+        with self._cond:
+
+            def busiest(table):
+                ranked = sorted(
+                    table.items(), key=lambda item: item[1].packets, reverse=True
+                )
+                return [
+                    {"destination": str(key), **counter.as_dict()}
+                    for key, counter in ranked[:top]
+                ]
+
+            return {
+                "prefixRate": self.prefix_rate,
+                "asnRate": self.asn_rate,
+                "pendingChunks": len(self._window),
+                "prefixes": busiest(self.prefixes),
+                "asns": busiest(self.asns),
+            }
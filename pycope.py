@@ -1,11 +1,13 @@
 import argparse
 import atexit
 import csv
+import gzip
 import ipaddress
 import os
 import signal
 import sys
 
+from permutation import seed_from
 from scanCore import get_default_ip_lists, run_scanner
 
 __version__ = "1.0.0"
@@ -60,6 +62,136 @@ def load_subnet_list(path):
 DEFAULT_PID_FILE = "/tmp/pycope.pid"
 
 
+def _parse_flag(value):
+    if value is None:
+        return None
+    return value == "true"
+
+
+def run_export(parser, args):
+    from api.models.server_serializers import (
+        EXPORT_FIELDS,
+        SUMMARY_FIELDS,
+        iter_csv,
+        iter_ndjson,
+    )
+    from api.services.server_queries import iter_servers
+
+    if args.batch_size <= 0:
+        parser.error("--batch-size must be a positive integer")
+    fields = (
+        [field.strip() for field in args.fields.split(",") if field.strip()]
+        if args.fields
+        else list(SUMMARY_FIELDS)
+    )
+    unknown = [field for field in fields if field not in EXPORT_FIELDS]
+    if unknown:
+        parser.error("Unknown export fields: {}".format(", ".join(unknown)))
+
+    rows = iter_servers(
+        fields=fields,
+        batch_size=args.batch_size,
+        query=args.query,
+        min_players=args.min_players,
+        max_players=args.max_players,
+        last_online_after=args.last_online_after,
+        last_online_before=args.last_online_before,
+        version=args.version_filter,
+        server_type=args.server_type,
+        whitelisted=_parse_flag(args.whitelisted),
+        cracked=_parse_flag(args.cracked),
+    )
+    chunks = iter_csv(rows, fields) if args.format == "csv" else iter_ndjson(rows)
+
+    compress = args.gzip or args.output.endswith(".gz")
+    if args.output == "-":
+        raw = sys.stdout.buffer
+        handle = gzip.GzipFile(fileobj=raw, mode="wb") if compress else raw
+    elif compress:
+        handle = gzip.open(args.output, "wb", compresslevel=6)
+    else:
+        handle = open(args.output, "wb")
+    written = 0
+    try:
+        for chunk in chunks:
+            handle.write(chunk)
+            written += len(chunk)
+    finally:
+        if handle is not sys.stdout.buffer:
+            handle.close()
+    print("Exported {} bytes to {}".format(written, args.output), file=sys.stderr)
+    return 0
+
+
+def run_snapshot(parser, args):
+    from api.services.mongo_client import DEFAULT_DB_NAME, get_mongo_client
+    from snapshot import SnapshotError, write_snapshot
+
+    if args.batch_size <= 0:
+        parser.error("--batch-size must be a positive integer")
+    db = get_mongo_client()[DEFAULT_DB_NAME]
+    try:
+        result = write_snapshot(
+            db,
+            args.output,
+            fmt=args.format,
+            batch_size=args.batch_size,
+            progress=lambda rows: print(f"{rows} servers written", file=sys.stderr),
+        )
+    except SnapshotError as exc:
+        print(exc)
+        return 1
+    for table, info in result.items():
+        if isinstance(info, dict):
+            print("{}: {} rows -> {}".format(table, info["rows"], info["path"]))
+    print("Snapshot finished in {}s".format(result["seconds"]))
+    return 0
+
+
+def run_downsample(parser, args):
+    import logging
+
+    from api.services.mongo_client import DEFAULT_DB_NAME, get_mongo_client
+    from utils.sightings import Sightings
+
+    if args.older_than_days < 0 or args.resolution <= 0:
+        parser.error("--older-than-days and --resolution must be positive")
+    logging.basicConfig(level=logging.INFO)
+    sightings = Sightings(
+        get_mongo_client()[DEFAULT_DB_NAME]["sightings"],
+        logging.getLogger("pycope"),
+    )
+    done = sightings.downsample(
+        olderThanDays=args.older_than_days, resolution=args.resolution
+    )
+    print("Downsampled {} buckets".format(done))
+    return 0
+
+
+def run_archive(parser, args):
+    import logging
+    import time
+
+    from api.services.mongo_client import DEFAULT_DB_NAME, get_mongo_client
+    from utils.archive import Archive
+
+    if args.older_than_days <= 0 or args.batch_size <= 0:
+        parser.error("--older-than-days and --batch-size must be positive")
+    if args.every is not None and args.every <= 0:
+        parser.error("--every must be a positive number of seconds")
+    logging.basicConfig(level=logging.INFO)
+    db = get_mongo_client()[DEFAULT_DB_NAME]
+    archive = Archive(db["servers"], db["servers_archive"], logging.getLogger("pycope"))
+    while True:
+        moved = archive.archiveStale(
+            olderThanDays=args.older_than_days, batchSize=args.batch_size
+        )
+        print("Archived {} servers".format(moved))
+        if args.every is None:
+            return 0
+        time.sleep(args.every)
+
+
 def build_parser():
     parser = argparse.ArgumentParser(
         prog="pycope",
@@ -99,6 +231,11 @@ def build_parser():
         type=int,
         help="Max active scan threads (defaults to current config)",
     )
+    scan_parser.add_argument(
+        "--seed",
+        help="Scan chunks and addresses in a random order keyed by this value "
+        "(the same seed repeats the same order)",
+    )
     scan_parser.add_argument(
         "--no-defaults",
         action="store_true",
@@ -110,6 +247,110 @@ def build_parser():
         help="PID file path for stop command",
     )
 
+    export_parser = subparsers.add_parser(
+        "export", help="Stream the server collection to an NDJSON or CSV file"
+    )
+    export_parser.add_argument(
+        "--output",
+        "-o",
+        required=True,
+        help="Output file path ('-' for stdout)",
+    )
+    export_parser.add_argument(
+        "--format",
+        choices=("ndjson", "csv"),
+        default="ndjson",
+        help="Output format",
+    )
+    export_parser.add_argument(
+        "--gzip",
+        action="store_true",
+        help="Gzip the output (implied by a .gz file name)",
+    )
+    export_parser.add_argument(
+        "--fields",
+        help="Comma-separated fields to export (defaults to summary fields)",
+    )
+    export_parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1000,
+        help="Documents fetched per cursor batch",
+    )
+    export_parser.add_argument("--query", help="Host or hostname regex")
+    export_parser.add_argument("--min-players", type=int)
+    export_parser.add_argument("--max-players", type=int)
+    export_parser.add_argument("--last-online-after", type=int)
+    export_parser.add_argument("--last-online-before", type=int)
+    export_parser.add_argument("--version-filter", help="Version regex")
+    export_parser.add_argument("--server-type", help="Server type regex")
+    export_parser.add_argument(
+        "--whitelisted", choices=("true", "false"), help="Whitelist flag"
+    )
+    export_parser.add_argument(
+        "--cracked", choices=("true", "false"), help="Cracked flag"
+    )
+
+    snapshot_parser = subparsers.add_parser(
+        "snapshot", help="Write a columnar snapshot for offline analytics"
+    )
+    snapshot_parser.add_argument(
+        "--output",
+        "-o",
+        default="servers.parquet",
+        help="Output file for the servers table",
+    )
+    snapshot_parser.add_argument(
+        "--format",
+        choices=("parquet", "arrow"),
+        default="parquet",
+        help="Parquet file or Arrow IPC stream",
+    )
+    snapshot_parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=50000,
+        help="Rows per record batch (bounds memory use)",
+    )
+
+    downsample_parser = subparsers.add_parser(
+        "downsample", help="Downsample old server history buckets"
+    )
+    downsample_parser.add_argument(
+        "--older-than-days",
+        type=int,
+        default=30,
+        help="Only downsample buckets older than this many days",
+    )
+    downsample_parser.add_argument(
+        "--resolution",
+        type=int,
+        default=3600,
+        help="Seconds per averaged sample",
+    )
+
+    archive_parser = subparsers.add_parser(
+        "archive", help="Move long-offline servers into the archive collection"
+    )
+    archive_parser.add_argument(
+        "--older-than-days",
+        type=float,
+        default=90,
+        help="Archive servers not seen online for this many days",
+    )
+    archive_parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1000,
+        help="Servers moved per batch",
+    )
+    archive_parser.add_argument(
+        "--every",
+        type=float,
+        default=None,
+        help="Keep running and re-archive every N seconds",
+    )
+
     stop_parser = subparsers.add_parser("stop", help="Stop a running scan")
     stop_parser.add_argument(
         "--pid-file",
@@ -149,9 +390,22 @@ def main(argv=None):
             show_progress=not args.no_progress,
             show_live_counter=not args.no_live_counter,
             max_active_override=args.threads,
+            seed=seed_from(args.seed) if args.seed is not None else None,
         )
         return 0
 
+    if args.command == "export":
+        return run_export(parser, args)
+
+    if args.command == "snapshot":
+        return run_snapshot(parser, args)
+
+    if args.command == "downsample":
+        return run_downsample(parser, args)
+
+    if args.command == "archive":
+        return run_archive(parser, args)
+
     if args.command == "stop":
         pid_file = args.pid_file
         if not os.path.exists(pid_file):
@@ -1,19 +1,21 @@
-import multiprocessing
+import ipaddress
+import json
+import logging
 import multiprocessing.pool
-import queue
+import os
+import re
+import signal
 import subprocess
-import sys
+import tempfile
 import threading
 import time
 import traceback
-import os
-import signal
-import ipaddress
+from bisect import bisect_right
 
-import masscan as msCan
-import pymongo
-
-import utils
+import metrics
+from autotune import RateTuner
+from permutation import SEED_MODULUS, KeyedPermutation
+from politeness import PolitenessScheduler, PrefixTable
 
 
 def get_cpu_count():
@@ -26,6 +28,7 @@ def get_cpu_count():
 useWebHook = False
 DEFAULT_PINGS_PER_SEC = 4800
 DEFAULT_MAX_ACTIVE = get_cpu_count()
+SCAN_PORTS = "25565-25577"
 masscan_search_path = (
     "masscan",
     "/usr/bin/masscan",
@@ -40,48 +43,17 @@ except ImportError:
     MONGO_URL = "mongodb+srv://..."
     DSICORD_WEBHOOK = "discord.api.com/..."
 
-
-if MONGO_URL == "mongodb+srv://...":
-    print("Please add your mongo url to privVars.py")
-    input()
-    sys.exit()
-if useWebHook and DISCORD_WEBHOOK == "discord.api.com/...":
-    print("Please add your discord webhook to privVars.py")
-    input()
-    sys.exit()
-
 # Setup
 # ---------------------------------------------
 
 DEBUG = True
 
-STOP_EVENT = threading.Event()
-
-client = pymongo.MongoClient(
-    MONGO_URL, server_api=pymongo.server_api.ServerApi("1")
-)  # type: ignore
-db = client["mc"]
-col = db["servers"]
-
-utils = utils.utils(col, debug=DEBUG)
-logger = utils.logger
-finder = utils.finder
+logger = logging.getLogger("scanCore")
+# masscan status lines look like "rate:  4.79-kpps, 12.50% done, ..."
+MASSCAN_RATE_PATTERN = re.compile(r"rate:\s*([\d.]+)-kpps")
 
-logger.info("Scanner startup")
-logger.info("MongoDB database: mc, collection: servers")
-try:
-    client.admin.command("ping")
-    logger.info("MongoDB connection: OK")
-except Exception:
-    logger.error("MongoDB connection: FAILED")
-    logger.error(traceback.format_exc())
-
-# Funcs
-# ---------------------------------------------
-
-
-def print(*args, **kwargs):
-    logger.print(*args, **kwargs)
+_default_sink = None
+_default_sink_lock = threading.Lock()
 
 
 def _get_env_int(name, default, min_value=None, max_value=None):
@@ -117,218 +89,776 @@ def get_chunk_prefix_v4():
     return value
 
 
-pingsPerSec = _get_env_int("SCAN_PINGS_PER_SEC", DEFAULT_PINGS_PER_SEC, min_value=1)
-maxActive = _get_env_int("SCAN_MAX_ACTIVE", DEFAULT_MAX_ACTIVE, min_value=1)
+def count_ports(ports):
+    """Number of ports in a masscan port spec, e.g. 13 for 25565-25577"""
+    total = 0
+    for part in str(ports).split(","):
+        low, _, high = part.strip().removeprefix("U:").partition("-")
+        try:
+            total += int(high or low) - int(low) + 1
+        except ValueError:
+            continue
+    return max(1, total)
 
 
-def check(scannedHost):
-    # example host: "127.0.0.1": [{"status": "open", "port": 25565, "proto": "tcp"}]
+def disLog(text, end="\r"):
+    if useWebHook:
+        try:
+            import requests
 
-    try:
-        if isinstance(scannedHost, dict):
-            ip = list(scannedHost.keys())[0]
-        elif isinstance(scannedHost, str):
-            ip = scannedHost
-        else:
-            raise ValueError(f"Unexpected host type: {type(scannedHost)}")
-    except Exception:
-        logger.print("Error parsing host: " + str(scannedHost))
-        logger.error(traceback.format_exc())
-        return
-
-    portsJson = (
-        scannedHost[ip]
-        if isinstance(scannedHost, dict)
-        else [{"status": "open", "port": 25565, "proto": "tcp"}]
-    )
-    for portJson in portsJson:
-        if portJson["status"] == "open":
-            if useWebHook:
-                return finder.check(
-                    host=str(ip) + ":" + str(portJson["port"]),
-                    webhook=DISCORD_WEBHOOK,
-                    full=False,
+            url = DSICORD_WEBHOOK
+            data = {"content": text + end}
+            requests.post(url, data=data)
+        except Exception:
+            logger.error(text + "\n" + traceback.format_exc())
+
+
+# Sinks
+# ---------------------------------------------
+
+
+class ScanStats:
+    """Counters of one scan
+
+    A sink and the caches behind it are shared by every scan in the process,
+    so each scan counts what it handled here instead.
+    """
+
+    def __init__(self, suppressed=None):
+        self.lock = threading.Lock()
+        self.counts = {"hosts": 0, "tarpitPorts": 0, "skippedPorts": 0, "servers": 0}
+        # the logger's sampling totals when the scan started, per file:line
+        self.suppressed_at_start = dict(suppressed or {})
+
+    def add(self, **counts):
+        with self.lock:
+            for name, value in counts.items():
+                self.counts[name] += value
+
+    def as_dict(self):
+        with self.lock:
+            return dict(self.counts)
+
+    def suppressed_since_start(self, suppressed):
+        """Records sampled out since the scan started, per file:line"""
+        return {
+            site: count - self.suppressed_at_start.get(site, 0)
+            for site, count in suppressed.items()
+            if count > self.suppressed_at_start.get(site, 0)
+        }
+
+
+class ServerSink:
+    """Probes open ports with Finder and stores the results in Mongo
+
+    One sink serves every Scanner in the process. start() only loads the
+    shared caches, which keep what concurrent scans recorded, and hands each
+    scan its own ScanStats.
+    """
+
+    def __init__(self, scan_utils, webhook=None):
+        self.utils = scan_utils
+        self.finder = scan_utils.finder
+        self.logger = scan_utils.logger
+        self.webhook = webhook
+
+    def start(self):
+        if self.utils.archive is not None:
+            self.utils.archive.ensureIndexes()
+        if self.utils.knownHosts is not None:
+            self.utils.knownHosts.ensureLoaded()
+        if self.utils.tarpits is not None:
+            self.utils.tarpits.load()
+        if self.utils.negativeCache is not None:
+            self.utils.negativeCache.load()
+        return ScanStats(self.logger.suppressed())
+
+    def handle(self, ip, ports, udp_ports=(), stats=None):
+        opened = len(ports) + len(udp_ports)
+        if self.utils.tarpits is not None:
+            ports = self.utils.tarpits.filterPorts(ip, ports)
+        unfiltered = len(ports) + len(udp_ports)
+        if self.utils.negativeCache is not None:
+            ports = [
+                port
+                for port in ports
+                if not self.utils.negativeCache.shouldSkip(ip, port)
+            ]
+            udp_ports = [
+                port
+                for port in udp_ports
+                if not self.utils.negativeCache.shouldSkip(ip, port, "udp")
+            ]
+
+        # several servers can share an ip, so every open port is probed; the
+        # first to answer is the ip's document, the others go under its ports
+        results = []
+        for port in ports:
+            if results:
+                result = self.finder.checkPort(ip, port)
+            elif self.webhook:
+                result = self.finder.check(
+                    host=str(ip) + ":" + str(port), webhook=self.webhook, full=False
                 )
             else:
-                return finder.check(
-                    host=str(ip) + ":" + str(portJson["port"]), full=False
+                result = self.finder.check(host=str(ip) + ":" + str(port), full=False)
+            if result is not None:
+                results.append(result)
+        # UDP ports come from the Bedrock ping payload masscan sent
+        for port in udp_ports:
+            result = self.finder.checkBedrock(ip, port)
+            if result is not None:
+                results.append(result)
+        if stats is not None:
+            stats.add(
+                hosts=1,
+                tarpitPorts=opened - unfiltered,
+                skippedPorts=unfiltered - len(ports) - len(udp_ports),
+                servers=len(results),
+            )
+        return results
+
+    def finish(self, stats=None):
+        if stats is not None:
+            self.logger.info("Scan stats: {}".format(stats.as_dict()))
+        if self.utils.sightings is not None:
+            self.utils.sightings.flush()
+        if self.utils.tarpits is not None:
+            self.logger.info(
+                "Tarpit stats since startup: {}".format(self.utils.tarpits.stats)
+            )
+        if self.utils.negativeCache is not None:
+            self.utils.negativeCache.flush()
+            self.logger.info(
+                "Negative cache stats since startup: {}".format(
+                    self.utils.negativeCache.stats
+                )
+            )
+        if self.utils.corpus is not None:
+            self.utils.corpus.flush()
+            self.logger.info(
+                "Captured {} status responses to {}".format(
+                    self.utils.corpus.recorded, self.utils.corpus.path
+                )
+            )
+        if stats is None:
+            return
+        # sampling is per call site, so records other scans dropped while
+        # this one ran are counted here too
+        suppressed = stats.suppressed_since_start(self.logger.suppressed())
+        if suppressed:
+            self.logger.info(
+                "Sampled out {} log records during the scan: {}".format(
+                    sum(suppressed.values()),
+                    ", ".join(
+                        f"{os.path.basename(site)} x{count}"
+                        for site, count in sorted(
+                            suppressed.items(), key=lambda item: -item[1]
+                        )[:10]
+                    ),
                 )
-    else:
-        return
+            )
 
 
-def scan(ip_list, show_live_counter=False):
-    if STOP_EVENT.is_set():
-        return []
-    if show_live_counter:
-        return scan_live(ip_list)
+def get_default_sink():
+    """Connects to Mongo on first use and returns the shared ServerSink"""
+    global _default_sink
+    if _default_sink is not None:
+        return _default_sink
+    with _default_sink_lock:
+        if _default_sink is not None:
+            return _default_sink
+        if MONGO_URL == "mongodb+srv://...":
+            raise RuntimeError("Please add your mongo url to privVars.py")
+        if useWebHook and DISCORD_WEBHOOK == "discord.api.com/...":
+            raise RuntimeError("Please add your discord webhook to privVars.py")
+
+        import pymongo
+
+        import utils
+
+        client = pymongo.MongoClient(
+            MONGO_URL, server_api=pymongo.server_api.ServerApi("1")
+        )  # type: ignore
+        scan_utils = utils.utils(
+            client["mc"]["servers"],
+            debug=DEBUG,
+            corpusPath=os.getenv("SCAN_CAPTURE_CORPUS") or None,
+        )
+        scan_logger = scan_utils.logger
+        scan_logger.info("Scanner startup")
+        scan_logger.info("MongoDB database: mc, collection: servers")
+        try:
+            client.admin.command("ping")
+            scan_logger.info("MongoDB connection: OK")
+        except Exception:
+            scan_logger.error("MongoDB connection: FAILED")
+            scan_logger.error(traceback.format_exc())
+
+        if scan_utils.tarpits is not None:
+            scan_utils.tarpits.portThreshold = _get_env_int(
+                "SCAN_TARPIT_PORT_THRESHOLD",
+                scan_utils.tarpits.portThreshold,
+                min_value=2,
+            )
+            scan_utils.tarpits.ttlDays = _get_env_int(
+                "SCAN_TARPIT_TTL_DAYS", scan_utils.tarpits.ttlDays, min_value=1
+            )
+        _default_sink = ServerSink(
+            scan_utils, webhook=DISCORD_WEBHOOK if useWebHook else None
+        )
+        return _default_sink
 
-    try:
-        scanner = msCan.PortScanner(masscan_search_path=masscan_search_path)
-    except msCan.PortScannerError as exc:
-        print(f"Masscan not found, please install it ({exc})")
-        return []
 
-    try:
-        import json
+# Scanner
+# ---------------------------------------------
 
-        logger.info(f"Masscan start (python): {ip_list}")
-        scanner.scan(
-            ip_list,
-            ports="25565-25577",
-            arguments="--max-rate {}".format(pingsPerSec / maxActive),
-            sudo=False,
+
+class ScanConfig:
+    """Rate budget and target layout for one scan"""
+
+    def __init__(
+        self,
+        pings_per_sec=DEFAULT_PINGS_PER_SEC,
+        max_active=DEFAULT_MAX_ACTIVE,
+        chunk_prefix_v4=None,
+        ports=SCAN_PORTS,
+        udp_ports=None,
+        show_live_counter=False,
+        seed=None,
+        prefix_rate=None,
+        asn_rate=None,
+        asn_table=None,
+        autotune=False,
+        min_rate=None,
+        max_rate=None,
+        interface=None,
+    ):
+        self.pings_per_sec = pings_per_sec
+        self.max_active = max_active
+        self.chunk_prefix_v4 = chunk_prefix_v4
+        self.ports = ports
+        # UDP ports get a Bedrock unconnected ping, e.g. "19132"
+        self.udp_ports = udp_ports
+        self._payload_file = None
+        self.show_live_counter = show_live_counter
+        # when set, chunks and the addresses inside them are scanned in a
+        # keyed pseudo-random order instead of sequentially; masscan and the
+        # chunk order both take 64-bit seeds, so larger ones wrap around
+        self.seed = None if seed is None else seed % SEED_MODULUS
+        # packets per second allowed into one /16 and one origin ASN across
+        # all workers; asn_table is a "prefix,asn" CSV used for the latter
+        self.prefix_rate = prefix_rate
+        self.asn_rate = asn_rate
+        self.asn_table = asn_table
+        # let a RateTuner move pings_per_sec between min_rate and max_rate,
+        # watching tx drops on interface when it is set
+        self.autotune = autotune
+        self.min_rate = min_rate or max(1, pings_per_sec // 4)
+        self.max_rate = max_rate or pings_per_sec * 2
+        self.interface = interface
+
+    @property
+    def polite(self):
+        return bool(self.prefix_rate or self.asn_rate)
+
+    @classmethod
+    def from_env(cls, max_active_override=None, **kwargs):
+        """Reads the SCAN_* environment variables documented in SCANNER_CLI.md"""
+        max_active = _get_env_int("SCAN_MAX_ACTIVE", DEFAULT_MAX_ACTIVE, min_value=1)
+        if max_active_override is not None:
+            detected_cpus = get_cpu_count()
+            if max_active_override > detected_cpus:
+                logger.warning(
+                    "Requested maxActive {} exceeds available CPUs {}; clamping".format(
+                        max_active_override, detected_cpus
+                    )
+                )
+                max_active = detected_cpus
+            else:
+                max_active = max_active_override
+        kwargs.setdefault("chunk_prefix_v4", get_chunk_prefix_v4())
+        kwargs.setdefault("seed", _get_env_int("SCAN_SEED", None, min_value=0))
+        kwargs.setdefault(
+            "prefix_rate", _get_env_int("SCAN_PREFIX_RATE", None, min_value=1)
+        )
+        kwargs.setdefault("asn_rate", _get_env_int("SCAN_ASN_RATE", None, min_value=1))
+        kwargs.setdefault("asn_table", os.getenv("SCAN_ASN_TABLE") or None)
+        kwargs.setdefault(
+            "autotune", bool(_get_env_int("SCAN_AUTOTUNE", 0, min_value=0))
+        )
+        kwargs.setdefault(
+            "min_rate", _get_env_int("SCAN_AUTOTUNE_MIN_RATE", None, min_value=1)
+        )
+        kwargs.setdefault(
+            "max_rate", _get_env_int("SCAN_AUTOTUNE_MAX_RATE", None, min_value=1)
+        )
+        kwargs.setdefault("interface", os.getenv("SCAN_AUTOTUNE_IFACE") or None)
+        kwargs.setdefault("udp_ports", os.getenv("SCAN_UDP_PORTS") or None)
+        return cls(
+            pings_per_sec=_get_env_int(
+                "SCAN_PINGS_PER_SEC", DEFAULT_PINGS_PER_SEC, min_value=1
+            ),
+            max_active=max_active,
+            **kwargs,
         )
-        if STOP_EVENT.is_set():
-            return []
-        result = json.loads(scanner.scan_result)
-        logger.info(f"Masscan complete (python): {ip_list}")
-
-        return list(result["scan"])
-    except OSError:
-        logger.error("Masscan failed with OSError")
-        logger.error(traceback.format_exc())
-        return []
-    except Exception:
-        logger.error(traceback.format_exc())
-        return []
 
+    @property
+    def worker_rate(self):
+        # each masscan process gets an equal share of the scan's budget
+        return self.pings_per_sec / self.max_active
+
+    @property
+    def port_spec(self):
+        if not self.udp_ports:
+            return self.ports
+        udp = ",".join(f"U:{port.strip()}" for port in self.udp_ports.split(","))
+        return f"{self.ports},{udp}"
+
+    def payload_file(self):
+        """Writes the nmap-payloads file masscan sends to the UDP ports"""
+        if self._payload_file is None:
+            from utils.engine import BedrockCodec
+
+            payload = "".join(f"\\x{byte:02x}" for byte in BedrockCodec.request())
+            with tempfile.NamedTemporaryFile(
+                "w", suffix=".payloads", delete=False
+            ) as handle:
+                handle.write(f'udp {self.udp_ports} "{payload}"\n')
+            self._payload_file = handle.name
+        return self._payload_file
+
+    def remove_payload_file(self):
+        """Deletes the payloads file once the scan using it is over"""
+        if self._payload_file is None:
+            return
+        try:
+            os.remove(self._payload_file)
+        except OSError:
+            pass
+        self._payload_file = None
+
+    def masscan_arguments(self, rate=None):
+        arguments = ["--max-rate", str(rate or self.worker_rate)]
+        if self.seed is not None:
+            # masscan shuffles addresses with blackrock keyed by --seed
+            arguments += ["--seed", str(self.seed)]
+        if self.udp_ports:
+            arguments += ["--nmap-payloads", self.payload_file()]
+        return arguments
+
+
+class Scanner:
+    """One masscan sweep feeding open ports into a sink
+
+    Scanners share nothing but the sink, so several can run in one process,
+    each with its own rate budget, cancellation token and ScanStats.
+    """
+
+    def __init__(self, config=None, sink=None, stop_event=None, scan_logger=None):
+        self.config = config or ScanConfig.from_env()
+        self._sink = sink
+        self.stop_event = stop_event or threading.Event()
+        self.logger = scan_logger or logger
+        # set while run() hands out chunks under per-destination caps
+        self.scheduler = None
+        self.tuner = None
+        # this scan's counters, handed out by the sink when run() starts
+        self.stats = None
+
+    @property
+    def sink(self):
+        if self._sink is None:
+            self._sink = get_default_sink()
+        return self._sink
+
+    @property
+    def worker_rate(self):
+        if self.tuner is None:
+            return self.config.worker_rate
+        return self.tuner.rate / self.config.max_active
+
+    def stop(self):
+        self.stop_event.set()
+
+    @property
+    def stopped(self):
+        return self.stop_event.is_set()
+
+    def check(self, scannedHost):
+        # example host: "127.0.0.1": [{"status": "open", "port": 25565, "proto": "tcp"}]
+        try:
+            if isinstance(scannedHost, dict):
+                ip = list(scannedHost.keys())[0]
+            elif isinstance(scannedHost, str):
+                ip = scannedHost
+            else:
+                raise ValueError(f"Unexpected host type: {type(scannedHost)}")
+        except Exception:
+            self.logger.error("Error parsing host: " + str(scannedHost))
+            self.logger.error(traceback.format_exc())
+            return []
 
-def scan_live(ip_list):
-    try:
-        from tqdm import tqdm
-    except Exception:
-        tqdm = None
-
-    cmd = [
-        "masscan",
-        ip_list,
-        "-p",
-        "25565-25577",
-        "--max-rate",
-        str(pingsPerSec / maxActive),
-        "--output-format",
-        "list",
-        "--output-filename",
-        "-",
-    ]
-    try:
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1,
+        portsJson = (
+            scannedHost[ip]
+            if isinstance(scannedHost, dict)
+            else [{"status": "open", "port": 25565, "proto": "tcp"}]
         )
-    except FileNotFoundError:
-        logger.error("Masscan not found in PATH")
-        return []
-    except Exception:
-        logger.error("Failed to start masscan")
-        logger.error(traceback.format_exc())
-        return []
+        open_ports = [
+            (portJson.get("proto", "tcp"), portJson["port"])
+            for portJson in portsJson
+            if portJson["status"] == "open"
+        ]
+        ports = sorted({port for proto, port in open_ports if proto != "udp"})
+        udp_ports = sorted({port for proto, port in open_ports if proto == "udp"})
+        if ports:
+            metrics.OPEN_PORTS.labels("tcp").inc(len(ports))
+        if udp_ports:
+            metrics.OPEN_PORTS.labels("udp").inc(len(udp_ports))
+        if self.stopped or not (ports or udp_ports):
+            return []
+        return self.sink.handle(ip, ports, udp_ports, self.stats)
 
-    logger.info(f"Masscan start (subprocess): {ip_list}")
-    counter = None
-    if tqdm:
-        counter = tqdm(desc="Open hosts", unit="host", dynamic_ncols=True)
+    def scan(self, ip_list, rate=None, stats=None):
+        if self.stopped:
+            return []
+        if self.config.show_live_counter:
+            return self.scan_live(ip_list, rate=rate, stats=stats)
 
-    results = {}
-    try:
-        for raw_line in process.stdout:
-            if STOP_EVENT.is_set():
-                break
-            line = raw_line.strip()
-            if not line:
-                continue
-            if line.startswith("open "):
-                parts = line.split()
-                if len(parts) >= 4:
-                    port = int(parts[2])
-                    ip = parts[3]
-                    if ip not in results:
-                        results[ip] = []
-                    results[ip].append(
-                        {"status": "open", "port": port, "proto": "tcp"}
-                    )
-                    if counter is not None:
-                        counter.update(1)
-        if STOP_EVENT.is_set():
-            process.terminate()
-        process.wait()
-    finally:
-        if counter is not None:
-            counter.close()
-
-    logger.info(
-        "Masscan complete (subprocess): {} (exit code {}, open hosts {})".format(
-            ip_list, process.returncode, len(results)
-        )
-    )
-    return [{ip: ports} for ip, ports in results.items()]
+        import masscan as msCan
 
+        try:
+            scanner = msCan.PortScanner(masscan_search_path=masscan_search_path)
+        except msCan.PortScannerError as exc:
+            self.logger.error(f"Masscan not found, please install it ({exc})")
+            return []
 
-def disLog(text, end="\r"):
-    if useWebHook:
         try:
-            import requests
+            self.logger.info(f"Masscan start (python): {ip_list}")
+            scanner.scan(
+                ip_list,
+                ports=self.config.port_spec,
+                arguments=" ".join(self.config.masscan_arguments(rate)),
+                sudo=False,
+            )
+            if self.stopped:
+                return []
+            result = json.loads(scanner.scan_result)
+            self.logger.info(f"Masscan complete (python): {ip_list}")
+
+            return [{ip: ports} for ip, ports in result["scan"].items()]
+        except OSError:
+            self.logger.error("Masscan failed with OSError")
+            self.logger.error(traceback.format_exc())
+            return []
+        except Exception:
+            self.logger.error(traceback.format_exc())
+            return []
 
-            url = DSICORD_WEBHOOK
-            data = {"content": text + end}
-            requests.post(url, data=data)
+    def scan_live(self, ip_list, rate=None, stats=None):
+        try:
+            from tqdm import tqdm
         except Exception:
-            logger.error(text + "\n" + traceback.format_exc())
+            tqdm = None
 
+        cmd = [
+            "masscan",
+            ip_list,
+            "-p",
+            self.config.port_spec,
+            *self.config.masscan_arguments(rate),
+            "--output-format",
+            "list",
+            "--output-filename",
+            "-",
+        ]
+        try:
+            process = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                bufsize=1,
+            )
+        except FileNotFoundError:
+            self.logger.error("Masscan not found in PATH")
+            return []
+        except Exception:
+            self.logger.error("Failed to start masscan")
+            self.logger.error(traceback.format_exc())
+            return []
 
-def _scan_subnet(
-    ip_range,
-    show_live_counter=False,
-    progress_callback=None,
-):
-    try:
-        if STOP_EVENT.is_set():
-            return
-        logger.info(f"Scan worker start: {ip_range}")
-        ips = scan(ip_range, show_live_counter=show_live_counter)
-        logger.info(f"Scan worker complete: {ip_range} (open hosts {len(ips)})")
+        self.logger.info(f"Masscan start (subprocess): {ip_list}")
+        counter = None
+        if tqdm:
+            counter = tqdm(desc="Open hosts", unit="host", dynamic_ncols=True)
 
-        if len(ips) > 0:
-            pool = multiprocessing.pool.ThreadPool(max(1, maxActive // 2))
+        results = {}
+        try:
+            for raw_line in process.stdout:
+                if self.stopped:
+                    break
+                line = raw_line.strip()
+                if not line:
+                    continue
+                if stats is not None and line.startswith("rate:"):
+                    match = MASSCAN_RATE_PATTERN.match(line)
+                    if match:
+                        stats["reportedRate"] = float(match.group(1)) * 1000
+                    continue
+                if line.startswith("open "):
+                    # open <proto> <port> <ip> <timestamp>
+                    parts = line.split()
+                    if len(parts) >= 4:
+                        port = int(parts[2])
+                        ip = parts[3]
+                        if ip not in results:
+                            results[ip] = []
+                        results[ip].append(
+                            {"status": "open", "port": port, "proto": parts[1]}
+                        )
+                        if counter is not None:
+                            counter.update(1)
+            if self.stopped:
+                process.terminate()
+            process.wait()
+        finally:
+            if counter is not None:
+                counter.close()
+
+        self.logger.info(
+            "Masscan complete (subprocess): {} (exit code {}, open hosts {})".format(
+                ip_list, process.returncode, len(results)
+            )
+        )
+        return [{ip: ports} for ip, ports in results.items()]
+
+    def _scan_subnet(self, ip_range, progress_callback=None, rate=None):
+        try:
+            if self.stopped:
+                return
+            self.logger.info(f"Scan worker start: {ip_range}")
+            rate = rate or self.worker_rate
+            stats = {}
+            started = time.time()
+            metrics.SCAN_CHUNKS_ACTIVE.inc()
             try:
-                pool.map(check, ips)
+                with metrics.MASSCAN_SECONDS.time():
+                    ips = self.scan(ip_range, rate=rate, stats=stats)
             finally:
-                pool.close()
-                pool.join()
-        if progress_callback is not None:
-            try:
-                hosts_scanned = ipaddress.ip_network(
-                    ip_range, strict=False
-                ).num_addresses
-            except Exception:
-                hosts_scanned = 0
-            progress_callback(ip_range, hosts_scanned)
-    except OSError:
-        logger.error("Scan worker encountered OSError")
-        logger.error(traceback.format_exc())
-        return
-    except Exception:
-        logger.error(traceback.format_exc())
+                metrics.SCAN_CHUNKS_ACTIVE.dec()
+            self.logger.info(
+                f"Scan worker complete: {ip_range} (open hosts {len(ips)})"
+            )
+            if self.tuner is not None and not self.stopped:
+                self._tune(ip_range, ips, time.time() - started, rate, stats)
 
+            if len(ips) > 0:
+                pool = multiprocessing.pool.ThreadPool(
+                    max(1, self.config.max_active // 2)
+                )
+                pending = len(ips)
+                metrics.HOSTS_PENDING.inc(pending)
+                try:
+                    # results are stored by the sink, holding them here would
+                    # keep every probed document alive until the chunk ends
+                    for _ in pool.imap_unordered(self.check, ips):
+                        pending -= 1
+                        metrics.HOSTS_PENDING.dec()
+                finally:
+                    pool.close()
+                    pool.join()
+                    metrics.HOSTS_PENDING.dec(pending)
+            metrics.SCAN_CHUNKS.labels("stopped" if self.stopped else "done").inc()
+            if progress_callback is not None:
+                try:
+                    hosts_scanned = ipaddress.ip_network(
+                        ip_range, strict=False
+                    ).num_addresses
+                except Exception:
+                    hosts_scanned = 0
+                progress_callback(ip_range, hosts_scanned)
+        except OSError:
+            metrics.SCAN_CHUNKS.labels("error").inc()
+            self.logger.error("Scan worker encountered OSError")
+            self.logger.error(traceback.format_exc())
+            return
+        except Exception:
+            metrics.SCAN_CHUNKS.labels("error").inc()
+            self.logger.error(traceback.format_exc())
 
-def _scan_worker(work_queue, show_live_counter=False, progress_callback=None):
-    while not STOP_EVENT.is_set():
+    def _tune(self, ip_range, ips, seconds, rate, stats):
         try:
-            ip_range = work_queue.get_nowait()
-        except queue.Empty:
+            addresses = ipaddress.ip_network(ip_range, strict=False).num_addresses
+        except ValueError:
             return
+        self.tuner.observe(
+            addresses * count_ports(self.config.port_spec),
+            sum(len(ports) for host in ips for ports in host.values()),
+            seconds,
+            rate,
+            reported_rate=stats.get("reportedRate"),
+        )
+        if self.scheduler is not None:
+            self.scheduler.worker_rate = self.worker_rate
+
+    def _scan_worker(self, chunks, chunks_lock, progress_callback=None):
+        while not self.stopped:
+            with chunks_lock:
+                ip_range = next(chunks, None)
+            if ip_range is None:
+                return
+            self._scan_subnet(ip_range, progress_callback=progress_callback)
+
+    def _polite_worker(self, scheduler, progress_callback=None):
+        while not self.stopped:
+            lease = scheduler.acquire(self.stop_event)
+            if lease is None:
+                return
+            try:
+                self._scan_subnet(
+                    lease.chunk, progress_callback=progress_callback, rate=lease.rate
+                )
+            finally:
+                scheduler.release(lease)
+
+    def _load_prefix_table(self):
+        if not self.config.asn_table:
+            return None
         try:
-            _scan_subnet(
-                ip_range,
-                show_live_counter=show_live_counter,
-                progress_callback=progress_callback,
+            table = PrefixTable.load(self.config.asn_table)
+        except OSError:
+            self.logger.error(
+                f"Could not read ASN table {self.config.asn_table}; "
+                "per-ASN caps disabled"
             )
+            return None
+        self.logger.info(f"Loaded {len(table)} ASN prefixes")
+        return table
+
+    def run(
+        self,
+        ip_lists,
+        show_progress=False,
+        progress_callback=None,
+        already_chunked=False,
+    ):
+        """Scans ip_lists with config.max_active masscan workers
+
+        Args:
+            ip_lists (list | ScanTargets): CIDRs or prepared targets to scan
+            show_progress (bool, optional): show a tqdm bar per subnet. Defaults to False.
+            progress_callback (callable, optional): called with (subnet, hosts_scanned)
+            already_chunked (bool, optional): skip chunking ip_lists. Defaults to False.
+        """
+        config = self.config
+        if not isinstance(ip_lists, ScanTargets):
+            ip_lists = ScanTargets(
+                ip_lists, None if already_chunked else config.chunk_prefix_v4
+            )
+        if not ip_lists:
+            self.logger.warning("No scan targets after preparation; exiting")
+            return
+        worker_count = min(config.max_active, len(ip_lists))
+        self.logger.info(
+            "Scan config: subnets={}, maxActive={}, pingsPerSec={}, "
+            "progress={}, liveCounter={}, detectedCPUs={}, chunkPrefixV4={}, "
+            "seed={}, prefixRate={}, asnRate={}, autotune={}".format(
+                len(ip_lists),
+                config.max_active,
+                config.pings_per_sec,
+                show_progress,
+                config.show_live_counter,
+                get_cpu_count(),
+                config.chunk_prefix_v4,
+                config.seed,
+                config.prefix_rate,
+                config.asn_rate,
+                config.autotune,
+            )
+        )
+        progress_counter = None
+        if show_progress:
+            try:
+                from tqdm import tqdm
+
+                progress_counter = tqdm(
+                    total=len(ip_lists), desc="Subnets", unit="subnet"
+                )
+            except Exception:
+                progress_counter = None
+
+        def _wrapped_progress(subnet, hosts_scanned):
+            if progress_callback is not None:
+                progress_callback(subnet, hosts_scanned)
+            if progress_counter is not None:
+                progress_counter.update(1)
+
+        sink = self.sink
+        self.stats = sink.start()
+
+        if config.autotune:
+            self.tuner = RateTuner(
+                config.pings_per_sec,
+                config.min_rate,
+                config.max_rate,
+                interface=config.interface,
+                scan_logger=self.logger,
+            )
+
+        # workers pull chunks from one shared iterator, nothing is queued ahead;
+        # a keyed order keeps adjacent chunks of one network from being
+        # scanned at the same time while staying reproducible per seed
+        order = None
+        if config.seed is not None:
+            order = KeyedPermutation(len(ip_lists), config.seed)
+        chunks = ip_lists.iter_chunks(order)
+        if config.polite:
+            # a busy /16 or ASN only delays its own chunks; workers move on
+            # to other destinations so the global rate is still used
+            self.scheduler = PolitenessScheduler(
+                chunks,
+                self.worker_rate,
+                prefix_rate=config.prefix_rate,
+                asn_rate=config.asn_rate,
+                prefix_table=self._load_prefix_table(),
+            )
+            target = self._polite_worker
+            args = (self.scheduler, _wrapped_progress)
+        else:
+            target = self._scan_worker
+            args = (chunks, threading.Lock(), _wrapped_progress)
+
+        worker_threads = []
+        for idx in range(worker_count):
+            t = threading.Thread(
+                target=target, args=args, name=f"Scan worker {idx + 1}"
+            )
+            worker_threads.append(t)
+            t.start()
+
+        try:
+            for t in worker_threads:
+                t.join()
+            sink.finish(self.stats)
         finally:
-            work_queue.task_done()
+            config.remove_payload_file()
+        if self.scheduler is not None:
+            self.logger.info(
+                "Destination stats: {}".format(json.dumps(self.scheduler.snapshot(10)))
+            )
+        if self.tuner is not None:
+            self.logger.info(
+                "Autotune curve: {}".format(
+                    " ".join(
+                        "{:.0f}".format(entry["nextRate"])
+                        for entry in self.tuner.snapshot()
+                    )
+                    or "no full window"
+                )
+            )
+        if progress_counter is not None:
+            progress_counter.close()
 
 
 # Main
@@ -346,8 +876,6 @@ def get_default_ip_lists():
     ]
 
 
-
-
 def _parse_network(cidr):
     try:
         return ipaddress.ip_network(cidr, strict=False)
@@ -356,22 +884,73 @@ def _parse_network(cidr):
         return None
 
 
-def prepare_ip_lists(ip_lists, chunk_prefix_v4=None):
-    prepared = []
-    host_count = 0
-    for cidr in ip_lists:
-        net = _parse_network(cidr)
-        if net is None:
-            continue
-        host_count += net.num_addresses
-        if net.version == 4 and chunk_prefix_v4 is not None:
-            if net.prefixlen < chunk_prefix_v4:
-                prepared.extend(
-                    str(chunk) for chunk in net.subnets(new_prefix=chunk_prefix_v4)
-                )
+class ScanTargets:
+    """Indexable, lazily expanded list of the chunks a scan covers
+
+    Only the parsed networks and a running chunk offset per network are kept,
+    so a /0 split into /24s costs a few bytes instead of 16.7M strings. Chunk
+    strings are built on demand by index.
+    """
+
+    def __init__(self, ip_lists, chunk_prefix_v4=None):
+        self.chunk_prefix_v4 = chunk_prefix_v4
+        self.host_count = 0
+        self._networks = []
+        self._prefixes = []
+        self._offsets = []
+        total = 0
+        for cidr in ip_lists:
+            net = _parse_network(cidr)
+            if net is None:
                 continue
-        prepared.append(str(net))
-    return prepared, host_count
+            self.host_count += net.num_addresses
+            prefix = None
+            chunks = 1
+            if (
+                net.version == 4
+                and chunk_prefix_v4 is not None
+                and net.prefixlen < chunk_prefix_v4
+            ):
+                prefix = chunk_prefix_v4
+                chunks = 1 << (chunk_prefix_v4 - net.prefixlen)
+            self._networks.append(net)
+            self._prefixes.append(prefix)
+            self._offsets.append(total)
+            total += chunks
+        self._len = total
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("chunk index out of range")
+        idx = bisect_right(self._offsets, index) - 1
+        net = self._networks[idx]
+        prefix = self._prefixes[idx]
+        if prefix is None:
+            return str(net)
+        offset = (index - self._offsets[idx]) << (32 - prefix)
+        return f"{ipaddress.IPv4Address(int(net.network_address) + offset)}/{prefix}"
+
+    def __iter__(self):
+        return self.iter_chunks()
+
+    def iter_chunks(self, order=None):
+        """Yields chunk strings, in order or as picked by order(index)
+
+        Args:
+            order (callable, optional): maps 0..len-1 onto a permutation of itself
+        """
+        for index in range(self._len):
+            yield self[index if order is None else order(index)]
+
+
+def prepare_ip_lists(ip_lists, chunk_prefix_v4=None):
+    targets = ScanTargets(ip_lists, chunk_prefix_v4=chunk_prefix_v4)
+    return targets, targets.host_count
 
 
 def run_scanner(
@@ -382,83 +961,38 @@ def run_scanner(
     progress_callback=None,
     chunk_prefix_v4=None,
     already_chunked=False,
+    stop_event=None,
+    seed=None,
 ):
+    """Runs one Scanner with the environment config and the default sink
+
+    Returns:
+        Scanner: the finished scanner, stopped is True if it was cancelled
+    """
+    config = ScanConfig.from_env(
+        max_active_override=max_active_override,
+        show_live_counter=show_live_counter,
+    )
+    if chunk_prefix_v4 is not None:
+        config.chunk_prefix_v4 = chunk_prefix_v4
+    if seed is not None:
+        config.seed = seed
+    scanner = Scanner(config, stop_event=stop_event)
+
     def _handle_stop(signum, frame):
         logger.warning("Stop signal received; shutting down")
-        STOP_EVENT.set()
+        scanner.stop()
 
     if threading.current_thread() is threading.main_thread():
         signal.signal(signal.SIGINT, _handle_stop)
         signal.signal(signal.SIGTERM, _handle_stop)
-    ip_lists = ip_lists_override or get_default_ip_lists()
-    time.sleep(0.5)
-    detected_cpus = get_cpu_count()
-    if max_active_override is not None:
-        global maxActive
-        if max_active_override > detected_cpus:
-            logger.warning(
-                "Requested maxActive {} exceeds available CPUs {}; clamping".format(
-                    max_active_override, detected_cpus
-                )
-            )
-            maxActive = detected_cpus
-        else:
-            maxActive = max_active_override
-    if chunk_prefix_v4 is None:
-        chunk_prefix_v4 = get_chunk_prefix_v4()
-    if not already_chunked and chunk_prefix_v4 is not None:
-        ip_lists, _ = prepare_ip_lists(ip_lists, chunk_prefix_v4=chunk_prefix_v4)
-    if not ip_lists:
-        logger.warning("No scan targets after preparation; exiting")
-        return
-    worker_count = min(maxActive, len(ip_lists))
-    logger.info(
-        "Scan config: subnets={}, maxActive={}, pingsPerSec={}, "
-        "progress={}, liveCounter={}, detectedCPUs={}, chunkPrefixV4={}".format(
-            len(ip_lists),
-            maxActive,
-            pingsPerSec,
-            show_progress,
-            show_live_counter,
-            detected_cpus,
-            chunk_prefix_v4,
-        )
+    scanner.run(
+        ip_lists_override or get_default_ip_lists(),
+        show_progress=show_progress,
+        progress_callback=progress_callback,
+        already_chunked=already_chunked,
     )
-    progress_counter = None
-    if show_progress:
-        try:
-            from tqdm import tqdm
-
-            progress_counter = tqdm(
-                total=len(ip_lists), desc="Subnets", unit="subnet"
-            )
-        except Exception:
-            progress_counter = None
-
-    def _wrapped_progress(subnet, hosts_scanned):
-        if progress_callback is not None:
-            progress_callback(subnet, hosts_scanned)
-        if progress_counter is not None:
-            progress_counter.update(1)
-
-    work_queue = queue.Queue()
-    for ip_list in ip_lists:
-        work_queue.put(ip_list)
-
-    worker_threads = []
-    for idx in range(worker_count):
-        t = threading.Thread(
-            target=_scan_worker,
-            args=(work_queue, show_live_counter, _wrapped_progress),
-            name=f"Scan worker {idx + 1}",
-        )
-        worker_threads.append(t)
-        t.start()
-
-    for t in worker_threads:
-        t.join()
-    if progress_counter is not None:
-        progress_counter.close()
+    return scanner
 
 
 if __name__ == "__main__":
@@ -7,15 +7,18 @@ import time
 import uuid
 from typing import Dict, List, Optional, Tuple
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 
+import metrics
 import scanCore
+from permutation import seed_from
 
 app = Flask(__name__)
 
 _scan_lock = threading.Lock()
 _scans: Dict[str, dict] = {}
-_active_scan_id: Optional[str] = None
+_scanners: Dict[str, scanCore.Scanner] = {}
+_max_concurrent_scans = max(1, int(os.getenv("SCANNER_MAX_CONCURRENT_SCANS", "1")))
 _avg_hosts_per_second = 0.0
 
 
@@ -52,8 +55,8 @@ def _estimate_seconds(hosts: int) -> Optional[int]:
     return int(hosts / _avg_hosts_per_second)
 
 
-def _run_scan(scan_id: str, subnets: List[str], max_active: Optional[int]) -> None:
-    global _avg_hosts_per_second, _active_scan_id
+def _run_scan(scan_id: str, subnets: List[str], scanner: scanCore.Scanner) -> None:
+    global _avg_hosts_per_second
     started_at = time.time()
 
     try:
@@ -71,12 +74,9 @@ def _run_scan(scan_id: str, subnets: List[str], max_active: Optional[int]) -> No
             _scans[scan_id]["subnetsDone"] = 0
             _scans[scan_id]["hostsDone"] = 0
 
-        scanCore.STOP_EVENT = threading.Event()
-        scanCore.run_scanner(
-            ip_lists_override=subnets,
+        scanner.run(
+            subnets,
             show_progress=False,
-            show_live_counter=False,
-            max_active_override=max_active,
             progress_callback=progress_callback,
             already_chunked=True,
         )
@@ -87,7 +87,7 @@ def _run_scan(scan_id: str, subnets: List[str], max_active: Optional[int]) -> No
             _avg_hosts_per_second = (host_count / duration + _avg_hosts_per_second) / 2
         with _scan_lock:
             _scans[scan_id]["status"] = (
-                "stopped" if scanCore.STOP_EVENT.is_set() else "completed"
+                "stopped" if scanner.stopped else "completed"
             )
             _scans[scan_id]["finishedAt"] = finished_at
             _scans[scan_id]["durationSeconds"] = int(duration)
@@ -97,12 +97,15 @@ def _run_scan(scan_id: str, subnets: List[str], max_active: Optional[int]) -> No
             _scans[scan_id]["error"] = str(exc)
     finally:
         with _scan_lock:
-            _active_scan_id = None
+            _scanners.pop(scan_id, None)
+            if scanner.scheduler is not None:
+                _scans[scan_id]["destinations"] = scanner.scheduler.snapshot()
+            if scanner.tuner is not None:
+                _scans[scan_id]["rateHistory"] = scanner.tuner.snapshot()
 
 
 @app.post("/control/scans")
 def start_scan():
-    global _active_scan_id
     payload = request.get_json(silent=True) or {}
     subnets = _parse_subnets(payload)
     if not subnets:
@@ -124,10 +127,16 @@ def start_scan():
         return jsonify({"error": "subnets required"}), 400
 
     with _scan_lock:
-        if _active_scan_id is not None:
+        if len(_scanners) >= _max_concurrent_scans:
             return jsonify({"error": "scan already running"}), 409
 
         scan_id = payload.get("scanId") or str(uuid.uuid4())
+        # the order depends only on the scan id, so a resumed scan repeats it
+        config = scanCore.ScanConfig.from_env(
+            max_active_override=payload.get("maxActive"),
+            chunk_prefix_v4=chunk_prefix_v4,
+            seed=seed_from(scan_id),
+        )
         scan_data = {
             "scanId": scan_id,
             "subnets": normalized,
@@ -137,12 +146,13 @@ def start_scan():
             "totalSubnets": len(prepared_subnets),
             "estimatedSeconds": _estimate_seconds(host_count),
         }
+        scanner = scanCore.Scanner(config)
         _scans[scan_id] = scan_data
-        _active_scan_id = scan_id
+        _scanners[scan_id] = scanner
 
     thread = threading.Thread(
         target=_run_scan,
-        args=(scan_id, prepared_subnets, payload.get("maxActive")),
+        args=(scan_id, prepared_subnets, scanner),
         daemon=True,
     )
     thread.start()
@@ -167,11 +177,34 @@ def stop_scan(scan_id: str):
         if scan.get("status") not in {"queued", "running"}:
             return jsonify({"error": "scan not running"}), 409
         scan["status"] = "stopping"
+        scanner = _scanners.get(scan_id)
 
-    scanCore.STOP_EVENT.set()
+    if scanner is not None:
+        scanner.stop()
     return jsonify({"status": "stopping"})
 
 
+@app.get("/control/scans/<scan_id>/destinations")
+def scan_destinations(scan_id: str):
+    with _scan_lock:
+        scan = _scans.get(scan_id)
+        if scan is None:
+            return jsonify({"error": "not found"}), 404
+        scanner = _scanners.get(scan_id)
+        snapshot = scan.get("destinations")
+    top = request.args.get("top", default=20, type=int)
+    if scanner is not None and scanner.scheduler is not None:
+        snapshot = scanner.scheduler.snapshot(top=max(1, top))
+    if snapshot is None:
+        return jsonify({"error": "per-destination caps not enabled"}), 404
+    return jsonify(snapshot)
+
+
+@app.get("/metrics")
+def scrape_metrics():
+    return Response(metrics.expose(), content_type=metrics.CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     port = int(os.getenv("SCANNER_CONTROL_PORT", "8081"))
     app.run(host="0.0.0.0", port=port)
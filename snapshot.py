@@ -0,0 +1,217 @@
+"""Columnar snapshots of the server collection for offline analytics.
+
+Documents are streamed from Mongo in fixed-size batches and written as Parquet
+(or an Arrow IPC stream), so memory use is bounded by the batch size rather
+than the collection size. Low-cardinality strings such as versions and MOTDs
+are dictionary-encoded.
+"""
+
+import os
+import time
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional analytics dependency
+    pa = None
+    pq = None
+
+DEFAULT_BATCH_SIZE = 50000
+SIGHTINGS_COLLECTION = "sightings"
+
+# (field, kind) pairs; "dict" columns are dictionary-encoded strings.
+SERVER_COLUMNS = (
+    ("host", "str"),
+    ("hostname", "str"),
+    ("lastOnline", "float"),
+    ("lastOnlinePlayers", "int"),
+    ("lastOnlinePlayersMax", "int"),
+    ("lastOnlinePing", "int"),
+    ("lastOnlineVersion", "dict"),
+    ("lastOnlineVersionProtocol", "dict"),
+    ("lastOnlineDescription", "dict"),
+    ("serverType", "dict"),
+    ("cracked", "bool"),
+    ("whitelisted", "bool"),
+)
+
+SIGHTING_COLUMNS = (
+    ("host", "dict"),
+    ("timestamp", "float"),
+    ("players", "int"),
+    ("ping", "int"),
+)
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _arrow_type(kind):
+    return {
+        "str": pa.string(),
+        "dict": pa.dictionary(pa.int32(), pa.string()),
+        "float": pa.float64(),
+        "int": pa.int64(),
+        "bool": pa.bool_(),
+    }[kind]
+
+
+def _coerce(value, kind):
+    if value is None:
+        return None
+    try:
+        if kind in ("str", "dict"):
+            return str(value)
+        if kind == "float":
+            return float(value)
+        if kind == "int":
+            return int(value)
+        if kind == "bool":
+            return bool(value)
+    except (TypeError, ValueError):
+        return None
+    return value
+
+
+def build_schema(columns):
+    return pa.schema([(name, _arrow_type(kind)) for name, kind in columns])
+
+
+def _to_batch(schema, columns, rows):
+    arrays = []
+    for idx, (name, kind) in enumerate(columns):
+        values = [row[idx] for row in rows]
+        if kind == "dict":
+            arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(values, type=_arrow_type(kind)))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class _Writer:
+    def __init__(self, path, schema, fmt):
+        self.fmt = fmt
+        if fmt == "parquet":
+            self._writer = pq.ParquetWriter(
+                path, schema, compression="zstd", use_dictionary=True
+            )
+        else:
+            # The stream format allows each batch to carry its own dictionary.
+            self._sink = pa.OSFile(path, "wb")
+            self._writer = pa.ipc.new_stream(self._sink, schema)
+
+    def write(self, batch):
+        self._writer.write_batch(batch)
+
+    def close(self):
+        self._writer.close()
+        if self.fmt != "parquet":
+            self._sink.close()
+
+
+def _iter_server_rows(collection, batch_size):
+    projection = {name: 1 for name, _ in SERVER_COLUMNS}
+    cursor = collection.find({}, projection, batch_size=batch_size)
+    try:
+        for doc in cursor:
+            if doc.get("host") is None:
+                doc["host"] = str(doc.get("_id"))
+            yield tuple(_coerce(doc.get(name), kind) for name, kind in SERVER_COLUMNS)
+    finally:
+        cursor.close()
+
+
+def _iter_sighting_rows(collection, batch_size):
+    cursor = collection.find({}, {"host": 1, "samples": 1}, batch_size=batch_size)
+    try:
+        for doc in cursor:
+            host = doc.get("host")
+            for sample in doc.get("samples") or []:
+                if len(sample) < 3:
+                    continue
+                yield (
+                    host,
+                    _coerce(sample[0], "float"),
+                    _coerce(sample[1], "int"),
+                    _coerce(sample[2], "int"),
+                )
+    finally:
+        cursor.close()
+
+
+def _write_table(path, columns, rows, fmt, batch_size, progress=None):
+    schema = build_schema(columns)
+    writer = _Writer(path, schema, fmt)
+    written = 0
+    pending = []
+    try:
+        for row in rows:
+            pending.append(row)
+            if len(pending) >= batch_size:
+                writer.write(_to_batch(schema, columns, pending))
+                written += len(pending)
+                pending = []
+                if progress is not None:
+                    progress(written)
+        if pending:
+            writer.write(_to_batch(schema, columns, pending))
+            written += len(pending)
+    finally:
+        writer.close()
+    return written
+
+
+def sightings_path(path):
+    root, ext = os.path.splitext(path)
+    return f"{root}-sightings{ext}"
+
+
+def write_snapshot(
+    db, path, fmt="parquet", batch_size=DEFAULT_BATCH_SIZE, progress=None
+):
+    """Writes the servers collection (and sightings, if present) to path
+
+    Args:
+        db (pymongo.database.Database): the database holding the collections
+        path (str): output file for the servers table
+        fmt (str, optional): "parquet" or "arrow". Defaults to "parquet".
+        batch_size (int, optional): rows per record batch.
+        progress (callable, optional): called with the running row count
+
+    Returns:
+        dict: row counts and output paths per table
+    """
+    if pa is None:
+        raise SnapshotError("pyarrow is required for snapshots (pip install pyarrow)")
+    if fmt not in ("parquet", "arrow"):
+        raise SnapshotError(f"Unknown snapshot format: {fmt}")
+
+    started = time.time()
+    result = {
+        "servers": {
+            "path": path,
+            "rows": _write_table(
+                path,
+                SERVER_COLUMNS,
+                _iter_server_rows(db["servers"], batch_size),
+                fmt,
+                batch_size,
+                progress,
+            ),
+        }
+    }
+    if SIGHTINGS_COLLECTION in db.list_collection_names():
+        extra_path = sightings_path(path)
+        result[SIGHTINGS_COLLECTION] = {
+            "path": extra_path,
+            "rows": _write_table(
+                extra_path,
+                SIGHTING_COLUMNS,
+                _iter_sighting_rows(db[SIGHTINGS_COLLECTION], batch_size),
+                fmt,
+                batch_size,
+            ),
+        }
+    result["seconds"] = round(time.time() - started, 2)
+    return result
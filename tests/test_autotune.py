@@ -0,0 +1,42 @@
+from autotune import RateTuner
+
+
+def _healthy_window(tuner):
+    for _ in range(tuner.window):
+        tuner.observe(1000, 10, 1.0, tuner.rate)
+
+
+def test_healthy_windows_raise_the_rate():
+    tuner = RateTuner(1000, 100, 2000, window=2)
+
+    _healthy_window(tuner)
+    _healthy_window(tuner)
+
+    assert tuner.rate == 1200
+    assert [entry["decision"] for entry in tuner.snapshot()] == [
+        "increase",
+        "increase",
+    ]
+
+
+def test_yield_drop_cuts_the_rate():
+    tuner = RateTuner(1000, 100, 2000, window=1)
+    tuner.observe(1000, 10, 1.0, 1000)
+
+    tuner.observe(1000, 1, 1.0, tuner.rate)
+
+    assert tuner.rate == 550
+    assert tuner.snapshot()[-1]["reason"] == "yield fell"
+
+
+def test_history_keeps_only_the_latest_decisions():
+    tuner = RateTuner(1000, 100, 2000, window=1, history_size=4)
+
+    for _ in range(10):
+        _healthy_window(tuner)
+
+    history = tuner.snapshot()
+    assert isinstance(history, list)
+    assert len(history) == 4
+    assert history[-1]["nextRate"] == 2000
+    assert history[0]["rate"] == 1600
@@ -0,0 +1,69 @@
+import gzip
+
+import pytest
+
+# importing utils pulls in the whole bot stack
+pytest.importorskip("interactions")
+pytest.importorskip("javascript")
+pytest.importorskip("quarry")
+
+from utils.corpus import Corpus, readCorpus  # noqa: E402
+
+
+class _FakeLogger:
+    def info(self, message):
+        pass
+
+    error = debug = print = info
+
+
+def _raw(online):
+    return {
+        "version": {"name": "1.20.4", "protocol": 765},
+        "players": {"online": online, "max": 20},
+        "description": "§aA §lserver",
+    }
+
+
+def test_records_round_trip_across_flushes(tmp_path):
+    path = str(tmp_path / "status.jsonl.gz")
+    corpus = Corpus(path, _FakeLogger(), flushSize=2)
+
+    for online in range(5):
+        corpus.record("10.0.0.1", 25565, _raw(online), 12.5, hostname="mc.example")
+    corpus.flush()
+
+    records = list(readCorpus(path))
+    assert corpus.recorded == 5
+    assert [record["raw"] for record in records] == [_raw(n) for n in range(5)]
+    assert records[0]["hostname"] == "mc.example"
+    assert records[0]["ip"] == "10.0.0.1"
+    assert records[0]["latency"] == 12.5
+
+
+def test_truncated_last_member_stops_cleanly(tmp_path):
+    path = tmp_path / "status.jsonl.gz"
+    corpus = Corpus(str(path), _FakeLogger())
+    corpus.record("10.0.0.1", 25565, _raw(1), 1.0)
+    corpus.flush()
+    whole = path.read_bytes()
+    corpus.record("10.0.0.2", 25565, _raw(2), 1.0)
+    corpus.flush()
+    # a scan killed mid-flush leaves half of the second member
+    data = path.read_bytes()
+    path.write_bytes(data[: len(whole) + (len(data) - len(whole)) // 2])
+
+    records = list(readCorpus(str(path)))
+
+    assert [record["host"] for record in records] == ["10.0.0.1"]
+
+
+def test_corrupt_lines_are_skipped(tmp_path):
+    path = tmp_path / "status.jsonl.gz"
+    with gzip.open(path, "wt", encoding="utf-8") as handle:
+        handle.write('{"host": "10.0.0.1"}\nnot json\n{"host": "10.0.0.2"}\n')
+
+    assert [record["host"] for record in readCorpus(str(path))] == [
+        "10.0.0.1",
+        "10.0.0.2",
+    ]
@@ -0,0 +1,211 @@
+import json
+import socket
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+# importing utils pulls in the whole bot stack
+pytest.importorskip("interactions")
+pytest.importorskip("javascript")
+pytest.importorskip("quarry")
+
+from utils.engine import RAKNET_MAGIC, ProbeEngine  # noqa: E402
+from utils.probe import MAX_FAVICON_BYTES, ProbeError, varint  # noqa: E402
+
+STATUS = {
+    "version": {"name": "1.20.4", "protocol": 765},
+    "players": {"online": 3, "max": 20, "sample": [{"name": "Steve", "id": "x"}]},
+    "description": "A test server",
+}
+
+
+class _FakeLogger:
+    def info(self, message):
+        pass
+
+    error = debug = print = info
+
+
+def _tcpServer(handle):
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(8)
+
+    def run():
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            with conn:
+                handle(conn)
+
+    threading.Thread(target=run, daemon=True).start()
+    return server, server.getsockname()[1]
+
+
+def _udpServer(handle):
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(("127.0.0.1", 0))
+
+    def run():
+        while True:
+            try:
+                data, addr = server.recvfrom(65535)
+            except OSError:
+                return
+            reply = handle(data)
+            if reply:
+                server.sendto(reply, addr)
+
+    threading.Thread(target=run, daemon=True).start()
+    return server, server.getsockname()[1]
+
+
+def _java(conn):
+    conn.recv(4096)
+    text = json.dumps(STATUS).encode()
+    body = varint(0) + varint(len(text)) + text
+    conn.sendall(varint(len(body)) + body)
+    # the ping packet is echoed back as the pong
+    conn.sendall(conn.recv(64))
+
+
+def _legacy(conn):
+    conn.recv(64)
+    text = "§1\x00127\x001.6.4\x00Old server\x004\x0020".encode("utf-16-be")
+    conn.sendall(b"\xff" + struct.pack(">H", len(text) // 2) + text)
+
+
+def _bedrock(data):
+    status = b"MCPE;Bedrock motd;594;1.20.0;2;10;1234;World;Survival"
+    return (
+        b"\x1c"
+        + data[1:9]
+        + struct.pack(">Q", 42)
+        + RAKNET_MAGIC
+        + struct.pack(">H", len(status))
+        + status
+    )
+
+
+def _query(data):
+    session = data[3:7]
+    if data[2] == 0x09:
+        return b"\x09" + session + b"12345\x00"
+    stats = b"hostname\x00Query motd\x00numplayers\x002\x00maxplayers\x0010\x00version\x001.20.4"
+    return (
+        b"\x00"
+        + session
+        + b"splitnum\x00\x80\x00"
+        + stats
+        + b"\x00\x00\x01player_\x00\x00alice\x00bob\x00\x00"
+    )
+
+
+@pytest.fixture
+def engine():
+    return ProbeEngine(_FakeLogger(), timeout=2.0)
+
+
+def test_java_status_and_pong(engine):
+    server, port = _tcpServer(_java)
+    with server:
+        result = engine.probe("127.0.0.1", port, "java")
+
+    assert result["edition"] == "java"
+    assert result["transport"] == "tcp"
+    assert result["raw"]["players"]["online"] == 3
+    assert result["latency"] is not None
+
+
+def test_java_keeps_the_status_as_received(engine):
+    def oversized(conn):
+        conn.recv(4096)
+        text = json.dumps(dict(STATUS, favicon="A" * (MAX_FAVICON_BYTES + 1))).encode()
+        body = varint(0) + varint(len(text)) + text
+        conn.sendall(varint(len(body)) + body)
+
+    server, port = _tcpServer(oversized)
+    with server:
+        result = engine.probe("127.0.0.1", port, "java")
+
+    assert "favicon" not in result["raw"]
+    assert len(json.loads(result["text"])["favicon"]) == MAX_FAVICON_BYTES + 1
+
+
+def test_java_status_without_pong_has_no_latency(engine):
+    def noPong(conn):
+        conn.recv(4096)
+        text = json.dumps(STATUS).encode()
+        body = varint(0) + varint(len(text)) + text
+        conn.sendall(varint(len(body)) + body)
+
+    server, port = _tcpServer(noPong)
+    with server:
+        result = engine.probe("127.0.0.1", port, "java")
+
+    assert result["raw"]["description"] == "A test server"
+    assert result["latency"] is None
+
+
+def test_legacy_ping(engine):
+    server, port = _tcpServer(_legacy)
+    with server:
+        result = engine.probe("127.0.0.1", port, "legacy")
+
+    assert result["raw"]["version"] == {"name": "1.6.4", "protocol": 127}
+    assert result["raw"]["players"]["max"] == 20
+    assert result["raw"]["description"] == "Old server"
+
+
+def test_bedrock_unconnected_pong(engine):
+    server, port = _udpServer(_bedrock)
+    with server:
+        result = engine.probe("127.0.0.1", port, "bedrock")
+
+    assert result["transport"] == "udp"
+    assert result["raw"]["description"] == "Bedrock motd"
+    assert result["raw"]["players"] == {"online": 2, "max": 10}
+    assert result["raw"]["bedrock"]["levelName"] == "World"
+
+
+def test_query_full_stat_lists_every_player(engine):
+    server, port = _udpServer(_query)
+    with server:
+        result = engine.probe("127.0.0.1", port, "query")
+
+    players = result["raw"]["players"]
+    assert [player["name"] for player in players["sample"]] == ["alice", "bob"]
+    assert players["online"] == 2
+    assert result["raw"]["description"] == "Query motd"
+
+
+def test_garbage_is_a_probe_error(engine):
+    server, port = _tcpServer(lambda conn: conn.recv(64) and conn.sendall(b"\x05\x07"))
+    with server:
+        with pytest.raises(ProbeError):
+            engine.probe("127.0.0.1", port, "java")
+
+
+def test_silent_udp_times_out():
+    engine = ProbeEngine(_FakeLogger(), timeout=0.2)
+    server, port = _udpServer(lambda data: None)
+    with server:
+        with pytest.raises(TimeoutError):
+            engine.probe("127.0.0.1", port, "bedrock")
+
+
+def test_worker_threads_share_one_loop(engine):
+    server, port = _tcpServer(_java)
+    with server, ThreadPoolExecutor(8) as pool:
+        results = list(
+            pool.map(lambda _: engine.probe("127.0.0.1", port, "java"), range(16))
+        )
+    loops = {thread.name for thread in threading.enumerate()}
+
+    assert all(result["edition"] == "java" for result in results)
+    assert "probe-engine" in loops
+    assert engine._loop.is_running()
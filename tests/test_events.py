@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+# importing utils pulls in the whole bot stack
+pytest.importorskip("interactions")
+pytest.importorskip("javascript")
+pytest.importorskip("quarry")
+
+from utils.events import (  # noqa: E402
+    MAX_PENDING,
+    AuthRequired,
+    EventBus,
+    Joined,
+    Kicked,
+    SessionEnded,
+)
+
+KEY = ("10.0.0.1", 25565, "player@example.com")
+
+
+def test_events_reach_only_their_key():
+    bus = EventBus()
+    with bus.subscribe(KEY) as events, bus.subscribe("other") as others:
+        bus.publish(Joined(KEY, {"names": ["Steve"]}))
+
+        event = events.wait(timeout=1)
+        assert isinstance(event, Joined)
+        assert event.info == {"names": ["Steve"]}
+        assert others.wait(timeout=0) is None
+
+
+def test_subscription_filters_by_type():
+    bus = EventBus()
+    with bus.subscribe(KEY, Kicked, SessionEnded) as events:
+        bus.publish(AuthRequired(KEY, "ABCD", "https://microsoft.com/link"))
+        bus.publish(Kicked(KEY, "You are not whitelisted"))
+
+        assert events.wait(timeout=1).reason == "You are not whitelisted"
+        assert events.wait(timeout=0) is None
+
+
+def test_wait_times_out_with_none():
+    bus = EventBus()
+    with bus.subscribe(KEY) as events:
+        started = time.monotonic()
+
+        assert events.wait(timeout=0.05) is None
+        assert time.monotonic() - started >= 0.05
+
+
+def test_wait_wakes_up_for_an_event_from_another_thread():
+    bus = EventBus()
+    with bus.subscribe(KEY) as events:
+        threading.Timer(0.05, bus.publish, [SessionEnded(KEY, "end")]).start()
+
+        assert events.wait(timeout=2).reason == "end"
+
+
+def test_next_does_not_block_the_event_loop():
+    bus = EventBus()
+
+    async def join():
+        with bus.subscribe(KEY) as events:
+            waiting = asyncio.ensure_future(events.next(timeout=2))
+            await asyncio.sleep(0.05)
+            bus.publish(Joined(KEY))
+            return await waiting
+
+    assert isinstance(asyncio.run(join()), Joined)
+
+
+def test_closed_subscription_is_removed_from_the_bus():
+    bus = EventBus()
+    with bus.subscribe(KEY) as events:
+        pass
+
+    bus.publish(Joined(KEY))
+
+    assert bus.subscriptions == {}
+    assert events.wait(timeout=0) is None
+
+
+def test_pending_events_are_bounded():
+    bus = EventBus()
+    with bus.subscribe(KEY) as events:
+        for i in range(MAX_PENDING + 10):
+            bus.publish(Kicked(KEY, str(i)))
+
+        assert len(events.pending) == MAX_PENDING
+        assert events.wait(timeout=0).reason == "10"
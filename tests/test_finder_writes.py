@@ -0,0 +1,145 @@
+import pytest
+
+# importing utils pulls in the whole bot stack
+pytest.importorskip("interactions")
+pytest.importorskip("javascript")
+pytest.importorskip("quarry")
+
+from utils.finder import Finder  # noqa: E402
+
+
+class _FakeLogger:
+    def info(self, message):
+        pass
+
+    error = debug = print = info
+
+
+class _UpdateResult:
+    def __init__(self, matched_count):
+        self.matched_count = matched_count
+
+
+class _FakeCollection:
+    name = "servers"
+
+    def __init__(self, documents=()):
+        self.documents = {doc["host"]: dict(doc) for doc in documents}
+        self.updates = []
+
+    def find_one(self, query, projection=None):
+        doc = self.documents.get(query.get("host"))
+        return dict(doc) if doc is not None else None
+
+    def update_one(self, query, update, upsert=False):
+        self.updates.append((update["$set"], upsert))
+        doc = self.documents.get(query["host"])
+        if doc is None and not upsert:
+            return _UpdateResult(0)
+        if doc is None:
+            doc = self.documents[query["host"]] = {"host": query["host"]}
+        doc.update(update["$set"])
+        return _UpdateResult(1)
+
+
+def _server(**fields):
+    data = {
+        "host": "10.0.0.1",
+        "hostname": "play.example.com",
+        "port": 25565,
+        "lastOnline": 1000.0,
+        "lastOnlinePlayers": 1,
+        "lastOnlinePlayersMax": 20,
+        "lastOnlinePing": 30,
+        "lastOnlineVersion": "1.20.4",
+        "lastOnlineVersionProtocol": 765,
+        "lastOnlineDescription": "A test server",
+        "lastOnlinePlayersList": [],
+        "favicon": None,
+        "cracked": False,
+        "whitelisted": False,
+        "truncated": False,
+        "edition": "java",
+    }
+    data.update(fields)
+    return data
+
+
+class _FakeText:
+    @staticmethod
+    def cFilter(text):
+        return text
+
+
+class _FakeEngine:
+    def __init__(self, answers):
+        self.answers = answers
+
+    def probe(self, host, port, kind):
+        if port not in self.answers:
+            raise ConnectionRefusedError(port)
+        return {"raw": self.answers[port], "latency": 0.003, "edition": kind}
+
+
+def _finder(col, Engine=None):
+    return Finder(col, _FakeLogger(), _FakeText, None, Engine=Engine or object())
+
+
+def test_unchanged_server_only_sets_changed_fields():
+    col = _FakeCollection()
+    finder = _finder(col)
+    finder._writeChanges("10.0.0.1", "10.0.0.1", _server())
+    finder._writeChanges("10.0.0.1", "10.0.0.1", _server())
+    col.updates.clear()
+
+    finder._writeChanges("10.0.0.1", "10.0.0.1", _server(lastOnline=2000.0))
+
+    assert col.updates == [({"lastOnline": 2000.0}, False)]
+
+
+def test_stale_state_does_not_leave_a_stub_document():
+    col = _FakeCollection()
+    finder = _finder(col)
+    finder._writeChanges("10.0.0.1", "10.0.0.1", _server())
+    # archived or removed after the ingest state was cached
+    col.documents.clear()
+
+    finder._writeChanges("10.0.0.1", "10.0.0.1", _server(lastOnline=2000.0))
+
+    stored = col.documents["10.0.0.1"]
+    assert stored["lastOnlineVersion"] == "1.20.4"
+    assert stored["lastOnlineDescription"] == "A test server"
+    assert set(stored["fingerprint"]) == {"motd", "favicon", "version", "players"}
+    assert col.updates[-2:] == [
+        ({"lastOnline": 2000.0}, False),
+        (stored, True),
+    ]
+
+
+def test_extra_port_is_stored_under_the_ips_document():
+    col = _FakeCollection([_server()])
+    raw = {
+        "version": {"name": "Paper 1.21", "protocol": 767},
+        "players": {"online": 3, "max": 50},
+        "description": "Survival",
+    }
+    finder = _finder(col, Engine=_FakeEngine({25566: raw}))
+
+    result = finder.checkPort("10.0.0.1", 25566)
+
+    summary = col.documents["10.0.0.1"]["ports.25566"]
+    assert result == {"host": "10.0.0.1", "port": 25566, **summary}
+    assert summary["lastOnlinePlayers"] == 3
+    assert summary["lastOnlineVersionProtocol"] == "767"
+    assert summary["lastOnlinePing"] == 0
+    # the ip's own server is left as it was
+    assert col.documents["10.0.0.1"]["port"] == 25565
+    assert col.documents["10.0.0.1"]["lastOnlinePlayers"] == 1
+
+
+def test_silent_extra_port_stores_nothing():
+    col = _FakeCollection([_server()])
+    finder = _finder(col, Engine=_FakeEngine({}))
+
+    assert finder.checkPort("10.0.0.1", 25566) is None
+    assert col.updates == []
@@ -0,0 +1,103 @@
+import pytest
+
+# importing utils pulls in the whole bot stack
+pytest.importorskip("interactions")
+pytest.importorskip("javascript")
+pytest.importorskip("quarry")
+
+import utils.knownhosts  # noqa: E402
+from utils.knownhosts import KnownHosts, ipToInt  # noqa: E402
+
+
+class _FakeLogger:
+    def info(self, message):
+        pass
+
+    error = debug = info
+
+
+class _FakeCollection:
+    def __init__(self, hosts):
+        self.hosts = hosts
+
+    def find(self, query, projection=None, batch_size=None):
+        return [{"host": host} for host in self.hosts]
+
+
+class _BrokenCollection:
+    def find(self, *args, **kwargs):
+        raise RuntimeError("mongo is down")
+
+
+def _known(*hosts):
+    known = KnownHosts(_FakeCollection(list(hosts)), _FakeLogger())
+    assert known.ensureLoaded()
+    return known
+
+
+def test_ip_to_int():
+    assert ipToInt("1.2.3.4") == 0x01020304
+    assert ipToInt("255.255.255.255") == 0xFFFFFFFF
+    assert ipToInt("play.example.com") is None
+    assert ipToInt(None) is None
+
+
+def test_loaded_hosts_are_packed_sorted_and_unique():
+    known = _known("10.0.0.2", "10.0.0.1", "10.0.0.2", "not an ip", None)
+
+    assert list(known._hosts) == [ipToInt("10.0.0.1"), ipToInt("10.0.0.2")]
+    assert len(known) == 2
+
+
+def test_only_exact_addresses_are_known():
+    known = _known("10.0.0.1", "10.0.0.3", "0.0.0.0", "255.255.255.255")
+
+    assert known.contains("10.0.0.1")
+    assert known.contains("10.0.0.3")
+    assert known.contains("0.0.0.0")
+    assert known.contains("255.255.255.255")
+    assert not known.contains("10.0.0.0")
+    assert not known.contains("10.0.0.2")
+    assert not known.contains("10.0.0.4")
+    assert not known.contains("play.example.com")
+
+
+def test_load_merges_sorted_runs(monkeypatch):
+    monkeypatch.setattr(utils.knownhosts, "LOAD_BATCH_SIZE", 1)
+    hosts = [f"10.0.{i % 7}.{i}" for i in range(100)]
+
+    known = _known(*reversed(hosts))
+
+    assert list(known._hosts) == sorted(ipToInt(host) for host in hosts)
+
+
+def test_added_hosts_are_known_and_merged(monkeypatch):
+    monkeypatch.setattr(utils.knownhosts, "MERGE_THRESHOLD", 3)
+    known = _known("10.0.0.1")
+
+    known.add("10.0.0.9")
+    known.add("10.0.0.5")
+    assert known.contains("10.0.0.9")
+    assert len(known._recent) == 2
+
+    known.add("10.0.0.7")
+    assert known._recent == set()
+    assert list(known._hosts) == [
+        ipToInt(host) for host in ("10.0.0.1", "10.0.0.5", "10.0.0.7", "10.0.0.9")
+    ]
+    assert all(known.contains(host) for host in ("10.0.0.5", "10.0.0.7"))
+
+
+def test_adds_before_loading_are_ignored():
+    known = KnownHosts(_FakeCollection([]), _FakeLogger())
+
+    known.add("10.0.0.1")
+
+    assert known.ensureLoaded()
+    assert not known.contains("10.0.0.1")
+
+
+def test_failed_load_tells_callers_to_ask_mongo():
+    known = KnownHosts(_BrokenCollection(), _FakeLogger())
+
+    assert not known.ensureLoaded()
@@ -0,0 +1,83 @@
+import logging
+
+import pytest
+
+# importing utils pulls in the whole bot stack
+pytest.importorskip("interactions")
+pytest.importorskip("javascript")
+pytest.importorskip("quarry")
+
+from utils.logger import LOG_CLEAR_BYTES, Logger  # noqa: E402
+
+
+@pytest.fixture
+def logger(tmp_path):
+    root = logging.getLogger()
+    handlers = list(root.handlers)
+    for handler in handlers:
+        root.removeHandler(handler)
+    logger = Logger(
+        True, path=str(tmp_path / "log.log"), sampleRate=0.001, sampleBurst=2
+    )
+    yield logger
+    logger.close()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+
+
+def _lines(logger):
+    logger.listener.stop()
+    logger.listener.start()
+    with open(logger.path, encoding="utf-8") as handle:
+        return handle.read().splitlines()
+
+
+def test_found_servers_are_never_sampled(logger):
+    for i in range(10):
+        logger.print(f"10.0.0.{i} not in database, adding...")
+
+    assert sum("adding" in line for line in _lines(logger)) == 10
+    assert logger.suppressed() == {}
+
+
+def test_per_host_info_and_debug_are_sampled(logger):
+    for i in range(10):
+        logger.info(f"10.0.0.{i} flagged as tarpit", sample=True)
+    for i in range(10):
+        logger.debug("Checking", i)
+
+    lines = _lines(logger)
+    assert sum("flagged as tarpit" in line for line in lines) == 2
+    assert sum("Checking" in line for line in lines) == 2
+    assert sorted(logger.suppressed().values()) == [8, 8]
+
+
+def test_plain_info_is_not_sampled(logger):
+    for i in range(10):
+        logger.info(f"Loaded {i} flagged tarpit hosts")
+
+    assert sum("flagged tarpit hosts" in line for line in _lines(logger)) == 10
+
+
+def test_clear_continues_a_small_log(logger, tmp_path):
+    logger.print("first run")
+    _lines(logger)
+
+    logger.clear()
+
+    assert not (tmp_path / "log.log.1").exists()
+    lines = _lines(logger)
+    assert "first run" in lines[0]
+    assert "---- Started" in lines[-1]
+
+
+def test_clear_rolls_a_large_log_over(logger, tmp_path):
+    logger.print("x" * LOG_CLEAR_BYTES)
+    _lines(logger)
+
+    logger.clear()
+
+    assert (tmp_path / "log.log.1").exists()
+    assert len(_lines(logger)) == 1
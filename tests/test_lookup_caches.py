@@ -0,0 +1,100 @@
+import socket
+
+import pytest
+
+# importing utils pulls in the whole bot stack
+pytest.importorskip("interactions")
+pytest.importorskip("javascript")
+pytest.importorskip("quarry")
+
+import utils.finder  # noqa: E402
+from utils.finder import Finder, MojangAnswer  # noqa: E402
+from utils.text import Text  # noqa: E402
+
+
+class _FakeLogger:
+    def info(self, message):
+        pass
+
+    error = debug = print = info
+
+
+class _FakeResponse:
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+
+
+def _mojang(monkeypatch, *responses):
+    requested = []
+    responses = list(responses)
+
+    def get(url):
+        requested.append(url)
+        return responses.pop(0)
+
+    monkeypatch.setattr(utils.finder.requests, "get", get)
+    return Finder(None, _FakeLogger(), None, None, Engine=object()), requested
+
+
+def test_mojang_answers_are_cached_without_the_response(monkeypatch):
+    finder, requested = _mojang(
+        monkeypatch, _FakeResponse(200, '{"id": "abc", "name": "Steve"}')
+    )
+
+    first = finder._mojang("Steve")
+    second = finder._mojang("steve")
+
+    assert len(requested) == 1
+    assert second is first
+    assert isinstance(finder._mojangCache["steve"][1], MojangAnswer)
+    assert second.json() == {"id": "abc", "name": "Steve"}
+
+
+def test_mojang_rate_limits_are_asked_again(monkeypatch):
+    finder, requested = _mojang(
+        monkeypatch, _FakeResponse(429, ""), _FakeResponse(204, "")
+    )
+
+    assert finder._mojang("Steve").status_code == 429
+    assert finder._mojang("Steve").status_code == 204
+    assert finder._mojang("Steve").status_code == 204
+    assert len(requested) == 2
+
+
+def test_cached_not_found_is_raised_as_a_new_error():
+    text = Text(_FakeLogger())
+    resolved = []
+
+    def resolve(name):
+        resolved.append(name)
+        raise socket.gaierror(-2, "Name or service not known")
+
+    with pytest.raises(socket.gaierror) as first:
+        text._lookup("forward", "missing.example", resolve, socket.gaierror)
+    with pytest.raises(socket.gaierror) as second:
+        text._lookup("forward", "missing.example", resolve, socket.gaierror)
+
+    assert resolved == ["missing.example"]
+    assert second.value is not first.value
+    assert second.value.args == (-2, "Name or service not known")
+
+
+def test_other_dns_errors_are_not_cached():
+    text = Text(_FakeLogger())
+    answers = [OSError("network down"), "10.0.0.1"]
+
+    def resolve(name):
+        answer = answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    with pytest.raises(OSError):
+        text._lookup("forward", "play.example.com", resolve, socket.gaierror)
+    assert text._lookup("forward", "play.example.com", resolve, socket.gaierror) == (
+        "10.0.0.1"
+    )
+    assert text._lookup("forward", "play.example.com", resolve, socket.gaierror) == (
+        "10.0.0.1"
+    )
@@ -0,0 +1,73 @@
+import pytest
+
+import metrics
+from metrics import Counter, Gauge, Histogram, Registry
+
+
+def test_expose_formats_every_kind():
+    registry = Registry()
+    probes = Counter("test_probes_total", "Probes", ["codec"], registry=registry)
+    depth = Gauge("test_depth", "Queue depth", registry=registry)
+    seconds = Histogram(
+        "test_seconds", "Latency", buckets=(0.1, 1.0), registry=registry
+    )
+
+    probes.labels("java").inc()
+    probes.labels("java").inc(2)
+    depth.set(5)
+    seconds.observe(0.05)
+    seconds.observe(0.5)
+    seconds.observe(7)
+
+    assert registry.expose().splitlines() == [
+        "# HELP test_probes_total Probes",
+        "# TYPE test_probes_total counter",
+        'test_probes_total{codec="java"} 3',
+        "# HELP test_depth Queue depth",
+        "# TYPE test_depth gauge",
+        "test_depth 5",
+        "# HELP test_seconds Latency",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{le="0.1"} 1',
+        'test_seconds_bucket{le="1"} 2',
+        'test_seconds_bucket{le="+Inf"} 3',
+        "test_seconds_sum 7.55",
+        "test_seconds_count 3",
+    ]
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    errors = Counter("test_errors_total", "Errors", ["message"], registry=registry)
+
+    errors.labels('bad "quote"\n').inc()
+
+    assert 'test_errors_total{message="bad \\"quote\\"\\n"} 1' in registry.expose()
+
+
+def test_gauge_function_is_read_at_scrape_time():
+    registry = Registry()
+    depth = Gauge("test_depth", "Queue depth", registry=registry)
+    queue = [1, 2]
+    depth.set_function(lambda: len(queue))
+
+    queue.append(3)
+
+    assert "test_depth 3" in registry.expose()
+
+
+def test_names_and_labels_are_checked():
+    registry = Registry()
+    probes = Counter("test_probes_total", "Probes", ["codec"], registry=registry)
+
+    with pytest.raises(ValueError):
+        Counter("test_probes_total", "Probes", registry=registry)
+    with pytest.raises(ValueError):
+        probes.labels("java", "ok")
+
+
+def test_default_registry_exposes_the_pipeline_metrics():
+    text = metrics.expose()
+
+    assert "# TYPE minescan_scan_chunks_total counter" in text
+    assert text.endswith("\n")
@@ -0,0 +1,151 @@
+import pytest
+
+# importing utils pulls in the whole bot stack
+pytest.importorskip("interactions")
+pytest.importorskip("javascript")
+pytest.importorskip("quarry")
+
+from utils.finder import Finder  # noqa: E402
+from utils.negcache import NegativeCache, endpointId, parseEndpointId  # noqa: E402
+
+
+class _FakeLogger:
+    def info(self, message):
+        pass
+
+    error = debug = info
+
+
+class _FakeCollection:
+    def __init__(self, documents=()):
+        self.documents = {doc["_id"]: doc for doc in documents}
+        self.deleted = []
+
+    def create_index(self, *args, **kwargs):
+        pass
+
+    def find(self, query, projection=None, batch_size=None):
+        after = query["nextCheck"]["$gt"]
+        return [doc for doc in self.documents.values() if doc["nextCheck"] > after]
+
+    def bulk_write(self, requests, ordered=True):
+        for request in requests:
+            endpoint = request._filter["_id"]
+            self.documents[endpoint] = {"_id": endpoint, "nextCheck": float("inf")}
+
+    def find_one(self, query, projection=None):
+        return self.documents.get(query.get("host"))
+
+    def delete_one(self, query):
+        self.deleted.append(query["_id"])
+        self.documents.pop(query["_id"], None)
+
+
+def test_udp_failures_do_not_hide_the_tcp_port():
+    cache = NegativeCache(_FakeCollection(), _FakeLogger())
+
+    cache.recordFailure("10.0.0.1", 25565, TimeoutError(), "udp")
+
+    assert cache.shouldSkip("10.0.0.1", 25565, "udp")
+    assert not cache.shouldSkip("10.0.0.1", 25565)
+
+
+def test_loaded_ids_keep_their_transport():
+    col = _FakeCollection(
+        [
+            {"_id": "10.0.0.1:25565", "nextCheck": float("inf")},
+            {"_id": "10.0.0.2:19132/udp", "nextCheck": float("inf")},
+            {"_id": "not an endpoint", "nextCheck": float("inf")},
+        ]
+    )
+    cache = NegativeCache(col, _FakeLogger())
+
+    cache.load()
+
+    assert len(cache) == 2
+    assert cache.shouldSkip("10.0.0.1", 25565)
+    assert not cache.shouldSkip("10.0.0.1", 25565, "udp")
+    assert cache.shouldSkip("10.0.0.2", 19132, "udp")
+    assert not cache.shouldSkip("10.0.0.2", 19132)
+    assert parseEndpointId(endpointId("10.0.0.2", 19132, "udp")) == parseEndpointId(
+        "10.0.0.2:19132/udp"
+    )
+
+
+def test_clear_deletes_the_transport_document():
+    col = _FakeCollection([{"_id": "10.0.0.2:19132/udp", "nextCheck": float("inf")}])
+    cache = NegativeCache(col, _FakeLogger())
+    cache.load()
+
+    cache.clear("10.0.0.2", 19132, "udp")
+
+    assert col.deleted == ["10.0.0.2:19132/udp"]
+    assert not cache.shouldSkip("10.0.0.2", 19132, "udp")
+
+
+class _FakeText:
+    def resolveHost(self, host):
+        return host
+
+    resolveIP = resolveHost
+
+
+class _FailingEngine:
+    def probe(self, host, port, edition):
+        raise TimeoutError()
+
+
+def _finder(cache, servers=()):
+    servers = _FakeCollection({"_id": ip, "host": ip} for ip in servers)
+    return Finder(
+        servers,
+        _FakeLogger(),
+        _FakeText(),
+        None,
+        NegativeCache=cache,
+        Engine=_FailingEngine(),
+    )
+
+
+def test_transient_failures_back_off_less():
+    cache = NegativeCache(
+        _FakeCollection(), _FakeLogger(), baseInterval=100, maxInterval=1000
+    )
+    cache.transientInterval = 10
+
+    assert cache.backoff("timeout") == (10, 100)
+    assert cache.backoff("reset") == (10, 100)
+    assert cache.backoff("refused") == (100, 1000)
+    assert cache.backoff("protocol") == (100, 1000)
+
+
+def test_failure_skip_runs_out_with_its_class_interval():
+    cache = NegativeCache(_FakeCollection(), _FakeLogger(), transientInterval=0)
+
+    cache.recordFailure("10.0.0.1", 25565, TimeoutError())
+    cache.recordFailure("10.0.0.1", 25566, ConnectionRefusedError())
+
+    assert not cache.shouldSkip("10.0.0.1", 25565)
+    assert cache.shouldSkip("10.0.0.1", 25566)
+
+
+def test_reload_keeps_failures_of_a_running_scan():
+    cache = NegativeCache(_FakeCollection(), _FakeLogger(), flushSize=100)
+    cache.recordFailure("10.0.0.1", 25565, ConnectionRefusedError())
+
+    # another scan starting reloads before this failure was flushed
+    cache.load()
+
+    assert cache.shouldSkip("10.0.0.1", 25565)
+    assert cache.flush() == 1
+
+
+def test_known_servers_are_not_recorded():
+    cache = NegativeCache(_FakeCollection(), _FakeLogger())
+
+    assert _finder(cache, servers=["10.0.0.1"]).check("10.0.0.1:25565") is None
+    assert _finder(cache).check("10.0.0.2:25565") is None
+
+    assert not cache.shouldSkip("10.0.0.1", 25565)
+    assert cache.shouldSkip("10.0.0.2", 25565)
+    assert cache.stats["failures"] == 1
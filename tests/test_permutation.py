@@ -0,0 +1,41 @@
+import pytest
+
+from permutation import SEED_MODULUS, KeyedPermutation, seed_from
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 64, 100, 257, 1000])
+def test_permutation_is_a_bijection(size):
+    order = [KeyedPermutation(size, 42)(index) for index in range(size)]
+
+    assert sorted(order) == list(range(size))
+
+
+def test_same_seed_gives_the_same_order():
+    first = KeyedPermutation(1000, seed_from("scan-a"))
+    second = KeyedPermutation(1000, seed_from("scan-a"))
+
+    assert [first(i) for i in range(1000)] == [second(i) for i in range(1000)]
+
+
+def test_different_seeds_give_different_orders():
+    first = KeyedPermutation(1000, seed_from("scan-a"))
+    second = KeyedPermutation(1000, seed_from("scan-b"))
+
+    assert [first(i) for i in range(1000)] != [second(i) for i in range(1000)]
+
+
+def test_seeds_past_64_bits_wrap_around():
+    wide = KeyedPermutation(100, SEED_MODULUS + 5)
+    narrow = KeyedPermutation(100, 5)
+
+    assert wide.seed == 5
+    assert [wide(i) for i in range(100)] == [narrow(i) for i in range(100)]
+
+
+def test_index_outside_the_range_is_rejected():
+    permutation = KeyedPermutation(10, 1)
+
+    with pytest.raises(IndexError):
+        permutation(10)
+    with pytest.raises(IndexError):
+        permutation(-1)
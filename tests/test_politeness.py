@@ -0,0 +1,72 @@
+import threading
+
+from politeness import PolitenessScheduler, PrefixTable
+
+
+def _table(*rows):
+    table = PrefixTable()
+    for start, end, asn in rows:
+        table.starts.append(start)
+        table.ends.append(end)
+        table.asns.append(asn)
+    return table
+
+
+def _address(text):
+    a, b, c, d = map(int, text.split("."))
+    return a << 24 | b << 16 | c << 8 | d
+
+
+def test_busy_prefix_is_interleaved_with_others():
+    scheduler = PolitenessScheduler(
+        ["10.0.0.0/24", "10.0.1.0/24", "10.1.0.0/24"], 1000, prefix_rate=1000
+    )
+
+    first = scheduler.acquire()
+    second = scheduler.acquire()
+    scheduler.release(first)
+    third = scheduler.acquire()
+
+    assert [first.chunk, second.chunk, third.chunk] == [
+        "10.0.0.0/24",
+        "10.1.0.0/24",
+        "10.0.1.0/24",
+    ]
+    assert scheduler.prefixes["10.0.0.0/16"].deferred == 1
+    assert scheduler.prefixes["10.1.0.0/16"].deferred == 0
+
+
+def test_waiting_chunk_is_deferred_once():
+    scheduler = PolitenessScheduler(
+        ["10.0.0.0/24", "10.0.1.0/24"], 1000, prefix_rate=1000
+    )
+    scheduler.acquire()
+    stop = threading.Event()
+    threading.Timer(0.2, stop.set).start()
+
+    # loops many times while the first chunk holds the whole /16
+    assert scheduler.acquire(stop, timeout=0.01) is None
+    assert scheduler.prefixes["10.0.0.0/16"].deferred == 1
+
+
+def test_chunk_is_charged_to_the_asn_of_its_first_address():
+    table = _table(
+        (_address("10.0.0.0"), _address("10.0.0.127"), 64500),
+        (_address("10.0.0.128"), _address("10.0.0.255"), 64501),
+    )
+    scheduler = PolitenessScheduler(
+        ["10.0.0.0/24"], 1000, asn_rate=500, prefix_table=table
+    )
+
+    lease = scheduler.acquire()
+
+    assert lease.asn == 64500
+    assert lease.rate == 500
+    assert 64501 not in scheduler.asns
+
+
+def test_acquire_returns_none_once_every_chunk_is_leased():
+    scheduler = PolitenessScheduler(["10.0.0.0/24"], 1000)
+
+    assert scheduler.acquire().chunk == "10.0.0.0/24"
+    assert scheduler.acquire() is None
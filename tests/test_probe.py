@@ -0,0 +1,129 @@
+import json
+import socket
+import threading
+
+import pytest
+
+# importing utils pulls in the whole bot stack
+pytest.importorskip("interactions")
+pytest.importorskip("javascript")
+pytest.importorskip("quarry")
+
+from utils.probe import (  # noqa: E402
+    MAX_FAVICON_BYTES,
+    MAX_FIELD_BYTES,
+    MAX_NAME_CHARS,
+    MAX_VERSION_CHARS,
+    Probe,
+    ProbeError,
+    jsonDepth,
+    readVarint,
+    varint,
+)
+
+
+class _FakeLogger:
+    def info(self, message):
+        pass
+
+    error = debug = info
+
+
+@pytest.mark.parametrize("value", [0, 1, 127, 128, 25565, 2**31 - 1, -1, -(2**31)])
+def test_varint_round_trip(value):
+    encoded = varint(value)
+
+    assert readVarint(b"\xff" + encoded, 1) == (value, len(encoded) + 1)
+
+
+def test_truncated_varint_is_rejected():
+    with pytest.raises(ProbeError):
+        readVarint(b"\x80\x80")
+
+
+def test_varint_longer_than_five_bytes_is_rejected():
+    with pytest.raises(ProbeError):
+        readVarint(b"\x80\x80\x80\x80\x80\x01")
+
+
+def test_json_depth_ignores_brackets_inside_strings():
+    assert jsonDepth('{"a": [{"b": 1}]}') == 3
+    assert jsonDepth('{"a": "[[[{{{", "b": "\\"]]"}') == 1
+    assert jsonDepth("[]") == 1
+    assert jsonDepth('"just a string"') == 0
+
+
+def test_deep_json_is_rejected_before_parsing():
+    probe = Probe(_FakeLogger(), maxDepth=4)
+
+    with pytest.raises(ProbeError):
+        probe.parse("[" * 5 + "]" * 5)
+
+
+def test_limit_keeps_a_normal_status():
+    raw = {
+        "version": {"name": "1.20.4", "protocol": 765},
+        "players": {"online": 1, "max": 20, "sample": [{"name": "Steve", "id": "x"}]},
+        "description": {"text": "A test server"},
+        "favicon": "data:image/png;base64,AAAA",
+    }
+    expected = json.loads(json.dumps(raw))
+
+    assert Probe(_FakeLogger()).limit(raw) == []
+    assert raw == expected
+
+
+def test_limit_cuts_oversized_fields():
+    raw = {
+        "version": {"name": "v" * (MAX_VERSION_CHARS + 1), "protocol": 765},
+        "players": {
+            "online": 50,
+            "max": 50,
+            "sample": [{"name": "n" * (MAX_NAME_CHARS + 1), "id": "x" * 64}] * 40,
+        },
+        "description": "motd",
+        "favicon": "f" * (MAX_FAVICON_BYTES + 1),
+        "forgeData": {"mods": ["m" * MAX_FIELD_BYTES]},
+        "enforcesSecureChat": True,
+    }
+
+    truncated = Probe(_FakeLogger(), maxSample=8).limit(raw)
+
+    assert sorted(truncated) == ["favicon", "forgeData", "sample", "version"]
+    assert "favicon" not in raw and "forgeData" not in raw
+    assert raw["enforcesSecureChat"] is True
+    assert len(raw["version"]["name"]) == MAX_VERSION_CHARS
+    sample = raw["players"]["sample"]
+    assert len(sample) == 8
+    assert len(sample[0]["name"]) == MAX_NAME_CHARS
+    assert len(sample[0]["id"]) == 36
+
+
+def test_limit_replaces_malformed_players():
+    raw = {"players": "everyone", "description": "motd"}
+
+    assert Probe(_FakeLogger()).limit(raw) == ["players"]
+    assert raw["players"] == {}
+
+
+def test_missing_pong_leaves_latency_unknown():
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+
+    def run():
+        conn, _ = server.accept()
+        with conn:
+            conn.recv(4096)
+            text = json.dumps({"description": "no pong"}).encode()
+            body = varint(0) + varint(len(text)) + text
+            conn.sendall(varint(len(body)) + body)
+
+    threading.Thread(target=run, daemon=True).start()
+    with server:
+        result = Probe(_FakeLogger(), timeout=2.0).status(
+            "127.0.0.1", server.getsockname()[1]
+        )
+
+    assert result["raw"]["description"] == "no pong"
+    assert result["latency"] is None
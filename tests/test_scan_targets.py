@@ -0,0 +1,77 @@
+import ipaddress
+
+import pytest
+
+from scanCore import ScanTargets, prepare_ip_lists
+
+IP_LISTS = ["10.0.0.0/22", "192.168.1.0/24", "172.16.5.7/30", "2001:db8::/32"]
+
+
+def _eager(ip_lists, chunk_prefix_v4):
+    # what the scanner built before the chunks were expanded lazily
+    prepared = []
+    for cidr in ip_lists:
+        net = ipaddress.ip_network(cidr, strict=False)
+        if net.version == 4 and net.prefixlen < chunk_prefix_v4:
+            prepared.extend(
+                str(chunk) for chunk in net.subnets(new_prefix=chunk_prefix_v4)
+            )
+        else:
+            prepared.append(str(net))
+    return prepared
+
+
+def test_len_counts_every_chunk():
+    targets = ScanTargets(IP_LISTS, chunk_prefix_v4=24)
+
+    # four /24s, the /24 itself, the /30 and the untouched IPv6 network
+    assert len(targets) == 7
+    assert len(ScanTargets(IP_LISTS)) == 4
+
+
+def test_lazy_expansion_matches_the_eager_list():
+    for prefix in (22, 23, 24, 26):
+        targets = ScanTargets(IP_LISTS, chunk_prefix_v4=prefix)
+
+        assert list(targets) == _eager(IP_LISTS, prefix)
+        assert [targets[i] for i in range(len(targets))] == _eager(IP_LISTS, prefix)
+
+
+def test_indexing_at_chunk_boundaries():
+    targets = ScanTargets(IP_LISTS, chunk_prefix_v4=24)
+
+    assert targets[0] == "10.0.0.0/24"
+    assert targets[3] == "10.0.3.0/24"
+    assert targets[4] == "192.168.1.0/24"
+    assert targets[5] == "172.16.5.4/30"
+    assert targets[6] == "2001:db8::/32"
+
+
+def test_negative_and_out_of_range_indices():
+    targets = ScanTargets(IP_LISTS, chunk_prefix_v4=24)
+
+    assert targets[-1] == "2001:db8::/32"
+    assert targets[-7] == "10.0.0.0/24"
+    for index in (7, 100, -8):
+        with pytest.raises(IndexError):
+            targets[index]
+
+
+def test_invalid_cidrs_are_skipped_and_hosts_counted():
+    targets, host_count = prepare_ip_lists(
+        ["10.0.0.0/23", "not a network"], chunk_prefix_v4=24
+    )
+
+    assert list(targets) == ["10.0.0.0/24", "10.0.1.0/24"]
+    assert host_count == 512
+
+
+def test_iter_chunks_follows_the_order():
+    targets = ScanTargets(["10.0.0.0/22"], chunk_prefix_v4=24)
+
+    assert list(targets.iter_chunks(order=lambda index: 3 - index)) == [
+        "10.0.3.0/24",
+        "10.0.2.0/24",
+        "10.0.1.0/24",
+        "10.0.0.0/24",
+    ]
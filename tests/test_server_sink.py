@@ -0,0 +1,172 @@
+import threading
+
+from scanCore import ScanConfig, Scanner, ScanStats, ServerSink
+
+
+class _FakeLogger:
+    def info(self, message):
+        pass
+
+    error = debug = info
+
+    def suppressed(self):
+        return {}
+
+
+class _FakeFinder:
+    def __init__(self, answering):
+        self.answering = answering
+        self.checked = []
+
+    def check(self, host, full=True, webhook=None):
+        self.checked.append(host)
+        port = int(host.rsplit(":", 1)[1])
+        return {"host": host} if port in self.answering else None
+
+    def checkPort(self, ip, port):
+        self.checked.append(f"{ip}:{port} (extra)")
+        return {"host": ip, "port": port} if port in self.answering else None
+
+    def checkBedrock(self, ip, port):
+        return {"host": ip, "port": port}
+
+
+class _FakeUtils:
+    def __init__(self, finder):
+        self.finder = finder
+        self.logger = _FakeLogger()
+        self.archive = None
+        self.knownHosts = None
+        self.sightings = None
+        self.corpus = None
+        self.tarpits = None
+        self.negativeCache = None
+
+
+class _FakeTarpits:
+    def __init__(self, flagged):
+        self.flagged = flagged
+        self.stats = {}
+
+    def load(self):
+        pass
+
+    def filterPorts(self, ip, ports):
+        return [] if ip in self.flagged else ports
+
+
+class _RecordingSink:
+    def __init__(self):
+        self.handled = []
+
+    def handle(self, ip, ports, udp_ports=(), stats=None):
+        self.handled.append((ip, ports, udp_ports))
+        return [ip]
+
+
+def test_every_open_port_is_probed_and_every_answer_kept():
+    finder = _FakeFinder(answering={25566, 25568})
+    sink = ServerSink(_FakeUtils(finder))
+
+    results = sink.handle("10.0.0.1", [25565, 25566, 25567, 25568])
+
+    assert results == [
+        {"host": "10.0.0.1:25566"},
+        {"host": "10.0.0.1", "port": 25568},
+    ]
+    # the first answer is the ip's document, later ports are stored under it
+    assert finder.checked == [
+        "10.0.0.1:25565",
+        "10.0.0.1:25566",
+        "10.0.0.1:25567 (extra)",
+        "10.0.0.1:25568 (extra)",
+    ]
+
+
+def test_udp_ports_are_pinged_as_bedrock():
+    finder = _FakeFinder(answering=set())
+    sink = ServerSink(_FakeUtils(finder))
+
+    results = sink.handle("10.0.0.1", [], [19132])
+
+    assert results == [{"host": "10.0.0.1", "port": 19132}]
+
+
+def test_each_scan_counts_only_its_own_hosts():
+    finder = _FakeFinder(answering={25565})
+    utils = _FakeUtils(finder)
+    utils.tarpits = _FakeTarpits(flagged={"10.0.0.9"})
+    sink = ServerSink(utils)
+    first, second = sink.start(), sink.start()
+
+    sink.handle("10.0.0.1", [25565], stats=first)
+    sink.handle("10.0.0.2", [25566], stats=first)
+    sink.handle("10.0.0.9", [25565, 25566], stats=second)
+
+    assert first.as_dict() == {
+        "hosts": 2,
+        "tarpitPorts": 0,
+        "skippedPorts": 0,
+        "servers": 1,
+    }
+    assert second.as_dict() == {
+        "hosts": 1,
+        "tarpitPorts": 2,
+        "skippedPorts": 0,
+        "servers": 0,
+    }
+
+
+def test_scan_stats_are_safe_across_worker_threads():
+    sink = ServerSink(_FakeUtils(_FakeFinder(answering={25565})))
+    stats = sink.start()
+
+    def worker():
+        for _ in range(100):
+            sink.handle("10.0.0.1", [25565], stats=stats)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert stats.as_dict()["servers"] == 800
+
+
+def test_scanner_splits_open_ports_by_transport():
+    sink = _RecordingSink()
+    scanner = Scanner(ScanConfig(), sink=sink)
+
+    result = scanner.check(
+        {
+            "10.0.0.1": [
+                {"status": "open", "port": 25566, "proto": "tcp"},
+                {"status": "open", "port": 25565, "proto": "tcp"},
+                {"status": "closed", "port": 25567, "proto": "tcp"},
+                {"status": "open", "port": 19132, "proto": "udp"},
+            ]
+        }
+    )
+
+    assert result == ["10.0.0.1"]
+    assert sink.handled == [("10.0.0.1", [25565, 25566], [19132])]
+
+
+def test_stopped_scanner_hands_nothing_to_the_sink():
+    sink = _RecordingSink()
+    scanner = Scanner(ScanConfig(), sink=sink)
+    scanner.stop()
+
+    assert scanner.check("10.0.0.1") == []
+    assert sink.handled == []
+
+
+def test_suppressed_records_are_counted_from_the_scan_start():
+    stats = ScanStats({"finder.py:10": 5, "tarpit.py:20": 2})
+
+    suppressed = stats.suppressed_since_start(
+        {"finder.py:10": 12, "tarpit.py:20": 2, "players.py:30": 4}
+    )
+
+    assert suppressed == {"finder.py:10": 7, "players.py:30": 4}
@@ -0,0 +1,173 @@
+import pytest
+
+# importing utils pulls in the whole bot stack
+pytest.importorskip("interactions")
+pytest.importorskip("javascript")
+pytest.importorskip("quarry")
+
+from pymongo import UpdateOne  # noqa: E402
+
+from utils.sightings import SECONDS_PER_DAY, Sightings  # noqa: E402
+
+DAY = 20000
+START = DAY * SECONDS_PER_DAY
+
+
+class _FakeLogger:
+    def info(self, message):
+        pass
+
+    error = debug = print = info
+
+
+class _FakeCursor(list):
+    def close(self):
+        pass
+
+
+class _FakeCollection:
+    def __init__(self, buckets=()):
+        self.buckets = list(buckets)
+        self.writes = []
+        self.queries = []
+
+    def create_index(self, keys):
+        pass
+
+    def bulk_write(self, requests, ordered=True):
+        self.writes.append((list(requests), ordered))
+
+    def find(self, query, projection=None, batch_size=None):
+        self.queries.append(query)
+        return _FakeCursor(self.buckets)
+
+
+def _sightings(col, **kwargs):
+    kwargs.setdefault("flushSize", 1000)
+    kwargs.setdefault("flushInterval", 3600)
+    return Sightings(col, _FakeLogger(), **kwargs)
+
+
+def _push(host, day, samples):
+    return UpdateOne(
+        {"_id": f"{host}:{day}"},
+        {
+            "$setOnInsert": {"host": host, "day": day, "downsampled": False},
+            "$push": {"samples": {"$each": samples}},
+            "$inc": {"count": len(samples)},
+            "$min": {"first": samples[0][0]},
+            "$max": {"last": samples[-1][0]},
+        },
+        upsert=True,
+    )
+
+
+def test_flush_pushes_buffered_samples_in_one_bulk_write():
+    col = _FakeCollection()
+    sightings = _sightings(col)
+    sightings.record("10.0.0.1", START + 10.04, 3, 40)
+    sightings.record("10.0.0.1", START + 70, "3", None)
+    sightings.record("10.0.0.2", START + 20, 0, 12)
+
+    assert col.writes == []
+    assert sightings.flush() == 3
+
+    assert col.writes == [
+        (
+            [
+                _push("10.0.0.1", DAY, [[START + 10.0, 3, 40], [START + 70.0, -1, -1]]),
+                _push("10.0.0.2", DAY, [[START + 20.0, 0, 12]]),
+            ],
+            False,
+        )
+    ]
+    assert sightings.flush() == 0
+    assert len(col.writes) == 1
+
+
+def test_samples_are_batched_per_day_bucket():
+    col = _FakeCollection()
+    sightings = _sightings(col)
+    sightings.record("10.0.0.1", START - 1, 1, 10)
+    sightings.record("10.0.0.1", START, 2, 20)
+    sightings.record("10.0.0.1", START + SECONDS_PER_DAY + 5, 3, 30)
+
+    sightings.flush()
+
+    ((requests, _),) = col.writes
+    assert requests == [
+        _push("10.0.0.1", DAY - 1, [[START - 1.0, 1, 10]]),
+        _push("10.0.0.1", DAY, [[START + 0.0, 2, 20]]),
+        _push("10.0.0.1", DAY + 1, [[START + SECONDS_PER_DAY + 5.0, 3, 30]]),
+    ]
+
+
+def test_full_buffer_triggers_a_flush():
+    col = _FakeCollection()
+    sightings = _sightings(col, flushSize=2)
+
+    sightings.record("10.0.0.1", START, 1, 10)
+    assert col.writes == []
+    sightings.record("10.0.0.1", START + 1, 1, 10)
+
+    assert len(col.writes) == 1
+
+
+def test_downsample_averages_each_window_and_skips_missing_values():
+    bucket = {
+        "_id": f"10.0.0.1:{DAY}",
+        "samples": [
+            [START + 10, 4, 40],
+            [START + 1800, 7, -1],
+            [START + 3599, -1, 61],
+            [START + 3600, -1, -1],
+            [START + 7300, 10, 20],
+        ],
+    }
+    col = _FakeCollection([bucket])
+    sightings = _sightings(col)
+
+    done = sightings.downsample(
+        olderThanDays=30, resolution=3600, now=START + 31 * SECONDS_PER_DAY
+    )
+
+    assert done == 1
+    assert col.queries == [{"day": {"$lt": DAY + 1}, "downsampled": {"$ne": True}}]
+    samples = [
+        # 5.5 players and 50.5 ms both round half to even
+        [float(START), 6, 50],
+        [float(START + 3600), -1, -1],
+        [float(START + 7200), 10, 20],
+    ]
+    assert col.writes == [
+        (
+            [
+                UpdateOne(
+                    {"_id": bucket["_id"]},
+                    {
+                        "$set": {
+                            "samples": samples,
+                            "count": 3,
+                            "downsampled": True,
+                            "resolution": 3600,
+                        }
+                    },
+                )
+            ],
+            False,
+        )
+    ]
+
+
+def test_downsample_writes_in_batches():
+    buckets = [
+        {"_id": f"10.0.0.{idx}:{DAY}", "samples": [[START, idx, 10]]}
+        for idx in range(5)
+    ]
+    col = _FakeCollection(buckets)
+    sightings = _sightings(col)
+
+    done = sightings.downsample(batchSize=2, now=START + 60 * SECONDS_PER_DAY)
+
+    assert done == 5
+    assert [len(requests) for requests, _ in col.writes] == [2, 2, 1]
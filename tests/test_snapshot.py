@@ -0,0 +1,165 @@
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+from snapshot import SnapshotError, sightings_path, write_snapshot  # noqa: E402
+
+
+class _FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.documents)
+
+    def close(self):
+        self.closed = True
+
+
+class _FakeCollection:
+    def __init__(self, documents):
+        self.documents = documents
+        self.cursors = []
+
+    def find(self, query, projection=None, batch_size=None):
+        # like Mongo, _id comes back unless it is projected away
+        fields = {"_id": 1, **projection}
+        cursor = _FakeCursor(
+            [
+                {key: value for key, value in doc.items() if fields.get(key)}
+                for doc in self.documents
+            ]
+        )
+        self.cursors.append(cursor)
+        return cursor
+
+
+class _FakeDatabase:
+    def __init__(self, **collections):
+        self.collections = {
+            name: _FakeCollection(documents) for name, documents in collections.items()
+        }
+
+    def __getitem__(self, name):
+        return self.collections[name]
+
+    def list_collection_names(self):
+        return list(self.collections)
+
+
+def _server(host, version="1.20.4", **fields):
+    doc = {
+        "host": host,
+        "hostname": host,
+        "lastOnline": 1000.0,
+        "lastOnlinePlayers": 3,
+        "lastOnlinePlayersMax": 20,
+        "lastOnlinePing": 40,
+        "lastOnlineVersion": version,
+        "lastOnlineVersionProtocol": "765",
+        "lastOnlineDescription": "A test server",
+        "cracked": False,
+        "whitelisted": True,
+    }
+    doc.update(fields)
+    return doc
+
+
+def _read(path, fmt):
+    if fmt == "parquet":
+        return pq.read_table(path)
+    with pa.OSFile(path, "rb") as source:
+        return pa.ipc.open_stream(source).read_all()
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_servers_are_written_in_batches(tmp_path, fmt):
+    db = _FakeDatabase(
+        servers=[
+            _server(f"10.0.0.{idx}", "1.8.9" if idx % 2 else "1.20.4")
+            for idx in range(5)
+        ]
+    )
+    path = str(tmp_path / f"servers.{fmt}")
+    progress = []
+
+    result = write_snapshot(db, path, fmt=fmt, batch_size=2, progress=progress.append)
+
+    table = _read(path, fmt)
+    assert result["servers"] == {"path": path, "rows": 5}
+    assert progress == [2, 4]
+    assert table.column("host").to_pylist() == [f"10.0.0.{idx}" for idx in range(5)]
+    assert table.column("whitelisted").to_pylist() == [True] * 5
+    assert all(cursor.closed for cursor in db["servers"].cursors)
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_low_cardinality_columns_are_dictionary_encoded(tmp_path, fmt):
+    db = _FakeDatabase(servers=[_server("10.0.0.1"), _server("10.0.0.2")])
+    path = str(tmp_path / f"servers.{fmt}")
+
+    write_snapshot(db, path, fmt=fmt)
+
+    schema = _read(path, fmt).schema
+    assert pa.types.is_dictionary(schema.field("lastOnlineVersion").type)
+    assert pa.types.is_dictionary(schema.field("lastOnlineDescription").type)
+    assert pa.types.is_string(schema.field("host").type)
+
+
+def test_mixed_type_fields_are_coerced(tmp_path):
+    db = _FakeDatabase(
+        servers=[
+            _server("10.0.0.1", lastOnlinePlayers="7", lastOnlineVersionProtocol=765),
+            _server("10.0.0.2", lastOnlinePlayers="many", lastOnlinePing=None),
+            {"_id": "abc", "lastOnline": "1500"},
+        ]
+    )
+    path = str(tmp_path / "servers.parquet")
+
+    write_snapshot(db, path)
+
+    table = pq.read_table(path)
+    assert table.column("lastOnlinePlayers").to_pylist() == [7, None, None]
+    assert table.column("lastOnlinePing").to_pylist() == [40, None, None]
+    assert table.column("lastOnlineVersionProtocol").to_pylist() == ["765", "765", None]
+    # documents without a host fall back to their _id
+    assert table.column("host").to_pylist()[2] == "abc"
+    assert table.column("lastOnline").to_pylist()[2] == 1500.0
+
+
+def test_sightings_are_exported_next_to_the_servers(tmp_path):
+    db = _FakeDatabase(
+        servers=[_server("10.0.0.1")],
+        sightings=[
+            {"host": "10.0.0.1", "samples": [[1000, 3, 40], [1060, "4", 41]]},
+            {"host": "10.0.0.2", "samples": [[1000, 1]]},
+            {"host": "10.0.0.3"},
+        ],
+    )
+    path = str(tmp_path / "servers.parquet")
+
+    result = write_snapshot(db, path)
+
+    extra = sightings_path(path)
+    assert extra == str(tmp_path / "servers-sightings.parquet")
+    assert result["sightings"] == {"path": extra, "rows": 2}
+    table = pq.read_table(extra)
+    assert table.column("host").to_pylist() == ["10.0.0.1", "10.0.0.1"]
+    assert table.column("timestamp").to_pylist() == [1000.0, 1060.0]
+    assert table.column("players").to_pylist() == [3, 4]
+
+
+def test_sightings_are_skipped_without_a_collection(tmp_path):
+    db = _FakeDatabase(servers=[_server("10.0.0.1")])
+
+    result = write_snapshot(db, str(tmp_path / "servers.parquet"))
+
+    assert "sightings" not in result
+    assert not (tmp_path / "servers-sightings.parquet").exists()
+
+
+def test_unknown_format_is_rejected(tmp_path):
+    with pytest.raises(SnapshotError):
+        write_snapshot(_FakeDatabase(servers=[]), str(tmp_path / "x"), fmt="csv")
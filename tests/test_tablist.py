@@ -0,0 +1,134 @@
+import pytest
+
+# importing utils pulls in the whole bot stack
+pytest.importorskip("interactions")
+pytest.importorskip("javascript")
+pytest.importorskip("quarry")
+
+from quarry.net.auth import OfflineProfile  # noqa: E402
+
+from utils.players import Players  # noqa: E402
+from utils.tablist import (  # noqa: E402
+    ERROR,
+    KICKED,
+    OK,
+    ONLINE_MODE,
+    TIMEOUT,
+    PlayerListFactory,
+)
+
+
+class _FakeLogger:
+    def info(self, message, sample=False):
+        pass
+
+    error = debug = print = info
+
+
+class _FakeSession:
+    def __init__(self, in_game, names=()):
+        self.in_game = in_game
+        self._names = list(names)
+        self.closed = False
+
+    def names(self):
+        return self._names
+
+    def close(self):
+        self.closed = True
+
+
+class _FakeTabList:
+    """Hands crackedPlayerList whatever the factory resolved to"""
+
+    def __init__(self, factory):
+        self.factory = factory
+
+    def fetch(self, host, port=25565, protocol=None):
+        results = []
+        self.factory.outcome.addCallback(results.append)
+        return results[0]
+
+
+def _factory():
+    return PlayerListFactory("10.0.0.1", 25565, OfflineProfile("pilot1782"), 5.0)
+
+
+def _outcomes(factory):
+    results = []
+    factory.outcome.addCallback(results.append)
+    return results
+
+
+def test_session_resolves_exactly_once():
+    factory = _factory()
+    results = _outcomes(factory)
+
+    factory.resolve(KICKED, reason="You are not whitelisted")
+    factory.resolve(OK, ["steve"])
+    factory.expire()
+
+    assert results == [
+        {
+            "host": "10.0.0.1",
+            "port": 25565,
+            "outcome": KICKED,
+            "players": [],
+            "reason": "You are not whitelisted",
+        }
+    ]
+
+
+def test_expire_before_joining_is_a_timeout():
+    factory = _factory()
+    results = _outcomes(factory)
+    factory.session = _FakeSession(in_game=False)
+
+    factory.expire()
+
+    assert [result["outcome"] for result in results] == [TIMEOUT]
+    assert factory.session.closed
+
+
+def test_expire_after_joining_keeps_the_tab_list():
+    factory = _factory()
+    results = _outcomes(factory)
+    factory.session = _FakeSession(in_game=True, names=["alex", "steve"])
+
+    factory.expire()
+
+    assert results[0]["outcome"] == OK
+    assert results[0]["players"] == ["alex", "steve"]
+
+
+def test_expire_without_a_connection_is_a_timeout():
+    factory = _factory()
+    results = _outcomes(factory)
+
+    factory.expire()
+
+    assert [result["outcome"] for result in results] == [TIMEOUT]
+
+
+@pytest.mark.parametrize(
+    "outcome, cracked, expected",
+    [
+        (OK, False, ["alex", "steve"]),
+        (KICKED, False, []),
+        (ONLINE_MODE, True, None),
+        (TIMEOUT, False, None),
+        (TIMEOUT, True, []),
+        (ERROR, False, None),
+        (ERROR, True, []),
+    ],
+)
+def test_outcomes_map_through_cracked_player_list(
+    monkeypatch, outcome, cracked, expected
+):
+    factory = _factory()
+    factory.resolve(outcome, ["alex", "steve"] if outcome == OK else None)
+    players = Players(_FakeLogger(), None, None)
+    monkeypatch.setattr(players, "tabList", lambda username: _FakeTabList(factory))
+    monkeypatch.setattr(players, "crackCheckAPI", lambda host, port: cracked)
+
+    assert players.crackedPlayerList("10.0.0.1", "25565") == expected
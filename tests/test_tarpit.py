@@ -0,0 +1,105 @@
+import datetime
+
+import pytest
+
+# importing utils pulls in the whole bot stack
+pytest.importorskip("interactions")
+pytest.importorskip("javascript")
+pytest.importorskip("quarry")
+
+from utils.tarpit import Tarpits  # noqa: E402
+
+PORTS = list(range(25565, 25578))
+
+
+class _FakeLogger:
+    def info(self, message, sample=False):
+        pass
+
+    error = debug = info
+
+
+class _FakeCollection:
+    def __init__(self, documents=()):
+        self.documents = {doc["_id"]: doc for doc in documents}
+
+    def create_index(self, *args, **kwargs):
+        pass
+
+    def find(self, query, projection=None):
+        after = query["expiresAt"]["$gt"]
+        return [doc for doc in self.documents.values() if doc["expiresAt"] > after]
+
+    def update_one(self, query, update, upsert=False):
+        doc = self.documents.setdefault(query["_id"], {"_id": query["_id"]})
+        doc.update(update["$set"])
+
+
+def _tarpits(acceptsAny=False, answers=True, **kwargs):
+    tarpits = Tarpits(_FakeCollection(), _FakeLogger(), **kwargs)
+    tarpits.tested = []
+    tarpits._acceptsAnyPort = lambda ip: tarpits.tested.append(ip) or acceptsAny
+    tarpits._answersStatus = lambda ip, port: answers
+    return tarpits
+
+
+def test_hosts_below_the_threshold_are_not_tested():
+    tarpits = _tarpits(acceptsAny=True, portThreshold=8)
+
+    assert tarpits.filterPorts("10.0.0.1", PORTS[:3]) == PORTS[:3]
+    assert tarpits.tested == []
+    assert tarpits.stats["tested"] == 0
+
+
+def test_host_accepting_any_port_is_flagged_and_stored():
+    tarpits = _tarpits(acceptsAny=True, sampleRate=0)
+
+    assert tarpits.filterPorts("10.0.0.1", PORTS) == []
+    stored = tarpits.col.documents["10.0.0.1"]
+    assert stored["reason"] == "accepts-any-port"
+    assert stored["expiresAt"] > datetime.datetime.now(datetime.timezone.utc)
+    assert tarpits.stats == {"tested": 1, "flagged": 1, "skipped": 1, "sampled": 0}
+
+    # flagged hosts are not tested again
+    assert tarpits.filterPorts("10.0.0.1", PORTS) == []
+    assert tarpits.tested == ["10.0.0.1"]
+
+
+def test_silent_port_flags_the_host():
+    tarpits = _tarpits(answers=False, sampleRate=0)
+
+    assert tarpits.isTarpit("10.0.0.1", PORTS)
+    assert tarpits.col.documents["10.0.0.1"]["reason"] == "silent"
+
+
+def test_answering_host_keeps_every_port():
+    tarpits = _tarpits()
+
+    assert tarpits.filterPorts("10.0.0.1", PORTS) == PORTS
+    assert tarpits.stats["tested"] == 1
+    assert tarpits.stats["flagged"] == 0
+
+
+def test_flagged_host_can_be_sampled_on_one_port():
+    tarpits = _tarpits(acceptsAny=True, sampleRate=1)
+
+    sampled = tarpits.filterPorts("10.0.0.1", PORTS)
+
+    assert len(sampled) == 1 and sampled[0] in PORTS
+    assert tarpits.stats["sampled"] == 1
+
+
+def test_load_only_keeps_unexpired_hosts():
+    now = datetime.datetime.now(datetime.timezone.utc)
+    col = _FakeCollection(
+        [
+            {"_id": "10.0.0.1", "expiresAt": now + datetime.timedelta(days=1)},
+            {"_id": "10.0.0.2", "expiresAt": now - datetime.timedelta(days=1)},
+        ]
+    )
+    tarpits = Tarpits(col, _FakeLogger())
+
+    tarpits.load()
+
+    assert tarpits.isTarpit("10.0.0.1", [25565])
+    assert not tarpits.isTarpit("10.0.0.2", [25565])
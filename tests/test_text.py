@@ -0,0 +1,101 @@
+import pytest
+
+# importing utils pulls in the whole bot stack
+pytest.importorskip("interactions")
+pytest.importorskip("javascript")
+pytest.importorskip("quarry")
+
+from utils.text import (  # noqa: E402
+    ANSI_RESET,
+    MAX_COMPONENT_DEPTH,
+    Text,
+    renderComponent,
+    renderComponents,
+)
+
+GREEN, RED, YELLOW, BLUE = "\x1b[32m", "\x1b[31m", "\x1b[33m", "\x1b[34m"
+
+
+class _FakeLogger:
+    def info(self, message):
+        pass
+
+    error = debug = print = info
+
+
+def test_legacy_codes_color_until_the_next_code():
+    plain, ansi, _ = renderComponent("§aHello §lbold §cred")
+
+    assert plain == "Hello bold red"
+    # formatting codes like §l keep the current color
+    assert ansi == GREEN + "Hello bold " + RED + "red"
+
+
+def test_reset_code_goes_back_to_no_color():
+    plain, ansi, _ = renderComponent("§cRed§r plain")
+
+    assert plain == "Red plain"
+    assert ansi == RED + "Red" + ANSI_RESET + " plain"
+    assert ANSI_RESET == "\x1b[0m"
+
+
+def test_reset_code_goes_back_to_the_parent_color():
+    _, ansi, _ = renderComponent({"text": "§cred§rgold", "color": "gold"})
+
+    assert ansi == RED + "red" + YELLOW + "gold"
+
+
+def test_trailing_lone_section_sign_is_dropped():
+    assert renderComponent("trailing§")[:2] == ("trailing", "trailing")
+    assert renderComponent("§")[:2] == ("", "")
+
+
+def test_nested_extra_inherits_color():
+    component = {
+        "text": "A",
+        "color": "gold",
+        "extra": [
+            {"text": "B", "extra": ["§9C", {"text": "D", "color": "reset"}]},
+        ],
+    }
+
+    plain, ansi, _ = renderComponent(component)
+
+    assert plain == "ABCD"
+    assert ansi == YELLOW + "AB" + BLUE + "C" + ANSI_RESET + "D"
+
+
+def test_list_components_render_in_order():
+    plain, ansi, _ = renderComponent(["§aone", {"text": "two", "color": "red"}, 3])
+
+    assert plain == "onetwo3"
+    # siblings do not inherit from each other
+    assert ansi == GREEN + "one" + RED + "two" + ANSI_RESET + "3"
+
+
+def test_hex_colors_map_to_the_nearest_code():
+    assert renderComponent({"text": "x", "color": "#ff5555"})[1] == RED + "x"
+
+
+def test_deeply_nested_components_stop_at_the_depth_limit():
+    component = {"text": "x"}
+    for _ in range(MAX_COMPONENT_DEPTH + 10):
+        component = {"text": "", "extra": [component]}
+
+    assert renderComponent(component)[0] == ""
+
+
+def test_markdown_and_ansi_wrappers():
+    text = Text(_FakeLogger())
+
+    assert text.colorAnsi("§aHi") == GREEN + "Hi"
+    assert text.markFilter("§aHi") == "```ansi\n" + GREEN + "Hi\n```"
+    # fancy fonts are normalized for Discord, the ANSI text is left as is
+    assert text.markFilter("ｆａｎｃｙ") == "```ansi\nfancy\n```"
+    assert text.colorAnsi("ｆａｎｃｙ") == "ｆａｎｃｙ"
+
+
+def test_render_many_matches_render_one_by_one():
+    components = ["§aone", {"text": "two", "color": "red"}, ["three"]]
+
+    assert renderComponents(components) == [renderComponent(c) for c in components]
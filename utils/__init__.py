@@ -1,13 +1,24 @@
-"""The utils package which contains database, finder, logger, players, and text
+"""The utils package which contains archive, corpus, database, engine, events,
+finder, knownhosts, logger, negcache, players, probe, sightings, status,
+tablist, tarpit, and text
 """
 
 import pymongo
 
+from .archive import Archive
+from .corpus import Corpus
 from .database import Database
+from .engine import ProbeEngine
+from .events import EventBus
 from .finder import Finder
+from .knownhosts import KnownHosts
 from .logger import Logger
+from .negcache import NegativeCache
 from .players import Players
+from .probe import Probe
 from .server import Server
+from .sightings import Sightings
+from .tarpit import Tarpits
 from .text import Text
 
 
@@ -21,6 +32,7 @@ class utils:
         debug=True,
         allowJoin=False,
         level: int = 20,
+        corpusPath: str = None,
     ):
         """Initializes the utils class
 
@@ -29,6 +41,7 @@ class utils:
             col (pymongo.collection.Collection): The database collection
             debug (bool, optional): Show debugging. Defaults to True.
             level (int, optional): The logging level. Defaults to 20 (INFO).
+            corpusPath (str, optional): Capture raw status responses to this file. Defaults to None.
         """
         self.col = col
         self.logLevel = level
@@ -39,8 +52,9 @@ class utils:
         )
         self.logger.clear()
         self.text = Text(self.logger)
+        self.events = EventBus(self.logger)
         if allowJoin:
-            self.server = Server(self.logger)
+            self.server = Server(self.logger, events=self.events)
         else:
             self.server = None
         self.database = Database()
@@ -50,7 +64,43 @@ class utils:
             col=self.col,
             server=self.server,
             text=self.text,
+            events=self.events,
         )
+        self.sightings = (
+            Sightings(self.col.database["sightings"], self.logger)
+            if self.col is not None
+            else None
+        )
+        self.tarpits = (
+            Tarpits(self.col.database["tarpits"], self.logger)
+            if self.col is not None
+            else None
+        )
+        self.negativeCache = (
+            NegativeCache(self.col.database["probe_failures"], self.logger)
+            if self.col is not None
+            else None
+        )
+        self.archive = (
+            Archive(self.col, self.col.database["servers_archive"], self.logger)
+            if self.col is not None
+            else None
+        )
+        self.knownHosts = (
+            KnownHosts(self.col, self.logger) if self.col is not None else None
+        )
+        self.corpus = Corpus(corpusPath, self.logger) if corpusPath else None
+        self.probe = Probe(self.logger)
+        self.engine = ProbeEngine(self.logger, limits=self.probe)
         self.finder = Finder(
-            logger=self.logger, col=self.col, Text=self.text, Player=self.players
+            logger=self.logger,
+            col=self.col,
+            Text=self.text,
+            Player=self.players,
+            Sightings=self.sightings,
+            Archive=self.archive,
+            KnownHosts=self.knownHosts,
+            NegativeCache=self.negativeCache,
+            Corpus=self.corpus,
+            Engine=self.engine,
         )
@@ -0,0 +1,104 @@
+import time
+import traceback
+from typing import Optional
+
+import pymongo
+from pymongo import ReplaceOne
+
+SECONDS_PER_DAY = 86400
+
+
+class Archive:
+    """Moves long-dead servers out of the primary collection and back again"""
+
+    def __init__(
+        self,
+        col: pymongo.collection.Collection,
+        archiveCol: pymongo.collection.Collection,
+        logger,
+    ):
+        """Initializes the Archive class
+
+        Args:
+            col (pymongo.collection.Collection): The servers collection
+            archiveCol (pymongo.collection.Collection): The archive collection
+            logger (Logger): The logger class
+        """
+        self.col = col
+        self.archiveCol = archiveCol
+        self.logger = logger
+        self._indexed = False
+
+    def ensureIndexes(self) -> None:
+        if self._indexed:
+            return
+        self.col.create_index("lastOnline")
+        # the API's facet snapshot refreshes on lastOnline or updatedAt
+        self.col.create_index("updatedAt")
+        self.archiveCol.create_index("host")
+        self.archiveCol.create_index("hostname")
+        self._indexed = True
+
+    def archiveStale(
+        self,
+        olderThanDays: float = 90,
+        batchSize: int = 1000,
+        now: Optional[float] = None,
+    ) -> int:
+        """Moves servers last seen before the cutoff into the archive in batches
+
+        Args:
+            olderThanDays (float, optional): Offline age that counts as dead. Defaults to 90.
+            batchSize (int, optional): Documents moved per round trip. Defaults to 1000.
+
+        Returns:
+            int: number of servers archived
+        """
+        self.ensureIndexes()
+        cutoff = (now or time.time()) - olderThanDays * SECONDS_PER_DAY
+        stale = {"lastOnline": {"$lt": cutoff}}
+        moved = 0
+        while True:
+            batch = list(self.col.find(stale).limit(batchSize))
+            if not batch:
+                break
+            self.archiveCol.bulk_write(
+                [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in batch],
+                ordered=False,
+            )
+            ids = [doc["_id"] for doc in batch]
+            # re-check the cutoff so a server probed meanwhile stays put
+            result = self.col.delete_many({"_id": {"$in": ids}, **stale})
+            moved += result.deleted_count
+            if result.deleted_count < len(batch):
+                live = [
+                    doc["_id"]
+                    for doc in self.col.find({"_id": {"$in": ids}}, {"_id": 1})
+                ]
+                self.archiveCol.delete_many({"_id": {"$in": live}})
+            if len(batch) < batchSize:
+                break
+        self.logger.info(f"Archived {moved} servers offline for {olderThanDays} days")
+        return moved
+
+    def restore(self, ip: str) -> Optional[dict]:
+        """Moves an archived server back into the primary collection
+
+        Args:
+            ip (str): the server ip
+
+        Returns:
+            dict | None: the restored document, None if it was not archived
+        """
+        try:
+            doc = self.archiveCol.find_one({"host": ip})
+            if doc is None:
+                return None
+            # copy before deleting so a crash in between never loses the server
+            self.col.replace_one({"_id": doc["_id"]}, doc, upsert=True)
+            self.archiveCol.delete_one({"_id": doc["_id"]})
+            self.logger.info(f"{ip} restored from the archive")
+            return doc
+        except Exception:
+            self.logger.error(traceback.format_exc())
+            return None
@@ -0,0 +1,123 @@
+import gzip
+import json
+import threading
+import time
+import traceback
+from typing import Iterator
+
+
+def readCorpus(path: str) -> Iterator[dict]:
+    """Yields the captured records of a corpus file, skipping corrupt lines
+
+    A scan killed mid-flush leaves a truncated last gzip member, reading
+    stops cleanly at it.
+
+    Args:
+        path (str): a gzip JSONL file written by Corpus
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as handle:
+        try:
+            for line in handle:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+        except (EOFError, gzip.BadGzipFile):
+            return
+
+
+class Corpus:
+    """Appends raw status responses to a gzip JSONL file for offline replay
+
+    Each line looks like:
+        {
+            "at": ts,
+            "host": "1.2.3.4",
+            "port": 25565,
+            "ip": "1.2.3.4",
+            "hostname": "mc.example.net",
+            "latency": 42.0,         # ms, as measured by the probe
+            "raw": {...},            # the status JSON exactly as received
+        }
+
+    The file is opened in append mode, so every scan adds a gzip member and
+    the corpus grows across runs.
+    """
+
+    def __init__(self, path: str, logger, flushSize: int = 1000):
+        """Initializes the Corpus class
+
+        Args:
+            path (str): The corpus file
+            logger (Logger): The logger class
+            flushSize (int, optional): Buffered records that trigger a write. Defaults to 1000.
+        """
+        self.path = path
+        self.logger = logger
+        self.flushSize = flushSize
+
+        self._lock = threading.Lock()
+        self._buffer = []
+        self.recorded = 0
+
+    def record(
+        self,
+        host: str,
+        port,
+        raw: dict,
+        latency: float,
+        ip: str = None,
+        hostname: str = None,
+    ) -> None:
+        """Buffers one status response
+
+        Args:
+            host (str): the probed host
+            port (int): the probed port
+            raw (dict): the raw status JSON
+            latency (float): the probe latency in ms
+            ip (str, optional): the resolved ip
+            hostname (str, optional): the reverse resolved hostname
+        """
+        line = json.dumps(
+            {
+                "at": time.time(),
+                "host": host,
+                "port": int(port),
+                "ip": ip or host,
+                "hostname": hostname or host,
+                "latency": latency,
+                "raw": raw,
+            },
+            ensure_ascii=False,
+            default=str,
+        )
+        with self._lock:
+            self._buffer.append(line)
+            self.recorded += 1
+            due = len(self._buffer) >= self.flushSize
+        if due:
+            self.flush()
+
+    def flush(self) -> int:
+        """Writes buffered records as one gzip member
+
+        Returns:
+            int: number of records written
+        """
+        with self._lock:
+            buffer, self._buffer = self._buffer, []
+            if not buffer:
+                return 0
+            try:
+                with gzip.open(self.path, "at", encoding="utf-8") as handle:
+                    handle.write("\n".join(buffer) + "\n")
+            except Exception:
+                self.logger.error(
+                    "Failed to write {} corpus records to {}".format(
+                        len(buffer), self.path
+                    )
+                )
+                self.logger.error(traceback.format_exc())
+                return 0
+        return len(buffer)
@@ -0,0 +1,441 @@
+import asyncio
+import random
+import struct
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from metrics import PROBE_SECONDS, PROBES, PROBES_STARTED
+
+from .probe import Probe, ProbeError, readVarint, statusRequest, varint
+
+BEDROCK_PORT = 19132
+MAX_QUERY_PLAYERS = 1000
+DEFAULT_CONCURRENCY = 256
+# RakNet's offline message id, present in every unconnected ping and pong
+RAKNET_MAGIC = bytes.fromhex("00ffff00fefefefefdfdfdfd12345678")
+QUERY_PLAYERS_MARKER = b"\x00\x00\x01player_\x00\x00"
+
+
+def probeResult(
+    edition: str,
+    host: str,
+    port: int,
+    transport: str,
+    raw: dict,
+    latency: Optional[float],
+    truncated: Optional[List[str]] = None,
+    text: Optional[str] = None,
+) -> Dict:
+    """The schema every codec returns
+
+    raw always has the shape of a modern status response, version, players
+    and description, whatever the server actually spoke. The limits change
+    raw in place, so text keeps the status JSON as received where there is
+    one, for the corpus.
+    """
+    return {
+        "edition": edition,
+        "host": host,
+        "port": int(port),
+        "transport": transport,
+        "raw": raw,
+        "latency": latency,
+        "truncated": truncated or [],
+        "text": text,
+    }
+
+
+def _int(value, default: int = 0) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class _Datagrams(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.queue = asyncio.Queue()
+
+    def datagram_received(self, data, addr):
+        self.queue.put_nowait(data)
+
+    def error_received(self, exc):
+        self.queue.put_nowait(exc)
+
+    async def receive(self) -> bytes:
+        data = await self.queue.get()
+        if isinstance(data, Exception):
+            raise data
+        return data
+
+
+class Codec:
+    """One way of asking a server for its status
+
+    Subclasses set name, transport and defaultPort and implement probe, which
+    returns probeResult(...) or raises OSError / ProbeError. The engine owns
+    timeouts and concurrency, so codecs just await their exchange.
+    """
+
+    name = ""
+    transport = "tcp"
+    defaultPort = 25565
+    # seconds, None uses the engine timeout
+    timeout: Optional[float] = None
+
+    async def probe(self, engine: "ProbeEngine", host: str, port: int) -> Dict:
+        raise NotImplementedError
+
+    async def _udp(self, host: str, port: int, request: bytes):
+        loop = asyncio.get_running_loop()
+        transport, protocol = await loop.create_datagram_endpoint(
+            _Datagrams, remote_addr=(host, port)
+        )
+        transport.sendto(request)
+        return transport, protocol
+
+
+class JavaCodec(Codec):
+    """Server List Ping, 1.7 and newer"""
+
+    name = "java"
+
+    async def _varint(self, reader: asyncio.StreamReader) -> int:
+        data = bytearray()
+        while True:
+            data += await reader.readexactly(1)
+            if not data[-1] & 0x80:
+                return readVarint(data)[0]
+            if len(data) >= 5:
+                raise ProbeError("varint longer than 5 bytes")
+
+    async def _packet(self, reader: asyncio.StreamReader, limit: int) -> bytes:
+        length = await self._varint(reader)
+        if length <= 0 or length > limit:
+            raise ProbeError(f"packet length {length} out of bounds")
+        return await reader.readexactly(length)
+
+    async def probe(self, engine, host, port):
+        limits = engine.limits
+        connecting = time.perf_counter()
+        reader, writer = await asyncio.open_connection(host, port)
+        PROBE_SECONDS.labels("connect").observe(time.perf_counter() - connecting)
+        try:
+            writer.write(statusRequest(host, port))
+            await writer.drain()
+            packet = await self._packet(reader, limits.maxPacketBytes)
+            packetId, offset = readVarint(packet)
+            if packetId != 0:
+                raise ProbeError(f"unexpected packet id {packetId}")
+            length, offset = readVarint(packet, offset)
+            if length < 0 or offset + length > len(packet):
+                raise ProbeError("status string longer than its packet")
+            text = packet[offset : offset + length].decode("utf-8", "replace")
+            del packet
+
+            latency = None
+            try:
+                payload = struct.pack(">q", int(time.time() * 1000))
+                started = time.perf_counter()
+                writer.write(varint(9) + b"\x01" + payload)
+                await writer.drain()
+                pong = await self._packet(reader, 64)
+                if pong[1:] == payload:
+                    latency = (time.perf_counter() - started) * 1000
+            except (OSError, ProbeError, asyncio.IncompleteReadError):
+                pass
+        finally:
+            writer.close()
+        raw, truncated = limits.parse(text)
+        return probeResult(
+            self.name, host, port, "tcp", raw, latency, truncated, text=text
+        )
+
+
+class LegacyCodec(Codec):
+    """The 0xFE ping answered by servers before 1.7
+
+    1.4 to 1.6 reply with "§1\\0protocol\\0version\\0motd\\0online\\0max",
+    beta 1.8 to 1.3 with "motd§online§max".
+    """
+
+    name = "legacy"
+
+    async def probe(self, engine, host, port):
+        connecting = time.perf_counter()
+        reader, writer = await asyncio.open_connection(host, port)
+        PROBE_SECONDS.labels("connect").observe(time.perf_counter() - connecting)
+        try:
+            started = time.perf_counter()
+            writer.write(b"\xfe\x01")
+            await writer.drain()
+            header = await reader.readexactly(3)
+            latency = (time.perf_counter() - started) * 1000
+            if header[0] != 0xFF:
+                raise ProbeError(f"unexpected legacy packet id {header[0]}")
+            # length in UTF-16 code units, at most 128 KiB by construction
+            length = struct.unpack(">H", header[1:])[0]
+            text = (await reader.readexactly(length * 2)).decode("utf-16-be", "replace")
+        finally:
+            writer.close()
+
+        if text.startswith("§1\x00"):
+            fields = text.split("\x00")
+            if len(fields) < 6:
+                raise ProbeError("short legacy status")
+            _, protocol, version, motd, online, maximum = fields[:6]
+        else:
+            parts = text.rsplit("§", 2)
+            if len(parts) < 3:
+                raise ProbeError("short legacy status")
+            motd, online, maximum = parts
+            protocol, version = None, "Beta 1.8-1.3"
+        raw = {
+            "version": {"name": version, "protocol": _int(protocol, None)},
+            "players": {"online": _int(online), "max": _int(maximum)},
+            "description": motd,
+        }
+        truncated = engine.limits.limit(raw)
+        return probeResult(self.name, host, port, "tcp", raw, latency, truncated)
+
+
+class BedrockCodec(Codec):
+    """RakNet unconnected ping, answered by Bedrock servers on UDP 19132"""
+
+    name = "bedrock"
+    transport = "udp"
+    defaultPort = BEDROCK_PORT
+
+    @staticmethod
+    def request(clientGuid: int = 0) -> bytes:
+        return (
+            b"\x01"
+            + struct.pack(">q", int(time.time() * 1000))
+            + RAKNET_MAGIC
+            + struct.pack(">Q", clientGuid)
+        )
+
+    async def probe(self, engine, host, port):
+        started = time.perf_counter()
+        transport, protocol = await self._udp(
+            host, port, self.request(random.getrandbits(64))
+        )
+        try:
+            data = await protocol.receive()
+        finally:
+            transport.close()
+        latency = (time.perf_counter() - started) * 1000
+        # id, ping time, server guid, magic, string length
+        if len(data) < 35 or data[0] != 0x1C or data[17:33] != RAKNET_MAGIC:
+            raise ProbeError("not a RakNet unconnected pong")
+        length = struct.unpack(">H", data[33:35])[0]
+        fields = data[35 : 35 + length].decode("utf-8", "replace").split(";")
+        if len(fields) < 6:
+            raise ProbeError("short Bedrock status")
+        raw = {
+            "version": {"name": fields[3], "protocol": _int(fields[2], None)},
+            "players": {"online": _int(fields[4]), "max": _int(fields[5])},
+            "description": fields[1],
+            "bedrock": {
+                "edition": fields[0],
+                "serverId": fields[6] if len(fields) > 6 else "",
+                "levelName": fields[7] if len(fields) > 7 else "",
+                "gamemode": fields[8] if len(fields) > 8 else "",
+            },
+        }
+        truncated = engine.limits.limit(raw)
+        return probeResult(self.name, host, port, "udp", raw, latency, truncated)
+
+
+class QueryCodec(Codec):
+    """GameSpy 4 full stat query, when enable-query is set in server.properties
+
+    Unlike the status sample it lists every online player, so it replaces
+    joining the server to read the tab list.
+    """
+
+    name = "query"
+    transport = "udp"
+    timeout = 1.5
+
+    def _parse(self, data: bytes) -> Tuple[Dict[str, str], List[str]]:
+        # type, session id, then an 11 byte "splitnum" padding
+        body = data[16:]
+        info, _, players = body.partition(QUERY_PLAYERS_MARKER)
+        values = info.split(b"\x00")
+        stats = {}
+        for idx in range(0, len(values) - 1, 2):
+            if not values[idx]:
+                break
+            stats[values[idx].decode("latin-1")] = values[idx + 1].decode(
+                "utf-8", "replace"
+            )
+        names = [
+            name.decode("utf-8", "replace") for name in players.split(b"\x00") if name
+        ]
+        return stats, names
+
+    async def probe(self, engine, host, port):
+        session = random.getrandbits(32) & 0x0F0F0F0F
+        sessionBytes = struct.pack(">I", session)
+        started = time.perf_counter()
+        transport, protocol = await self._udp(
+            host, port, b"\xfe\xfd\x09" + sessionBytes
+        )
+        try:
+            challenge = await protocol.receive()
+            latency = (time.perf_counter() - started) * 1000
+            if challenge[:5] != b"\x09" + sessionBytes:
+                raise ProbeError("bad query handshake")
+            token = _int(challenge[5:].rstrip(b"\x00").decode("ascii", "replace"))
+            transport.sendto(
+                b"\xfe\xfd\x00"
+                + sessionBytes
+                + struct.pack(">i", token)
+                + b"\x00\x00\x00\x00"
+            )
+            data = await protocol.receive()
+        finally:
+            transport.close()
+        if data[:5] != b"\x00" + sessionBytes:
+            raise ProbeError("bad query full stat")
+
+        stats, names = self._parse(data)
+        raw = {
+            "version": {"name": stats.get("version", ""), "protocol": None},
+            "players": {
+                "online": _int(stats.get("numplayers")),
+                "max": _int(stats.get("maxplayers")),
+                "sample": [{"name": name, "id": ""} for name in names],
+            },
+            "description": stats.get("hostname", ""),
+            "query": {
+                "gametype": stats.get("gametype", ""),
+                "map": stats.get("map", ""),
+                "plugins": stats.get("plugins", ""),
+            },
+        }
+        truncated = engine.queryLimits.limit(raw)
+        return probeResult(self.name, host, port, "udp", raw, latency, truncated)
+
+
+def defaultCodecs() -> List[Codec]:
+    return [JavaCodec(), LegacyCodec(), BedrockCodec(), QueryCodec()]
+
+
+class ProbeEngine:
+    """Runs status codecs over one asyncio loop with shared limits and timeouts
+
+    Every codec returns the probeResult schema, so callers can probe a mix of
+    TCP and UDP endpoints and tell Java, pre-1.7, Bedrock and Query servers
+    apart from the result's edition. The loop lives in its own thread for the
+    life of the engine and worker threads submit probes to it.
+    """
+
+    def __init__(
+        self,
+        logger,
+        codecs: Optional[Iterable[Codec]] = None,
+        timeout: float = 3.0,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        limits: Optional[Probe] = None,
+    ):
+        """Initializes the ProbeEngine class
+
+        Args:
+            logger (Logger): The logger class
+            codecs (Iterable[Codec], optional): Codecs to register. Defaults to all four.
+            timeout (float, optional): Seconds per probe. Defaults to 3.0.
+            concurrency (int, optional): Probes in flight on the shared loop. Defaults to 256.
+            limits (Probe, optional): Size limits applied to every response.
+        """
+        self.logger = logger
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.limits = limits or Probe(logger, timeout=timeout)
+        # Query exists to read the whole player list, so it gets a longer one
+        self.queryLimits = Probe(
+            logger,
+            timeout=timeout,
+            maxPacketBytes=self.limits.maxPacketBytes,
+            maxDepth=self.limits.maxDepth,
+            maxSample=MAX_QUERY_PLAYERS,
+        )
+        self.codecs: Dict[str, Codec] = {}
+        for codec in codecs or defaultCodecs():
+            self.register(codec)
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loopLock = threading.Lock()
+        self._slots = asyncio.Semaphore(concurrency)
+
+    def register(self, codec: Codec) -> None:
+        """Adds or replaces the codec with codec.name"""
+        self.codecs[codec.name] = codec
+
+    async def probeAsync(self, host: str, port=None, codec: str = "java") -> Dict:
+        """Probes one endpoint with one codec
+
+        Raises:
+            OSError: the endpoint did not answer in time or refused
+            ProbeError: the answer was not valid for the codec
+        """
+        implementation = self.codecs[codec]
+        port = int(port or implementation.defaultPort)
+        PROBES_STARTED.labels(codec).inc()
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            response = await asyncio.wait_for(
+                implementation.probe(self, host, port),
+                implementation.timeout or self.timeout,
+            )
+            outcome = "ok"
+            # the whole exchange, java's connect is also recorded on its own
+            PROBE_SECONDS.labels("status" if codec == "java" else codec).observe(
+                time.perf_counter() - started
+            )
+            return response
+        except asyncio.TimeoutError as exc:
+            outcome = "timeout"
+            raise TimeoutError(f"{codec} probe of {host}:{port} timed out") from exc
+        except asyncio.IncompleteReadError as exc:
+            outcome = "invalid"
+            raise ProbeError("connection closed mid-packet") from exc
+        except ConnectionRefusedError:
+            outcome = "refused"
+            raise
+        except ProbeError:
+            outcome = "invalid"
+            raise
+        finally:
+            PROBES.labels(codec, outcome).inc()
+
+    async def _probeLimited(self, host: str, port, codec: str) -> Dict:
+        async with self._slots:
+            return await self.probeAsync(host, port, codec)
+
+    def _ensureLoop(self) -> asyncio.AbstractEventLoop:
+        """The engine's event loop, started in a daemon thread on first use"""
+        if self._loop is not None:
+            return self._loop
+        with self._loopLock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name="probe-engine", daemon=True
+                ).start()
+                self._loop = loop
+        return self._loop
+
+    def probe(self, host: str, port=None, codec: str = "java") -> Dict:
+        """Blocking probeAsync, for callers running in worker threads
+
+        Every caller shares the engine's one long-lived event loop, so probes
+        from many threads run side by side on it, at most concurrency at once.
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self._probeLimited(host, port, codec), self._ensureLoop()
+        )
+        return future.result()
@@ -0,0 +1,163 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Dict, Hashable, Optional, Set, Tuple, Type
+
+MAX_PENDING = 64
+
+
+class Event:
+    """Something that happened to one session, identified by key"""
+
+    __slots__ = ("key", "at")
+
+    def __init__(self, key: Hashable):
+        self.key = key
+        self.at = time.time()
+
+    def __repr__(self):
+        fields = ", ".join(
+            f"{name}={getattr(self, name)!r}"
+            for cls in type(self).__mro__
+            for name in getattr(cls, "__slots__", ())
+            if name != "at"
+        )
+        return f"{type(self).__name__}({fields})"
+
+
+class Kicked(Event):
+    """The server disconnected us, reason is its message"""
+
+    __slots__ = ("reason",)
+
+    def __init__(self, key: Hashable, reason: str = ""):
+        super().__init__(key)
+        self.reason = reason
+
+
+class AuthRequired(Event):
+    """A Microsoft device code has to be entered at url"""
+
+    __slots__ = ("code", "url", "expiresIn")
+
+    def __init__(self, key: Hashable, code: str, url: str, expiresIn: int = 0):
+        super().__init__(key)
+        self.code = code
+        self.url = url
+        self.expiresIn = expiresIn
+
+
+class Joined(Event):
+    """We spawned, info holds what the session collected"""
+
+    __slots__ = ("info",)
+
+    def __init__(self, key: Hashable, info: Optional[dict] = None):
+        super().__init__(key)
+        self.info = info or {}
+
+
+class SessionEnded(Event):
+    """The connection is gone, for whatever reason"""
+
+    __slots__ = ("reason",)
+
+    def __init__(self, key: Hashable, reason: str = ""):
+        super().__init__(key)
+        self.reason = reason
+
+
+class Subscription:
+    """Events of one key, queued until the subscriber asks for them
+
+    Use it as a context manager so it is removed from the bus afterwards.
+    """
+
+    def __init__(self, bus, key: Hashable, types: Tuple[Type[Event], ...]):
+        self.bus = bus
+        self.key = key
+        self.types = types
+        self.pending = deque(maxlen=MAX_PENDING)
+        self.ready = threading.Condition()
+
+    def deliver(self, event: Event) -> None:
+        if self.types and not isinstance(event, self.types):
+            return
+        with self.ready:
+            self.pending.append(event)
+            self.ready.notify_all()
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[Event]:
+        """Blocks until the next event arrives
+
+        Args:
+            timeout (float, optional): Seconds to wait, forever if None. Defaults to None.
+
+        Returns:
+            Event | None: the event, or None if the timeout passed first
+        """
+        with self.ready:
+            if not self.ready.wait_for(lambda: self.pending, timeout):
+                return None
+            return self.pending.popleft()
+
+    async def next(self, timeout: Optional[float] = None) -> Optional[Event]:
+        """wait without blocking the event loop"""
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.wait, timeout
+        )
+
+    def close(self) -> None:
+        self.bus.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class EventBus:
+    """In-process publish/subscribe keyed by session
+
+    Publishing only touches the subscriptions of the event's key, so waiting
+    for an outcome costs the same however much has been logged before it.
+    """
+
+    def __init__(self, logger=None):
+        """Initializes the EventBus class
+
+        Args:
+            logger (Logger, optional): Logs every event at debug level. Defaults to None.
+        """
+        self.logger = logger
+        self.subscriptions: Dict[Hashable, Set[Subscription]] = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, key: Hashable, *types: Type[Event]) -> Subscription:
+        """Subscribes to the events of key, optionally only of some types
+
+        Subscribe before starting the session, events published while nobody
+        listens are dropped.
+        """
+        subscription = Subscription(self, key, types)
+        with self.lock:
+            self.subscriptions.setdefault(key, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self.lock:
+            subscribers = self.subscriptions.get(subscription.key)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscriptions[subscription.key]
+
+    def publish(self, event: Event) -> None:
+        if self.logger is not None:
+            self.logger.debug(f"Event {event!r}")
+        with self.lock:
+            subscribers = tuple(self.subscriptions.get(event.key, ()))
+        for subscription in subscribers:
+            subscription.deliver(event)
@@ -1,8 +1,10 @@
 import base64
-import re
+import hashlib
 import threading
 import time
 import traceback
+from collections import OrderedDict
+import json
 from json import JSONDecodeError
 from typing import Dict, List, Optional
 
@@ -11,6 +13,46 @@ import mcstatus
 import pymongo
 import requests
 
+from metrics import MOJANG_LOOKUPS, MOJANG_SECONDS, MONGO_SECONDS, PROBE_SECONDS
+
+from .engine import ProbeEngine
+from .probe import ProbeError
+from .status import dedupePlayers, parseStatus
+
+# Bumped after ingest writes so API response caches know to invalidate, see
+# api/services/mongo_client.py
+META_COLLECTION = "meta"
+INGEST_MARKER_ID = "ingest"
+INGEST_MARK_INTERVAL = 1.0
+
+# Known servers only get the fields whose fingerprint part changed rewritten
+FINGERPRINT_FIELDS = {
+    "motd": ("lastOnlineDescription",),
+    "favicon": ("favicon",),
+    "version": ("lastOnlineVersion", "lastOnlineVersionProtocol"),
+    "players": ("lastOnlinePlayersList",),
+}
+SCALAR_FIELDS = (
+    "hostname",
+    "port",
+    "lastOnlinePlayers",
+    "lastOnlinePlayersMax",
+    "lastOnlinePing",
+    "cracked",
+    "whitelisted",
+    "truncated",
+    "edition",
+)
+INGEST_CACHE_SIZE = 100000
+BEDROCK_COLLECTION = "bedrock"
+
+MOJANG_PROFILE_URL = "https://api.mojang.com/users/profiles/minecraft/"
+# name -> answer, the same players show up on server after server
+MOJANG_CACHE_SIZE = 50000
+MOJANG_CACHE_TTL = 6 * 3600
+# a name that does not exist is an answer too, anything else is asked again
+MOJANG_CACHEABLE = (200, 204, 404)
+
 
 class ServerType:
     def __init__(self, host: str, protocol: int, joinability: str = "unknown"):
@@ -22,6 +64,29 @@ class ServerType:
         return f"ServerType({self.host}, {self.protocol}, {self.joinability})"
 
 
+def pingOf(status: dict) -> Optional[int]:
+    """The stored ping of a probe result, None when the server never ponged"""
+    if status["latency"] is None:
+        return None
+    return int(status["latency"] * 10)
+
+
+class MojangAnswer:
+    """The status and body of a Mojang API response, all the finder reads of it"""
+
+    __slots__ = ("status_code", "text")
+
+    def __init__(self, status_code: int, text: str):
+        self.status_code = status_code
+        self.text = text
+
+    def __repr__(self):
+        return f"<MojangAnswer [{self.status_code}]>"
+
+    def json(self):
+        return json.loads(self.text)
+
+
 class Finder:
     def __init__(
         self,
@@ -29,6 +94,12 @@ class Finder:
         logger,
         Text,
         Player,
+        Sightings=None,
+        Archive=None,
+        KnownHosts=None,
+        NegativeCache=None,
+        Corpus=None,
+        Engine=None,
     ) -> None:
         """Initializes the Finder class
 
@@ -36,11 +107,23 @@ class Finder:
             col (pymongo.collection.Collection): The database collection
             logger (_type_): The logger class
             Text (_type_): The text class
+            Sightings (_type_, optional): The sightings class, records probe history
+            Archive (_type_, optional): The archive class, restores archived servers
+            KnownHosts (_type_, optional): In-memory set of known hosts, avoids Mongo lookups
+            NegativeCache (_type_, optional): Records open ports that are not Minecraft servers
+            Corpus (_type_, optional): Captures raw status responses for replay benchmarks
+            Engine (_type_, optional): The multi-edition probe engine, one is created if not given
         """
         self.col = col
         self.logger = logger
         self.Text = Text
         self.Player = Player
+        self.Sightings = Sightings
+        self.Archive = Archive
+        self.KnownHosts = KnownHosts
+        self.NegativeCache = NegativeCache
+        self.Corpus = Corpus
+        self.Engine = Engine if Engine is not None else ProbeEngine(logger)
 
         # Hex colors
         self.RED = 0xFF0000  # Error
@@ -50,6 +133,16 @@ class Finder:
         self.BLUE = 0x0000FF  # Info
         self.ORANGE = 0xFFA500  # Debug
 
+        self._lastIngestMark = 0.0
+        self._ingestMarkLock = threading.Lock()
+        # ip -> last written fingerprint and scalar values
+        self._ingestState: "OrderedDict[str, dict]" = OrderedDict()
+        self._ingestLock = threading.Lock()
+        # lower-cased name -> (monotonic time, MojangAnswer)
+        self._mojangCache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._mojangLock = threading.Lock()
+        self._bedrockIndexed = False
+
     def check(
         self,
         host: str,
@@ -99,46 +192,77 @@ class Finder:
 
         # check if the host is online
         try:
-            mcstatus.JavaServer.lookup(host + ":" + str(port)).status()
-        except Exception:
+            status = self._status(host, port)
+        except Exception as exc:
             self.logger.debug("Server is offline") if full else None
+            # a known server that missed one probe is down, not a non-Minecraft port
+            if self.NegativeCache is not None and not self._isKnown(ip, hostname):
+                self.NegativeCache.recordFailure(host, port, exc)
             return None
+        if self.NegativeCache is not None:
+            self.NegativeCache.clear(host, port)
 
-        # check the ip and hostname to make sure they arr vaild as a mc server
-        try:
-            server = mcstatus.JavaServer.lookup(ip + ":" + str(port))
-            status = server.status()
-        except Exception:
-            ip = host
-        try:
-            server = mcstatus.JavaServer.lookup(hostname + ":" + str(port))
-            status = server.status()
-        except Exception:
-            hostname = host
+        # check the ip and hostname to make sure they arr vaild as a mc server,
+        # the host itself was just probed
+        if ip != host:
+            try:
+                self._status(ip, port)
+            except Exception:
+                ip = host
+        if hostname != host:
+            try:
+                self._status(hostname, port)
+            except Exception:
+                hostname = host
 
-        joinability = self.join(host, port, "Pilot1782").joinability
+        with PROBE_SECONDS.labels("join").time():
+            joinability = self.join(host, port, "Pilot1782").joinability
         cracked = bool(joinability == "CRACKED")
 
         try:
-            server = mcstatus.JavaServer.lookup(host + ":" + str(port))
-            status = server.status()
-
-            cpLST = self.Player.crackedPlayerList(
-                host, str(port)) if full else None
+            if status["truncated"]:
+                self.logger.info(
+                    "{}:{} sent oversized status fields: {}".format(
+                        host, port, ", ".join(status["truncated"])
+                    ),
+                    sample=True,
+                )
+            if self.Corpus is not None:
+                # raw has been through the limits, the corpus wants it as sent
+                received = status.get("text")
+                self.Corpus.record(
+                    host,
+                    port,
+                    json.loads(received) if received is not None else status["raw"],
+                    status["latency"],
+                    ip=ip,
+                    hostname=hostname,
+                )
+            parsed = parseStatus(status["raw"], self.Text)
+
+            # Query lists every player without joining, when the server has it on
+            queryPlayers = self._queryPlayers(host, port) if full else None
+            protocol = parsed["lastOnlineVersionProtocol"]
+            cpLST = (
+                self.Player.crackedPlayerList(
+                    host,
+                    str(port),
+                    protocol=int(protocol) if protocol.isdigit() else None,
+                )
+                if full and queryPlayers is None
+                else None
+            )
             cracked = bool(
                 (cpLST is not None and type(cpLST) is not bool) or cracked)
 
             self.logger.debug("Getting players")
             players = []
             try:
-                if status.players.sample is not None:
+                if parsed["sample"] and queryPlayers is None:
                     self.logger.debug("Getting players from sample")
 
-                    for player in list(
-                        status.players.sample
-                    ):  # pyright: ignore [reportOptionalIterable]
-                        url = f"https://api.mojang.com/users/profiles/minecraft/{player.name}"
-                        jsonResp = requests.get(url)
+                    for name in parsed["sample"]:
+                        jsonResp = self._mojang(name)
                         if len(jsonResp.text) > 2:
                             try:
                                 jsonResp = jsonResp.json()
@@ -176,19 +300,20 @@ class Finder:
                                 uuid = jsonResp.json()["id"]
                             players.append(
                                 {
-                                    "name": self.Text.cFilter(player.name).lower(),
+                                    "name": self.Text.cFilter(name).lower(),
                                     "uuid": uuid,
                                 }
                             )
-                elif cracked:
+                elif queryPlayers is not None or cracked:
                     self.logger.debug(
-                        "Getting players from cracked player list")
-                    playerlst = cpLST if cpLST is not None else []
+                        "Getting players from query or cracked player list")
+                    if queryPlayers is not None:
+                        playerlst = queryPlayers
+                    else:
+                        playerlst = cpLST if cpLST is not None else []
 
                     for player in playerlst:
-                        jsonResp = requests.get(
-                            "https://api.mojang.com/users/profiles/minecraft/" + player
-                        )
+                        jsonResp = self._mojang(player)
                         uuid = "---n/a---"
                         if "id" in str(jsonResp.text):
                             uuid = jsonResp.json()["id"]
@@ -207,122 +332,454 @@ class Finder:
                 self.logger.error(traceback.format_exc())
 
             # remove duplicates from player list
-            players = [i for n, i in enumerate(
-                players) if i not in players[n + 1:]]
+            players = dedupePlayers(players)
 
             cracked = bool(joinability == "CRACKED")
 
-            # get the description
-            rawMOTD = status.raw["description"]
-
-            if isinstance(rawMOTD, dict):
-                motd = str(rawMOTD.get("text", ""))
-                extras = rawMOTD.get("extra", [])
-                for extra in extras:
-                    if isinstance(extra, dict):
-                        motd += str(extra.get("text", ""))
-                    else:
-                        motd += str(extra)
-            else:
-                motd = str(rawMOTD)
-            motd = re.sub(r"§.", "", motd)
-
-            favicon = getattr(status, "favicon", None)
-            if favicon is None:
+            if parsed["favicon"] is None:
                 self.logger.debug("Favicon not present in status response")
 
             data = {
                 "host": ip,
                 "hostname": hostname,
+                "port": int(port),
                 "lastOnline": time.time(),
-                "lastOnlinePlayers": status.players.online,
-                "lastOnlineVersion": self.Text.cFilter(
-                    str(re.sub(r"§\S*[|]*\s*", "", status.version.name))
-                ),
-                "lastOnlineDescription": self.Text.cFilter(str(motd)),
-                "lastOnlinePing": int(status.latency * 10),
+                "lastOnlinePlayers": parsed["lastOnlinePlayers"],
+                "lastOnlineVersion": parsed["lastOnlineVersion"],
+                "lastOnlineDescription": parsed["lastOnlineDescription"],
+                "lastOnlinePing": pingOf(status),
                 "lastOnlinePlayersList": players,
-                "lastOnlinePlayersMax": status.players.max,
-                "lastOnlineVersionProtocol": self.Text.cFilter(
-                    str(status.version.protocol)
-                ),
+                "lastOnlinePlayersMax": parsed["lastOnlinePlayersMax"],
+                "lastOnlineVersionProtocol": parsed["lastOnlineVersionProtocol"],
                 "cracked": cracked,
                 "whitelisted": joinability == "WHITELISTED",
-                "favicon": favicon,
+                "favicon": parsed["favicon"],
+                "truncated": status["truncated"],
+                "edition": status["edition"],
             }
 
-            if not self.col.find_one({"host": ip}) and not self.col.find_one(
-                {"hostname": hostname}
-            ):
-                self.logger.print("{} not in database, adding...".format(host))
-                self.col.update_one(
-                    {"host": ip},
-                    {"$set": data},
-                    upsert=True,
+            if self.Sightings is not None:
+                self.Sightings.record(
+                    ip,
+                    data["lastOnline"],
+                    data["lastOnlinePlayers"],
+                    data["lastOnlinePing"],
                 )
+
+            known = self._getIngestState(ip) is not None or self._isKnown(
+                ip, hostname
+            )
+            if not known and self.Archive is not None:
+                # a server seen again after being archived keeps its history
+                known = self.Archive.restore(ip) is not None
+                if known and self.KnownHosts is not None:
+                    self.KnownHosts.add(ip)
+
+            if not known:
+                self.logger.print("{} not in database, adding...".format(host))
+                data["fingerprint"] = self._fingerprint(data)
+                with MONGO_SECONDS.labels(self.col.name, "update_one").time():
+                    self.col.update_one(
+                        {"host": ip},
+                        {"$set": data},
+                        upsert=True,
+                    )
+                self._markIngest()
+                self._setIngestState(ip, data["fingerprint"], data)
+                if self.KnownHosts is not None:
+                    self.KnownHosts.add(ip)
                 # we need an id now
                 data = self.col.find_one({"host": ip})
             else:  # update current values with database values
-                dbVal = self.col.find_one({"host": ip})
-                if dbVal is not None:
-                    data["whitelisted"] = (
-                        (dbVal["whitelisted"] or data["whitelisted"])
-                        if "whitelisted" in dbVal
-                        else data["whitelisted"]
-                    )
-                    data["cracked"] = dbVal["cracked"] or data["cracked"]
-                    data["hostname"] = (
-                        (
-                            data["hostname"]
-                            if not data["hostname"].replace(".", "").isdigit()
-                            else dbVal["hostname"]
-                        )
-                        if "hostname" in dbVal
-                        else data["hostname"]
-                    )
+                data = self._writeChanges(ip, host, data)
+                self._markIngest()
 
-                    for i in dbVal["lastOnlinePlayersList"]:
-                        try:
-                            if i not in data["lastOnlinePlayersList"]:
-                                if type(i) is str:
-                                    url = f"https://api.mojang.com/users/profiles/minecraft/{i}"
-                                    jsonResp = requests.get(url)
-                                    if len(jsonResp.text) > 2:
-                                        jsonResp = jsonResp.json()
-
-                                        if jsonResp is not None:
-                                            data["lastOnlinePlayersList"].append(
-                                                {
-                                                    "name": self.Text.cFilter(
-                                                        jsonResp["name"]
-                                                    ),
-                                                    "uuid": jsonResp["id"],
-                                                }
-                                            )
-                                else:
-                                    data["lastOnlinePlayersList"].append(i)
-                        except Exception:
-                            self.print(
-                                traceback.format_exc(),
-                                " --\\/-- ",
-                                host,
-                            )
-                            self.logger.error(traceback.format_exc())
-                            break
+            return data
+        except TimeoutError as exc:
+            self.logger.debug(f"Timeout Error: {exc}")
+            return None
+        except Exception:
+            self.logger.error(traceback.format_exc())
+            return None
 
+    def checkPort(self, ip: str, port) -> Optional[Dict]:
+        """Probes another open port of an ip whose server is already stored
+
+        Servers are stored one document per ip, its top-level fields describe
+        the first port that answered. Every other answering port is kept as a
+        summary under ports.<port> of the same document.
+
+        Args:
+            ip (str): ip of the server
+            port (int): the open port
+
+        Returns:
+            dict: the stored port summary | None: if nothing answered
+        """
+        if self.col is None:
+            return None
+        try:
+            status = self._status(ip, port)
+        except Exception as exc:
+            # a port that answered before is down, not a non-Minecraft port
+            if self.NegativeCache is not None and not self.col.find_one(
+                {"host": ip, "ports.{}".format(int(port)): {"$exists": True}},
+                {"_id": 1},
+            ):
+                self.NegativeCache.recordFailure(ip, port, exc)
+            return None
+        if self.NegativeCache is not None:
+            self.NegativeCache.clear(ip, port)
+
+        parsed = parseStatus(status["raw"], self.Text)
+        summary = {
+            "lastOnline": time.time(),
+            "lastOnlinePlayers": parsed["lastOnlinePlayers"],
+            "lastOnlinePlayersMax": parsed["lastOnlinePlayersMax"],
+            "lastOnlineVersion": parsed["lastOnlineVersion"],
+            "lastOnlineVersionProtocol": parsed["lastOnlineVersionProtocol"],
+            "lastOnlineDescription": parsed["lastOnlineDescription"],
+            "lastOnlinePing": pingOf(status),
+            "edition": status["edition"],
+        }
+        try:
+            with MONGO_SECONDS.labels(self.col.name, "update_one").time():
                 self.col.update_one(
-                    {"host": ip},
-                    {"$set": data},
-                    upsert=True,
+                    {"host": ip}, {"$set": {"ports.{}".format(int(port)): summary}}
                 )
+        except Exception:
+            self.logger.error(traceback.format_exc())
+            return None
+        self.logger.print(
+            "{}:{} server found next to another on its ip".format(ip, port)
+        )
+        return {"host": ip, "port": int(port), **summary}
 
-            return data
-        except TimeoutError as exc:
-            self.logger.debug(f"Timeout Error: {exc}")
+    def _status(self, host: str, port) -> dict:
+        """Java status of host:port, falling back to the pre-1.7 ping"""
+        try:
+            return self.Engine.probe(host, port, "java")
+        except ProbeError:
+            return self.Engine.probe(host, port, "legacy")
+
+    def _queryPlayers(self, host: str, port) -> Optional[List[str]]:
+        """Every online player's name via Query, None if Query is off"""
+        try:
+            result = self.Engine.probe(host, port, "query")
+        except (OSError, ProbeError):
+            return None
+        sample = result["raw"]["players"].get("sample", [])
+        return [player["name"] for player in sample]
+
+    def checkBedrock(self, host: str, port=19132) -> Optional[Dict]:
+        """Pings a Bedrock server and stores it in the bedrock collection
+
+        Bedrock servers are keyed by host and port, a host can run a Java and
+        a Bedrock server side by side.
+
+        Args:
+            host (String): ip of the server
+            port (int, optional): UDP port of the server. Defaults to 19132.
+
+        Returns:
+            dict: the stored server | None: if nothing answered the ping
+        """
+        if self.col is None:
+            return None
+        try:
+            status = self.Engine.probe(host, port, "bedrock")
+        except Exception as exc:
+            if self.NegativeCache is not None and not self._isKnownBedrock(host, port):
+                self.NegativeCache.recordFailure(host, port, exc, "udp")
             return None
+        if self.NegativeCache is not None:
+            self.NegativeCache.clear(host, port, "udp")
+
+        parsed = parseStatus(status["raw"], self.Text)
+        bedrock = status["raw"].get("bedrock", {})
+        data = {
+            "host": host,
+            "port": int(port),
+            "edition": "bedrock",
+            "lastOnline": time.time(),
+            "lastOnlinePlayers": parsed["lastOnlinePlayers"],
+            "lastOnlinePlayersMax": parsed["lastOnlinePlayersMax"],
+            "lastOnlineVersion": parsed["lastOnlineVersion"],
+            "lastOnlineVersionProtocol": parsed["lastOnlineVersionProtocol"],
+            "lastOnlineDescription": parsed["lastOnlineDescription"],
+            "lastOnlinePing": pingOf(status),
+            "levelName": self.Text.cFilter(bedrock.get("levelName", "")),
+            "gamemode": bedrock.get("gamemode", ""),
+            "truncated": status["truncated"],
+        }
+        try:
+            self._ensureBedrockIndex()
+            with MONGO_SECONDS.labels(BEDROCK_COLLECTION, "update_one").time():
+                self.col.database[BEDROCK_COLLECTION].update_one(
+                    {"host": host, "port": int(port)}, {"$set": data}, upsert=True
+                )
         except Exception:
             self.logger.error(traceback.format_exc())
             return None
+        self.logger.print("{}:{} Bedrock server found".format(host, port))
+        return data
+
+    def _isKnownBedrock(self, host: str, port) -> bool:
+        """Whether the Bedrock server on host:port is already in the database"""
+        try:
+            self._ensureBedrockIndex()
+            return bool(
+                self.col.database[BEDROCK_COLLECTION].find_one(
+                    {"host": host, "port": int(port)}, {"_id": 1}
+                )
+            )
+        except Exception:
+            self.logger.error(traceback.format_exc())
+            return False
+
+    def _ensureBedrockIndex(self) -> None:
+        """Backs the (host, port) upserts of Bedrock servers with an index"""
+        if self._bedrockIndexed:
+            return
+        self.col.database[BEDROCK_COLLECTION].create_index(
+            [("host", pymongo.ASCENDING), ("port", pymongo.ASCENDING)]
+        )
+        self._bedrockIndexed = True
+
+    def _isKnown(self, ip: str, hostname: str) -> bool:
+        """Whether the server is already in the database
+
+        Args:
+            ip (str): the server ip
+            hostname (str): the server hostname
+
+        Returns:
+            bool: True if the server has a document
+        """
+        if self.KnownHosts is not None and self.KnownHosts.ensureLoaded():
+            return self.KnownHosts.contains(ip)
+        return bool(
+            self.col.find_one({"host": ip}, {"_id": 1})
+            or self.col.find_one({"hostname": hostname}, {"_id": 1})
+        )
+
+    def _fingerprint(self, data: dict) -> Dict[str, str]:
+        """Hashes the bulky parts of a probe result so unchanged ones can be skipped"""
+        players = sorted(
+            (str(p.get("name")), str(p.get("uuid")))
+            if isinstance(p, dict)
+            else (str(p), "")
+            for p in data.get("lastOnlinePlayersList") or []
+        )
+        parts = {
+            "motd": data.get("lastOnlineDescription"),
+            "favicon": data.get("favicon"),
+            "version": (
+                data.get("lastOnlineVersion"),
+                data.get("lastOnlineVersionProtocol"),
+            ),
+            "players": players,
+        }
+        return {
+            part: hashlib.blake2b(
+                repr(value).encode("utf-8", "replace"), digest_size=8
+            ).hexdigest()
+            for part, value in parts.items()
+        }
+
+    def _getIngestState(self, ip: str) -> Optional[dict]:
+        with self._ingestLock:
+            state = self._ingestState.get(ip)
+            if state is not None:
+                self._ingestState.move_to_end(ip)
+            return state
+
+    def _setIngestState(self, ip: str, fingerprint: Dict[str, str], data: dict) -> None:
+        state = {
+            "fingerprint": dict(fingerprint),
+            "values": {field: data.get(field) for field in SCALAR_FIELDS},
+        }
+        with self._ingestLock:
+            self._ingestState[ip] = state
+            self._ingestState.move_to_end(ip)
+            while len(self._ingestState) > INGEST_CACHE_SIZE:
+                self._ingestState.popitem(last=False)
+
+    def _dropIngestState(self, ip: str) -> None:
+        with self._ingestLock:
+            self._ingestState.pop(ip, None)
+
+    def _mojang(self, name: str) -> MojangAnswer:
+        """Looks a player name up on the Mojang API, through a TTL/LRU cache
+
+        Only answers (a profile or no such name) are cached, rate limits and
+        errors are asked again next time. The cache keeps the status code and
+        body, not the response with its connection and headers.
+
+        Args:
+            name (str): the player name
+
+        Returns:
+            MojangAnswer: the cached or fresh answer
+        """
+        key = str(name).lower()
+        now = time.monotonic()
+        with self._mojangLock:
+            entry = self._mojangCache.get(key)
+            if entry is not None and now - entry[0] < MOJANG_CACHE_TTL:
+                self._mojangCache.move_to_end(key)
+                MOJANG_LOOKUPS.labels("hit").inc()
+                return entry[1]
+
+        started = time.perf_counter()
+        try:
+            response = requests.get(MOJANG_PROFILE_URL + str(name))
+        except requests.RequestException:
+            MOJANG_LOOKUPS.labels("error").inc()
+            raise
+        MOJANG_SECONDS.observe(time.perf_counter() - started)
+        answer = MojangAnswer(response.status_code, response.text)
+        if answer.status_code not in MOJANG_CACHEABLE:
+            MOJANG_LOOKUPS.labels("error").inc()
+            return answer
+
+        MOJANG_LOOKUPS.labels("miss").inc()
+        with self._mojangLock:
+            self._mojangCache[key] = (now, answer)
+            self._mojangCache.move_to_end(key)
+            while len(self._mojangCache) > MOJANG_CACHE_SIZE:
+                self._mojangCache.popitem(last=False)
+        return answer
+
+    def _mergePlayers(self, data: dict, dbPlayers: list, host: str) -> None:
+        """Appends players we have seen before to the freshly probed list"""
+        for i in dbPlayers:
+            try:
+                if i not in data["lastOnlinePlayersList"]:
+                    if type(i) is str:
+                        jsonResp = self._mojang(i)
+                        if len(jsonResp.text) > 2:
+                            jsonResp = jsonResp.json()
+
+                            if jsonResp is not None:
+                                data["lastOnlinePlayersList"].append(
+                                    {
+                                        "name": self.Text.cFilter(jsonResp["name"]),
+                                        "uuid": jsonResp["id"],
+                                    }
+                                )
+                    else:
+                        data["lastOnlinePlayersList"].append(i)
+            except Exception:
+                self.logger.print(
+                    traceback.format_exc(),
+                    " --\\/-- ",
+                    host,
+                )
+                self.logger.error(traceback.format_exc())
+                break
+
+    def _writeChanges(
+        self, ip: str, host: str, data: dict, retry: bool = True
+    ) -> dict:
+        """Updates a known server, only $set-ing fields that changed since the last probe
+
+        The partial update never upserts, if the document went away since its
+        state was cached the server is looked up again and written whole.
+
+        Args:
+            ip (str): the server ip, the document key
+            host (str): the host as given to check
+            data (dict): the freshly probed server data
+            retry (bool, optional): look the server up again if it went away. Defaults to True.
+
+        Returns:
+            dict: data merged with the stored flags and players
+        """
+        fingerprint = self._fingerprint(data)
+        state = self._getIngestState(ip)
+        dbVal = None
+        if state is None:
+            dbVal = self.col.find_one({"host": ip}, {"favicon": 0})
+            if dbVal is None and self.Archive is not None:
+                # archived since the known hosts set was loaded
+                dbVal = self.Archive.restore(ip)
+            if dbVal is None:
+                # only the hostname is known, store this ip as a new document
+                return self._writeWhole(ip, data, fingerprint)
+            state = {
+                "fingerprint": dbVal.get("fingerprint") or {},
+                "values": {field: dbVal.get(field) for field in SCALAR_FIELDS},
+            }
+
+        old = state["values"]
+        data["whitelisted"] = bool(old.get("whitelisted")) or data["whitelisted"]
+        data["cracked"] = bool(old.get("cracked")) or data["cracked"]
+        if data["hostname"].replace(".", "").isdigit() and old.get("hostname"):
+            data["hostname"] = old["hostname"]
+
+        update = {"lastOnline": data["lastOnline"]}
+        for field in SCALAR_FIELDS:
+            if old.get(field) != data[field]:
+                update[field] = data[field]
+        for part, fields in FINGERPRINT_FIELDS.items():
+            if state["fingerprint"].get(part) == fingerprint[part]:
+                continue
+            if part == "players":
+                if dbVal is None:
+                    dbVal = self.col.find_one(
+                        {"host": ip}, {"lastOnlinePlayersList": 1}
+                    ) or {}
+                self._mergePlayers(
+                    data, dbVal.get("lastOnlinePlayersList") or [], host
+                )
+            for field in fields:
+                update[field] = data[field]
+            update["fingerprint." + part] = fingerprint[part]
+
+        with MONGO_SECONDS.labels(self.col.name, "update_one").time():
+            result = self.col.update_one({"host": ip}, {"$set": update})
+        if not result.matched_count:
+            # archived or removed since the state was read, upserting the
+            # changed fields alone would leave a stub document
+            self._dropIngestState(ip)
+            if retry:
+                return self._writeChanges(ip, host, data, retry=False)
+            return self._writeWhole(ip, data, fingerprint)
+        self._setIngestState(ip, fingerprint, data)
+        self.logger.debug(
+            "Updated {} ({} of {} fields changed)".format(
+                host, len(update) - 1, len(data)
+            )
+        )
+        return data
+
+    def _writeWhole(self, ip: str, data: dict, fingerprint: Dict[str, str]) -> dict:
+        """Upserts every field of a server, for ips without a document"""
+        data["fingerprint"] = fingerprint
+        with MONGO_SECONDS.labels(self.col.name, "update_one").time():
+            self.col.update_one({"host": ip}, {"$set": data}, upsert=True)
+        self._setIngestState(ip, fingerprint, data)
+        if self.KnownHosts is not None:
+            self.KnownHosts.add(ip)
+        return data
+
+    def _markIngest(self) -> None:
+        """Bumps the ingest marker, at most once per INGEST_MARK_INTERVAL"""
+        now = time.time()
+        with self._ingestMarkLock:
+            if now - self._lastIngestMark < INGEST_MARK_INTERVAL:
+                return
+            self._lastIngestMark = now
+        try:
+            with MONGO_SECONDS.labels(META_COLLECTION, "update_one").time():
+                self.col.database[META_COLLECTION].update_one(
+                    {"_id": INGEST_MARKER_ID},
+                    {"$inc": {"generation": 1}, "$set": {"updatedAt": now}},
+                    upsert=True,
+                )
+        except Exception:
+            self.logger.error(traceback.format_exc())
 
     def get_doc_at_index(
         self,
@@ -476,19 +933,7 @@ class Finder:
             info["lastOnlinePlayers"] = status.players.online
 
             rawMotd = status.raw["description"]
-            if "text" in rawMotd and "extra" in rawMotd:
-                motd = rawMotd["text"]
-                for i in rawMotd["extra"]:
-                    if "color" in i:
-                        motd += self.Text.colorMine(i["color"]) + i["text"]
-                    else:
-                        motd += i["text"]
-            elif "text" in rawMotd:
-                motd = rawMotd["text"]
-            else:
-                motd = rawMotd
-
-            motd = self.Text.markFilter(motd)
+            motd = self.Text.markFilter(rawMotd)
 
             self.logger.debug(f"Raw MOTD: {rawMotd}, MOTD: {motd}")
         except:
@@ -520,7 +965,11 @@ class Finder:
                     inline=True,
                 ),
                 interactions.EmbedField(
-                    name="Ping", value=str(info["lastOnlinePing"]), inline=True
+                    name="Ping",
+                    value=str(info["lastOnlinePing"])
+                    if info["lastOnlinePing"] is not None
+                    else "Unknown",
+                    inline=True,
                 ),
                 interactions.EmbedField(
                     name="Cracked", value=f"{info['cracked']}", inline=True
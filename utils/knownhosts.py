@@ -0,0 +1,140 @@
+import heapq
+import socket
+import struct
+import threading
+import time
+import traceback
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Optional
+
+import pymongo
+
+# hosts added since the last load are kept in a set until there are this many,
+# then merged into the packed array
+MERGE_THRESHOLD = 65536
+LOAD_BATCH_SIZE = 50000
+
+
+def ipToInt(ip: str) -> Optional[int]:
+    """Converts a dotted IPv4 string to an int, None if it is not one"""
+    try:
+        return struct.unpack("!I", socket.inet_aton(ip))[0]
+    except (OSError, TypeError):
+        return None
+
+
+class KnownHosts:
+    """In-process set of every IPv4 host in the servers collection
+
+    Hosts are packed into a sorted array('I') (4 bytes each) and found with
+    a binary search, so no lookup needs a Mongo read. Hosts added during a
+    sweep sit in a small set until they are merged in.
+    """
+
+    def __init__(self, col: pymongo.collection.Collection, logger):
+        """Initializes the KnownHosts class
+
+        Args:
+            col (pymongo.collection.Collection): The servers collection
+            logger (Logger): The logger class
+        """
+        self.col = col
+        self.logger = logger
+
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._hosts = array("I")
+        self._recent = set()
+
+    def __len__(self) -> int:
+        return len(self._hosts) + len(self._recent)
+
+    def ensureLoaded(self) -> bool:
+        """Loads the hosts on first use
+
+        Returns:
+            bool: False if loading failed, callers should query Mongo instead
+        """
+        if self._loaded:
+            return True
+        with self._lock:
+            if not self._loaded:
+                try:
+                    self._load()
+                except Exception:
+                    self.logger.error("Failed to load known hosts")
+                    self.logger.error(traceback.format_exc())
+        return self._loaded
+
+    def _load(self) -> None:
+        started = time.time()
+        runs = []
+        run = array("I")
+        cursor = self.col.find({}, {"_id": 0, "host": 1}, batch_size=LOAD_BATCH_SIZE)
+        for doc in cursor:
+            value = ipToInt(doc.get("host"))
+            if value is None:
+                continue
+            run.append(value)
+            if len(run) >= LOAD_BATCH_SIZE * 20:
+                runs.append(array("I", sorted(run)))
+                run = array("I")
+        if run:
+            runs.append(array("I", sorted(run)))
+
+        self._hosts = self._merge(runs)
+        self._recent = set()
+        self._loaded = True
+        self.logger.info(
+            "Loaded {} known hosts ({:.1f} MB) in {:.1f}s".format(
+                len(self._hosts),
+                self._hosts.itemsize * len(self._hosts) / 1e6,
+                time.time() - started,
+            )
+        )
+
+    @staticmethod
+    def _merge(runs: Iterable[array]) -> array:
+        merged = array("I")
+        last = None
+        for value in heapq.merge(*runs):
+            if value != last:
+                merged.append(value)
+                last = value
+        return merged
+
+    def contains(self, ip: str) -> bool:
+        """Whether ip is a known host
+
+        Args:
+            ip (str): the server ip
+
+        Returns:
+            bool: True if the host is in the servers collection
+        """
+        value = ipToInt(ip)
+        if value is None:
+            return False
+        if value in self._recent:
+            return True
+        hosts = self._hosts
+        idx = bisect_left(hosts, value)
+        return idx < len(hosts) and hosts[idx] == value
+
+    def add(self, ip: str) -> None:
+        """Records ip as known, e.g. after inserting or restoring it
+
+        Args:
+            ip (str): the server ip
+        """
+        value = ipToInt(ip)
+        if value is None or not self._loaded:
+            return
+        with self._lock:
+            self._recent.add(value)
+            if len(self._recent) >= MERGE_THRESHOLD:
+                self._hosts = self._merge(
+                    [self._hosts, array("I", sorted(self._recent))]
+                )
+                self._recent = set()
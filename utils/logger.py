@@ -1,63 +1,162 @@
+import atexit
 import logging
+import logging.handlers
+import os
+import queue
 import sys
+import threading
+import time
 import unicodedata
+from typing import Dict
 
 norm = sys.stdout
 
+LOG_FORMAT = "%(asctime)s:%(levelname)s:%(name)s:%(message)s"
+# log.log rolls over to log.log.1 ... log.log.5 at this size
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUPS = 5
+# what read returns of each file by default, the files themselves keep growing
+LOG_READ_BYTES = 1024 * 1024
+# per log statement, debug and per-host records past this are dropped and counted
+SAMPLE_RATE = 20.0
+SAMPLE_BURST = 100
+# clear only rolls a previous run this large over to a backup, smaller ones
+# (e.g. a crash loop under autoRestart) are continued after a start line
+LOG_CLEAR_BYTES = 1024 * 1024
 
-class StreamToLogger(object):
-    """
-    Fake file-like stream object that redirects writes to a logger instance.
-    """
 
-    def __init__(self, logger, level: int = logging.INFO):
-        self.logger = logger
-        self.level = level
-        self.linebuf = ""
+def tail(path: str, maxBytes: int = LOG_READ_BYTES) -> str:
+    """The last maxBytes of a text file, starting at a line boundary"""
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        if maxBytes and size > maxBytes:
+            f.seek(size - maxBytes)
+            f.readline()
+        else:
+            f.seek(0)
+        data = f.read()
+    # out.log is written with a byte order mark
+    return data.decode("utf-8", "replace").lstrip("\ufeff")
 
-    def write(self, buf):
-        for line in buf.rstrip().splitlines():
-            self.logger.log(self.level, line.rstrip())
 
-    def flush(self):
-        pass
+class SamplingFilter(logging.Filter):
+    """Token bucket per log statement for low-level records
 
-    def read(self):
-        text1, text2 = "", ""
-        with open("log.log", "r") as f:
-            text1 = f.read()
+    A statement that logs once per host (same file and line, any message)
+    gets rate records per second after an initial burst. The rest are
+    dropped before they are formatted or queued. The first record let
+    through after a drop says how many were dropped, and suppressed keeps
+    the running totals.
 
-        try:
-            with open("out.log", "r") as f:
-                text2 = f.read()
-        except:
-            self.write("out.log does not exist")
+    Logger picks its sampled statements itself, debug and the info calls
+    marked per host. Records from plain logging loggers are sampled up to
+    level, DEBUG by default.
+    """
 
-        return text1 + "\n" + text2
+    def __init__(
+        self,
+        rate: float = SAMPLE_RATE,
+        burst: int = SAMPLE_BURST,
+        level: int = logging.DEBUG,
+    ):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.level = level
+        self.buckets = {}
+        self.dropped = {}
+        self.suppressed = {}
+        self.lock = threading.Lock()
+
+    def take(self, key: str):
+        """Spends a token of key
+
+        Returns:
+            int | None: records of key dropped since the last one let through,
+            or None if this one has to be dropped too
+        """
+        now = time.monotonic()
+        with self.lock:
+            tokens, last = self.buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens < 1:
+                self.buckets[key] = (tokens, now)
+                self.dropped[key] = self.dropped.get(key, 0) + 1
+                self.suppressed[key] = self.suppressed.get(key, 0) + 1
+                return None
+            self.buckets[key] = (tokens - 1, now)
+            return self.dropped.pop(key, 0)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # Logger already sampled its own records before building them
+        dropped = getattr(record, "sampled", None)
+        if dropped is None:
+            if record.levelno > self.level or not self.rate:
+                return True
+            dropped = self.take(f"{record.pathname}:{record.lineno}")
+            if dropped is None:
+                return False
+        if dropped and isinstance(record.msg, str):
+            record.msg = f"{record.msg} [{dropped} similar suppressed]"
+        return True
 
 
 class Logger:
-    def __init__(self, DEBUG=False, level: int = logging.INFO, allowJoin=False):
+    def __init__(
+        self,
+        DEBUG=False,
+        level: int = logging.INFO,
+        allowJoin=False,
+        path: str = "log.log",
+        maxBytes: int = LOG_MAX_BYTES,
+        backupCount: int = LOG_BACKUPS,
+        sampleRate: float = SAMPLE_RATE,
+        sampleBurst: int = SAMPLE_BURST,
+    ):
         """Initializes the logger class
 
+        Records are put on a queue and written by a listener thread, so the
+        calling thread never waits on the file or the console.
+
         Args:
             DEBUG (bool, optional): Show debugging. Defaults to False.
+            level (int, optional): The logging level. Defaults to 20 (INFO).
+            path (str, optional): The log file. Defaults to "log.log".
+            maxBytes (int, optional): Size at which the log file rolls over. Defaults to 10 MiB.
+            backupCount (int, optional): Rolled over files kept. Defaults to 5.
+            sampleRate (float, optional): Records per second per debug or per-host statement, 0 keeps all. Defaults to 20.
+            sampleBurst (int, optional): Records a statement may log at once. Defaults to 100.
         """
         self.DEBUG = DEBUG
-        self.logger = logging
-
-        logging.basicConfig(
-            level=level,
-            format="%(asctime)s:%(levelname)s:%(name)s:%(message)s",
-            handlers=[
-                logging.FileHandler("log.log", mode="a"),
-                logging.StreamHandler(norm),
-            ],
+        self.path = path
+
+        formatter = logging.Formatter(LOG_FORMAT)
+        self.fileHandler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=maxBytes, backupCount=backupCount, encoding="utf-8"
         )
+        self.fileHandler.setFormatter(formatter)
+        # the console sink writes to the real stdout, sys.stdout is left alone
+        self.consoleHandler = logging.StreamHandler(norm)
+        self.consoleHandler.setFormatter(formatter)
 
-        self.log = logging.getLogger("STDOUT")
-        self.out = StreamToLogger(self.log, level)
-        sys.stdout = self.out
+        self.queue = queue.SimpleQueue()
+        self.sampler = SamplingFilter(sampleRate, sampleBurst)
+        self.queueHandler = logging.handlers.QueueHandler(self.queue)
+        # only merges the arguments, the sinks do the real formatting
+        self.queueHandler.setFormatter(logging.Formatter("%(message)s"))
+        self.queueHandler.addFilter(self.sampler)
+        self.listener = logging.handlers.QueueListener(
+            self.queue,
+            self.fileHandler,
+            self.consoleHandler,
+            respect_handler_level=True,
+        )
+        self.listener.start()
+        self.closed = False
+        atexit.register(self.close)
+
+        logging.basicConfig(level=level, handlers=[self.queueHandler])
+        self.log = logging.getLogger()
 
         # if allowJoin:
         #     # output js console to log.log
@@ -73,64 +172,94 @@ class Logger:
         #         }
         #     })
 
-    def info(self, message):
-        self.logger.info(message)
+    def _log(self, level: int, message, sample: bool = False) -> None:
+        # sampled by call site before the record is built, the hot path
+        # pays for a frame lookup and a token instead of a LogRecord
+        sampled = None
+        if sample and self.sampler.rate:
+            caller = sys._getframe(2)
+            sampled = self.sampler.take(
+                f"{caller.f_code.co_filename}:{caller.f_lineno}"
+            )
+            if sampled is None:
+                return
+        self.log.log(level, message, stacklevel=3, extra={"sampled": sampled})
 
-    def error(self, message):
-        sys.stdout = norm  # output to console
-        print(message)
-        sys.stdout = self.out  # output to log.log
-        self.logger.error(message)
+    def info(self, message, sample: bool = False):
+        """Logs at INFO, sample=True rate-limits a statement that runs per host"""
+        if self.log.isEnabledFor(logging.INFO):
+            self._log(logging.INFO, message, sample)
 
-    def critical(self, message):
-        sys.stdout = norm
-        print(message)
-        sys.stdout = self.out
-        self.logger.critical(message)
+    def error(self, message):
+        self.log.error(message, stacklevel=2)
 
     def debug(self, *args, **kwargs):
-        self.logger.debug(" ".join([str(arg) for arg in args]))
-        if self.DEBUG:
-            self.print(*args, **kwargs)
+        level = logging.INFO if self.DEBUG else logging.DEBUG
+        if self.log.isEnabledFor(level):
+            self._log(level, " ".join([str(arg) for arg in args]), True)
 
     def warning(self, message):
-        self.logger.warning(message)
+        self.log.warning(message, stacklevel=2)
 
     def critical(self, message):
-        self.logger.critical(message)
+        self.log.critical(message, stacklevel=2)
 
     def exception(self, message):
-        self.logger.exception(message)
+        self.log.exception(message, stacklevel=2)
+
+    def suppressed(self) -> Dict[str, int]:
+        """Records dropped by sampling so far, per file:line"""
+        with self.sampler.lock:
+            return dict(self.sampler.suppressed)
 
-    def read(self):
-        text1, text2 = "", ""
-        with open("log.log", "r") as f:
-            text1 = f.read()
+    def read(self, maxBytes: int = LOG_READ_BYTES):
+        """The tail of log.log and out.log, at most maxBytes of each
+
+        Args:
+            maxBytes (int, optional): Bytes read from the end of each file, all if 0. Defaults to 1 MiB.
+        """
+        text1, text2 = tail(self.path, maxBytes), ""
 
         try:
-            with open("out.log", "r") as f:
-                text2 = f.read()[3:]
-                text2 = "".join(
-                    ch
-                    for ch in text2
-                    if unicodedata.category(ch)[0] != "C" or ch in "\t" or ch in "\n"
-                )
-                text2 = text2.replace("\n\n", "\n")
-        except:
+            text2 = tail("out.log", maxBytes)
+            text2 = "".join(
+                ch
+                for ch in text2
+                if unicodedata.category(ch)[0] != "C" or ch in "\t" or ch in "\n"
+            )
+            text2 = text2.replace("\n\n", "\n")
+        except OSError:
             self.error("out.log does not exist")
 
         return text1 + "\n" + text2
 
     def print(self, *args, **kwargs):
-        msg = " ".join([str(arg) for arg in args])
-        sys.stdout = norm  # output to console
-        print(msg, **kwargs)
-        sys.stdout = self.out  # output to log.log
-        self.info(msg)
+        if self.log.isEnabledFor(logging.INFO):
+            self._log(logging.INFO, " ".join([str(arg) for arg in args]))
 
     def clear(self):
-        with open("log.log", "w") as f:
-            f.write("")
+        """Marks a new run in the log file
+
+        A previous run past LOG_CLEAR_BYTES is rolled over to the first backup,
+        a smaller one is kept and continued, so quick restarts do not push
+        the real history out of the backups.
+        """
+        self.fileHandler.acquire()
+        try:
+            stream = self.fileHandler.stream
+            if stream is not None and stream.tell() >= LOG_CLEAR_BYTES:
+                self.fileHandler.doRollover()
+        finally:
+            self.fileHandler.release()
+        self.log.info("---- Started (pid {}) ----".format(os.getpid()), stacklevel=2)
+
+    def close(self):
+        """Writes out queued records and stops the listener thread"""
+        if self.closed:
+            return
+        self.closed = True
+        self.listener.stop()
+        self.fileHandler.close()
 
     def __repr__(self):
         return self.read()
@@ -0,0 +1,297 @@
+import socket
+import threading
+import time
+import traceback
+from array import array
+from bisect import bisect_left
+from typing import List, Tuple
+
+import pymongo
+from pymongo import UpdateOne
+
+from metrics import BUFFERED, MONGO_BATCH, MONGO_SECONDS
+
+from .knownhosts import ipToInt
+
+DEFAULT_BASE_INTERVAL = 6 * 3600
+DEFAULT_MAX_INTERVAL = 30 * 86400
+DEFAULT_TRANSIENT_INTERVAL = 3600
+# failures that say more about the path to the host than about the port
+TRANSIENT_CLASSES = ("timeout", "reset")
+LOAD_BATCH_SIZE = 50000
+
+
+def endpointKey(ip: str, port, proto: str = "tcp") -> int:
+    """Packs an IPv4 address, transport and port into one int, -1 if ip is not IPv4"""
+    value = ipToInt(ip)
+    if value is None:
+        return -1
+    udp = 1 if proto == "udp" else 0
+    return (value << 17) | (udp << 16) | (int(port) & 0xFFFF)
+
+
+def endpointId(ip: str, port, proto: str = "tcp") -> str:
+    """The document id of an endpoint, e.g. 1.2.3.4:25565 or 1.2.3.4:19132/udp"""
+    suffix = "/udp" if proto == "udp" else ""
+    return f"{ip}:{int(port)}{suffix}"
+
+
+def parseEndpointId(endpoint: str) -> int:
+    """endpointKey of a document id, -1 if it cannot be parsed"""
+    endpoint, _, proto = str(endpoint).partition("/")
+    ip, _, port = endpoint.rpartition(":")
+    if not port.isdigit():
+        return -1
+    return endpointKey(ip, port, proto or "tcp")
+
+
+def classifyFailure(exc: BaseException) -> str:
+    """Buckets a failed status probe by why it failed
+
+    Args:
+        exc (BaseException): the exception raised by the probe
+
+    Returns:
+        str: timeout, refused, reset, network or protocol
+    """
+    if isinstance(exc, (socket.timeout, TimeoutError)):
+        return "timeout"
+    if isinstance(exc, ConnectionRefusedError):
+        return "refused"
+    if isinstance(exc, (ConnectionResetError, ConnectionAbortedError, BrokenPipeError)):
+        return "reset"
+    if isinstance(exc, OSError):
+        return "network"
+    # connected, but the reply was not a Minecraft status response
+    return "protocol"
+
+
+def _contains(keys: array, key: int) -> bool:
+    """Whether the sorted array holds key"""
+    idx = bisect_left(keys, key)
+    return idx < len(keys) and keys[idx] == key
+
+
+class NegativeCache:
+    """Remembers open ports that failed the status probe so sweeps skip them
+
+    Each failing (ip, port, transport) has a document in the probe_failures
+    collection, UDP ids ending in "/udp":
+        {
+            "_id": "1.2.3.4:25565",
+            "failureClass": "timeout",
+            "count": int,            # consecutive failures
+            "lastFailure": ts,
+            "nextCheck": ts,         # base * 2 ** (count - 1), capped
+        }
+
+    Refused, network and protocol failures back off from baseInterval up to
+    maxInterval. Timeouts and resets are as often the network as the port, so
+    they back off from transientInterval and never past baseInterval. The
+    finder does not record failures of hosts already in the database.
+
+    At scan start every endpoint whose nextCheck is still ahead is packed into
+    a sorted array('Q') of ip << 17 | udp << 16 | port (8 bytes each), which
+    the probe stage bisects before spending a status timeout on it. A failed
+    Bedrock ping never hides the TCP port with the same number.
+    """
+
+    def __init__(
+        self,
+        col: pymongo.collection.Collection,
+        logger,
+        baseInterval: float = DEFAULT_BASE_INTERVAL,
+        maxInterval: float = DEFAULT_MAX_INTERVAL,
+        transientInterval: float = DEFAULT_TRANSIENT_INTERVAL,
+        flushSize: int = 500,
+    ):
+        """Initializes the NegativeCache class
+
+        Args:
+            col (pymongo.collection.Collection): The probe_failures collection
+            logger (Logger): The logger class
+            baseInterval (float, optional): Seconds before the first re-check. Defaults to 6 hours.
+            maxInterval (float, optional): Longest re-check interval. Defaults to 30 days.
+            transientInterval (float, optional): First re-check after a timeout or reset. Defaults to 1 hour.
+            flushSize (int, optional): Buffered failures that trigger a flush. Defaults to 500.
+        """
+        self.col = col
+        self.logger = logger
+        self.baseInterval = baseInterval
+        self.maxInterval = maxInterval
+        self.transientInterval = transientInterval
+        self.flushSize = flushSize
+
+        self._lock = threading.Lock()
+        self._keys = array("Q")
+        # endpoints that failed since the last load, mapped to when their
+        # in-memory skip runs out, and endpoints that answered since then
+        self._failed = {}
+        self._cleared = set()
+        self._buffer: List[Tuple[str, str, float]] = []
+        self.stats = {"skipped": 0, "failures": 0, "cleared": 0}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def load(self, now: float = None) -> None:
+        """Packs every endpoint that is not due for a re-check yet
+
+        Scans running side by side share the cache, so failures and clears
+        held in memory survive a reload until the stored documents agree.
+        """
+        started = time.time()
+        now = now or started
+        try:
+            self.col.create_index("nextCheck")
+            cursor = self.col.find(
+                {"nextCheck": {"$gt": now}}, {"_id": 1}, batch_size=LOAD_BATCH_SIZE
+            )
+            keys = []
+            for doc in cursor:
+                key = parseEndpointId(doc["_id"])
+                if key >= 0:
+                    keys.append(key)
+            keys.sort()
+        except Exception:
+            self.logger.error(traceback.format_exc())
+            return
+        keys = array("Q", keys)
+        with self._lock:
+            self._keys = keys
+            self._failed = {
+                key: until
+                for key, until in self._failed.items()
+                if until > now and not _contains(keys, key)
+            }
+            self._cleared = {key for key in self._cleared if _contains(keys, key)}
+        self.logger.info(
+            "Loaded {} known non-Minecraft endpoints in {:.1f}s".format(
+                len(keys), time.time() - started
+            )
+        )
+
+    def shouldSkip(self, ip: str, port, proto: str = "tcp") -> bool:
+        """Whether (ip, port) failed recently and is not due for a re-check
+
+        Args:
+            ip (str): the host ip
+            port (int): the open port
+            proto (str, optional): tcp or udp. Defaults to "tcp".
+
+        Returns:
+            bool: True if the probe should be skipped
+        """
+        key = endpointKey(ip, port, proto)
+        if key < 0 or key in self._cleared:
+            return False
+        skip = self._failed.get(key, 0) > time.time() or _contains(self._keys, key)
+        if skip:
+            with self._lock:
+                self.stats["skipped"] += 1
+        return skip
+
+    def recordFailure(
+        self, ip: str, port, exc: BaseException, proto: str = "tcp"
+    ) -> None:
+        """Buffers a failed probe, backing its next check off exponentially
+
+        Args:
+            ip (str): the host ip
+            port (int): the probed port
+            exc (BaseException): the exception raised by the probe
+            proto (str, optional): tcp or udp. Defaults to "tcp".
+        """
+        key = endpointKey(ip, port, proto)
+        if key < 0:
+            return
+        failureClass = classifyFailure(exc)
+        now = time.time()
+        with self._lock:
+            self._failed[key] = now + self.backoff(failureClass)[0]
+            self._cleared.discard(key)
+            self._buffer.append((endpointId(ip, port, proto), failureClass, now))
+            self.stats["failures"] += 1
+            BUFFERED.labels("negcache").set(len(self._buffer))
+            due = len(self._buffer) >= self.flushSize
+        if due:
+            self.flush()
+
+    def clear(self, ip: str, port, proto: str = "tcp") -> None:
+        """Forgets an endpoint that answered the status probe
+
+        Args:
+            ip (str): the host ip
+            port (int): the probed port
+            proto (str, optional): tcp or udp. Defaults to "tcp".
+        """
+        key = endpointKey(ip, port, proto)
+        if key < 0:
+            return
+        if not _contains(self._keys, key) and key not in self._failed:
+            return
+        with self._lock:
+            self._failed.pop(key, None)
+            self._cleared.add(key)
+            self.stats["cleared"] += 1
+        try:
+            self.col.delete_one({"_id": endpointId(ip, port, proto)})
+        except Exception:
+            self.logger.error(traceback.format_exc())
+
+    def flush(self) -> int:
+        """Writes buffered failures with a single unordered bulk write
+
+        Returns:
+            int: number of failures written
+        """
+        with self._lock:
+            buffer, self._buffer = self._buffer, []
+            BUFFERED.labels("negcache").set(0)
+        if not buffer:
+            return 0
+        requests = [
+            self._failureUpdate(endpoint, failureClass, timestamp)
+            for endpoint, failureClass, timestamp in buffer
+        ]
+        try:
+            MONGO_BATCH.labels("negcache").observe(len(requests))
+            with MONGO_SECONDS.labels("negcache", "bulk_write").time():
+                self.col.bulk_write(requests, ordered=False)
+        except Exception:
+            self.logger.error("Failed to write {} probe failures".format(len(buffer)))
+            self.logger.error(traceback.format_exc())
+            return 0
+        return len(buffer)
+
+    def backoff(self, failureClass: str) -> Tuple[float, float]:
+        """The (first, longest) re-check interval of a failure class"""
+        if failureClass in TRANSIENT_CLASSES:
+            return self.transientInterval, self.baseInterval
+        return self.baseInterval, self.maxInterval
+
+    def _failureUpdate(
+        self, endpoint: str, failureClass: str, timestamp: float
+    ) -> UpdateOne:
+        """Upsert of one failure, a pipeline so the backoff uses the stored count"""
+        base, cap = self.backoff(failureClass)
+        backoff = {
+            "$min": [
+                cap,
+                {"$multiply": [base, {"$pow": [2, {"$subtract": ["$count", 1]}]}]},
+            ]
+        }
+        return UpdateOne(
+            {"_id": endpoint},
+            [
+                {
+                    "$set": {
+                        "failureClass": failureClass,
+                        "lastFailure": timestamp,
+                        "count": {"$add": [{"$ifNull": ["$count", 0]}, 1]},
+                    }
+                },
+                {"$set": {"nextCheck": {"$add": [timestamp, backoff]}}},
+            ],
+            upsert=True,
+        )
@@ -1,3 +1,4 @@
+import threading
 import time
 import traceback
 from typing import Dict, List, Optional, Union
@@ -7,21 +8,29 @@ import mcstatus
 import pymongo
 import requests
 
+from .tablist import DEFAULT_USERNAME, KICKED, OK, ONLINE_MODE, TabListService
+
 
 class Players:
     """Class to hold all the player related functions"""
 
-    def __init__(self, logger, col: pymongo.collection.Collection, text, server=None):
+    def __init__(
+        self, logger, col: pymongo.collection.Collection, text, server=None, events=None
+    ):
         """Initializes the Players class
 
         Args:
             logger (Logger): The logger class
             col (pymongo.collection.Collection): The database collection
+            events (EventBus, optional): Bus tab list sessions publish their outcome to
         """
         self.logger = logger
+        self.events = events
         self.server = server
         self.col = col
         self.text = text
+        self._tabLists = {}
+        self._tabListLock = threading.Lock()
 
     def crackCheckAPI(self, host: str, port: str = "25565") -> bool:
         """Checks if a server is cracked using the mcstatus.io API
@@ -44,7 +53,11 @@ class Players:
             return False
 
     def crackedPlayerList(
-        self, host: str, port: str = "25565", username: str = "pilot1782"
+        self,
+        host: str,
+        port: str = "25565",
+        username: str = DEFAULT_USERNAME,
+        protocol: Optional[int] = None,
     ) -> Optional[List[str]]:
         """Gets a list of players on a server
 
@@ -52,51 +65,44 @@ class Players:
             host (str): the host of the server
             port (str, optional): the port of the server. Defaults to "25565".
             username (str, optional): Username to join with. Defaults to "pilot1782".
+            protocol (int, optional): protocol version from the status. Defaults to None.
 
         Returns:
-            list[str] | False: A list of players on the server, or False if the server is not cracked
+            list[str] | None: A list of players on the server, or None if the server is not cracked
         """
-        self.logger.info("Getting player list for ip: " + host + ":" + port)
-
-        import chat as chat2
+        self.logger.info(
+            "Getting player list for ip: " + host + ":" + str(port), sample=True
+        )
 
-        args = [host, "--port", port, "--offline-name", username]
-        tStart = time.time()
-        try:
-            chat2.main(args)
-        except Exception as exc:
-            self.logger.error(
-                "Error getting cracked player list for {}:{}: {}".format(
-                    host, port, exc
-                )
+        result = self.tabList(username).fetch(host, port, protocol)
+        if result["outcome"] == OK:
+            return result["players"]
+        if result["outcome"] == KICKED:
+            # joinable without an account, but whitelisted or full
+            self.logger.info(
+                f"Kicked from {host}:{port}: {result['reason']}", sample=True
             )
-            self.logger.error(traceback.format_exc())
-            return [] if self.crackCheckAPI(host, port) else None
-
-        while True:
-            if time.time() - tStart > 5:
-                break
-            if len(chat2.playerArr) > 0:
-                chat2.playerArr.remove(username.lower())
-                return chat2.playerArr
-            time.sleep(0.2)
-
-        out = [] if self.crackCheckAPI(host, port) else None
-
-        lines = self.logger.read().split("\n")
-        lines = lines[::-1]
-        flag = False
-        for line in lines:
-            if "kick" in line.lower():
-                flag = not flag
-            if "Getting player list for ip: " + host in line and flag:
-                return []
-
-            if "PlayerListProtocol{" + host in line:
-                self.logger.info(host + " is an online mode server")
-                return None
+            return []
+        if result["outcome"] == ONLINE_MODE:
+            self.logger.info(host + " is an online mode server", sample=True)
+            return None
 
-        return out
+        self.logger.info(
+            "No player list for {}:{} ({}: {})".format(
+                host, port, result["outcome"], result["reason"]
+            ),
+            sample=True,
+        )
+        return [] if self.crackCheckAPI(host, port) else None
+
+    def tabList(self, username: str = DEFAULT_USERNAME) -> TabListService:
+        """The tab list service joining as username, started on first use"""
+        with self._tabListLock:
+            if username not in self._tabLists:
+                self._tabLists[username] = TabListService(
+                    self.logger, username=username, events=self.events
+                )
+            return self._tabLists[username]
 
     def playerHead(self, name: str) -> Optional[interactions.File]:
         """Downloads a player head from minotar.net
@@ -217,7 +223,7 @@ class Players:
         # update the database
         self.col.update_one(
             {"host": host},
-            {"$set": {"lastOnlinePlayersList": players}},
+            {"$set": {"lastOnlinePlayersList": players, "updatedAt": time.time()}},
             upsert=True,
         )
         self.logger.info(
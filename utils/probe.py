@@ -0,0 +1,292 @@
+import json
+import re
+import socket
+import struct
+import time
+from typing import Dict, List, Tuple
+
+from .text import renderComponent
+
+# the whole status packet, buffered before any field limit applies; modded
+# servers with large mod lists stay below
+MAX_PACKET_BYTES = 256 * 1024
+MAX_JSON_DEPTH = 32
+# a 64x64 PNG favicon is a few KB of base64, anything past this is abuse
+MAX_FAVICON_BYTES = 64 * 1024
+MAX_SAMPLE_PLAYERS = 32
+MAX_NAME_CHARS = 64
+MAX_DESCRIPTION_BYTES = 16 * 1024
+MAX_VERSION_CHARS = 256
+# other top-level fields (forgeData, modinfo, ...) larger than this are dropped
+MAX_FIELD_BYTES = 64 * 1024
+DEFAULT_TIMEOUT = 3.0
+
+JSON_STRING = re.compile(r'"(?:[^"\\]|\\.)*"', re.DOTALL)
+JSON_BRACKETS = re.compile(r"[\[\]{}]")
+
+
+class ProbeError(Exception):
+    """The peer answered, but not with an acceptable status response"""
+
+
+def varint(value: int) -> bytes:
+    """Encodes value as a protocol VarInt"""
+    out = bytearray()
+    value &= 0xFFFFFFFF
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def statusRequest(host: str, port: int, protocol: int = -1) -> bytes:
+    """Handshake with next state 1 followed by an empty status request"""
+    address = host.encode()
+    handshake = (
+        varint(0)
+        + varint(protocol)
+        + varint(len(address))
+        + address
+        + struct.pack(">H", int(port))
+        + varint(1)
+    )
+    return varint(len(handshake)) + handshake + b"\x01\x00"
+
+
+def readVarint(data, offset: int = 0) -> Tuple[int, int]:
+    """Decodes a VarInt from a buffer
+
+    Returns:
+        Tuple[int, int]: the value and the offset after it
+    """
+    value = 0
+    for shift in range(0, 35, 7):
+        if offset >= len(data):
+            raise ProbeError("truncated varint")
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            if value & 0x80000000:
+                value -= 1 << 32
+            return value, offset
+    raise ProbeError("varint longer than 5 bytes")
+
+
+def jsonDepth(text: str) -> int:
+    """Deepest nesting of objects and arrays in a JSON document"""
+    depth = deepest = 0
+    for bracket in JSON_BRACKETS.findall(JSON_STRING.sub("", text)):
+        if bracket in "[{":
+            depth += 1
+            deepest = max(deepest, depth)
+        else:
+            depth -= 1
+    return deepest
+
+
+class Probe:
+    """Server List Ping with hard limits on what a server can make us hold
+
+    The response is read frame by frame against a deadline, the packet length
+    is checked before anything is buffered, and the JSON is only parsed once
+    its nesting depth is known to be sane. Oversized fields are then dropped
+    or cut down and named in the result's truncated list, so a handful of
+    hostile servers cannot inflate server documents.
+
+    The field limits only apply once the whole packet is read, so a probe can
+    briefly hold up to maxPacketBytes plus the parsed JSON. The packet cap is
+    what bounds scanner memory, and 256 KiB still fits a big forgeData mod
+    list.
+    """
+
+    def __init__(
+        self,
+        logger,
+        timeout: float = DEFAULT_TIMEOUT,
+        maxPacketBytes: int = MAX_PACKET_BYTES,
+        maxDepth: int = MAX_JSON_DEPTH,
+        maxSample: int = MAX_SAMPLE_PLAYERS,
+    ):
+        """Initializes the Probe class
+
+        Args:
+            logger (Logger): The logger class
+            timeout (float, optional): Seconds for the whole exchange. Defaults to 3.0.
+            maxPacketBytes (int, optional): Largest status packet accepted. Defaults to 256 KiB.
+            maxDepth (int, optional): Deepest JSON nesting accepted. Defaults to 32.
+            maxSample (int, optional): Players kept from the sample. Defaults to 32.
+        """
+        self.logger = logger
+        self.timeout = timeout
+        self.maxPacketBytes = maxPacketBytes
+        self.maxDepth = maxDepth
+        self.maxSample = maxSample
+
+    def _recv(self, sock: socket.socket, size: int, deadline: float) -> bytes:
+        buffer = bytearray()
+        while len(buffer) < size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise socket.timeout("status response too slow")
+            sock.settimeout(remaining)
+            chunk = sock.recv(min(size - len(buffer), 65536))
+            if not chunk:
+                raise ProbeError("connection closed mid-packet")
+            buffer += chunk
+        return bytes(buffer)
+
+    def _recvVarint(self, sock: socket.socket, deadline: float) -> int:
+        data = bytearray()
+        while True:
+            data += self._recv(sock, 1, deadline)
+            if not data[-1] & 0x80:
+                return readVarint(data)[0]
+            if len(data) >= 5:
+                raise ProbeError("varint longer than 5 bytes")
+
+    def _readPacket(self, sock: socket.socket, deadline: float) -> bytes:
+        length = self._recvVarint(sock, deadline)
+        if length <= 0 or length > self.maxPacketBytes:
+            raise ProbeError(f"packet length {length} out of bounds")
+        return self._recv(sock, length, deadline)
+
+    def status(self, host: str, port=25565) -> Dict:
+        """Requests the status of host:port
+
+        Args:
+            host (str): the server address
+            port (int, optional): the server port. Defaults to 25565.
+
+        Returns:
+            dict: {
+                        "raw": dict,           # status JSON after the limits
+                        "latency": float,      # ping round trip in ms, None without a pong
+                        "truncated": [str],    # fields dropped or cut down
+                        "text": str,           # status JSON as received
+                  }
+
+        Raises:
+            OSError: the connection failed or timed out
+            ProbeError: the response broke the protocol or a hard limit
+        """
+        deadline = time.monotonic() + self.timeout
+        with socket.create_connection((host, int(port)), timeout=self.timeout) as sock:
+            sock.sendall(statusRequest(host, port))
+            packet = self._readPacket(sock, deadline)
+            packetId, offset = readVarint(packet)
+            if packetId != 0:
+                raise ProbeError(f"unexpected packet id {packetId}")
+            length, offset = readVarint(packet, offset)
+            if length < 0 or offset + length > len(packet):
+                raise ProbeError("status string longer than its packet")
+            text = packet[offset : offset + length].decode("utf-8", "replace")
+            del packet
+
+            latency = None
+            try:
+                payload = struct.pack(">q", int(time.time() * 1000))
+                started = time.perf_counter()
+                sock.sendall(varint(9) + b"\x01" + payload)
+                pong = self._readPacket(sock, deadline)
+                if pong[1:] == payload:
+                    latency = (time.perf_counter() - started) * 1000
+            except (OSError, ProbeError):
+                pass
+
+        raw, truncated = self.parse(text)
+        return {"raw": raw, "latency": latency, "truncated": truncated, "text": text}
+
+    def parse(self, text: str) -> Tuple[Dict, List[str]]:
+        """Decodes a status JSON string and applies the per-field limits
+
+        Returns:
+            Tuple[dict, List[str]]: the bounded status and the truncated fields
+        """
+        if self.maxDepth and jsonDepth(text) > self.maxDepth:
+            raise ProbeError("status JSON nested too deeply")
+        try:
+            raw = json.loads(text)
+        except ValueError as exc:
+            raise ProbeError(f"status is not JSON: {exc}") from exc
+        if not isinstance(raw, dict):
+            raise ProbeError("status JSON is not an object")
+        return raw, self.limit(raw)
+
+    def limit(self, raw: dict) -> List[str]:
+        """Drops or cuts down oversized fields of a status in place
+
+        Returns:
+            List[str]: names of the fields that were changed
+        """
+        truncated = []
+
+        favicon = raw.get("favicon")
+        if favicon is not None and (
+            not isinstance(favicon, str) or len(favicon) > MAX_FAVICON_BYTES
+        ):
+            del raw["favicon"]
+            truncated.append("favicon")
+
+        players = raw.get("players")
+        if isinstance(players, dict):
+            sample = players.get("sample")
+            if sample is not None:
+                if not isinstance(sample, list):
+                    sample = []
+                    truncated.append("sample")
+                elif len(sample) > self.maxSample:
+                    sample = sample[: self.maxSample]
+                    truncated.append("sample")
+                bounded = []
+                for player in sample:
+                    if not isinstance(player, dict):
+                        continue
+                    name = str(player.get("name", ""))
+                    if len(name) > MAX_NAME_CHARS and "sample" not in truncated:
+                        truncated.append("sample")
+                    bounded.append(
+                        {
+                            "name": name[:MAX_NAME_CHARS],
+                            "id": str(player.get("id", ""))[:36],
+                        }
+                    )
+                players["sample"] = bounded
+        elif players is not None:
+            raw["players"] = {}
+            truncated.append("players")
+
+        version = raw.get("version")
+        if isinstance(version, dict):
+            name = version.get("name")
+            if isinstance(name, str) and len(name) > MAX_VERSION_CHARS:
+                version["name"] = name[:MAX_VERSION_CHARS]
+                truncated.append("version")
+
+        description = raw.get("description")
+        if description is not None and not isinstance(description, str):
+            if len(json.dumps(description)) > MAX_DESCRIPTION_BYTES:
+                # keep what a client would show, without the component tree
+                description = renderComponent(description)[0]
+                truncated.append("description")
+        if isinstance(description, str) and len(description) > MAX_DESCRIPTION_BYTES:
+            description = description[:MAX_DESCRIPTION_BYTES]
+            if "description" not in truncated:
+                truncated.append("description")
+        if description is not None:
+            raw["description"] = description
+
+        for key in list(raw):
+            if key in ("favicon", "players", "version", "description"):
+                continue
+            value = raw[key]
+            if isinstance(value, (dict, list, str)) and (
+                len(json.dumps(value)) > MAX_FIELD_BYTES
+            ):
+                del raw[key]
+                truncated.append(key)
+        return truncated
@@ -1,37 +1,71 @@
 import os
-import time
 
 from javascript import On, require
 
+from .events import AuthRequired, EventBus, Joined, Kicked, SessionEnded, Subscription
+
+# seconds to wait for the join to end one way or another
+JOIN_TIMEOUT = 60
+# Microsoft device codes expire after 15 minutes, we give up sooner
+AUTH_TIMEOUT = 180
+
 
 class Server:
     """Class to allow for joining a server"""
 
-    def __init__(self, logger):
+    def __init__(self, logger, events: EventBus = None):
+        """Initializes the Server class
+
+        Args:
+            logger (Logger): The logger class
+            events (EventBus, optional): Bus the join outcome is published to. Defaults to a private bus.
+        """
         self.ip = None
         self.port = 25565
         self.mineflayer = require("mineflayer")
         self.pathfinder = require("mineflayer-pathfinder")
         self.username = None
         self.logger = logger
+        self.events = events if events is not None else EventBus(logger)
         self.STATE = "NOT_CONNECTED"
 
         # clear nmp cache
         self.clearNMPCache()
 
-    def start(self, ip, port, username):
-        """Join the server"""
+    def start(self, ip, port, username) -> Subscription:
+        """Join the server
+
+        Returns:
+            Subscription: AuthRequired, Joined, Kicked and SessionEnded events of this join
+        """
         # clear nmp cache
         self.clearNMPCache()
 
         self.ip = ip
         self.port = port
         self.username = username
+        key = (ip, int(port), username)
 
         # server info
         self.names = []
         self.position = None
         self.heldItem = "nothing"
+        self.STATE = "CONNECTING"
+
+        # subscribe before the bot exists, so no event is missed
+        subscription = self.events.subscribe(key)
+
+        def onMsaCode(data, *args):
+            self.STATE = "AUTHENTICATING:" + str(data.user_code)
+            self.logger.print("Authenticating...")
+            self.events.publish(
+                AuthRequired(
+                    key,
+                    str(data.user_code),
+                    str(data.verification_uri),
+                    int(data.expires_in or 0),
+                )
+            )
 
         # create the bot
         self.bot = self.mineflayer.createBot(
@@ -40,31 +74,10 @@ class Server:
                 "port": self.port,
                 "username": self.username,
                 "auth": "microsoft",
+                "onMsaCode": onMsaCode,
             }
         )
 
-        time.sleep(2)
-
-        # check if the bot is connected an account
-        log = self.logger.read()
-        if "To sign in, use a web browser to open the page" in log:
-            self.logger.print("Authenticating...")
-
-            # find that last instance of the string
-            lines = log.splitlines()
-            for line in lines[::-1]:
-                if "To sign in, use a web browser to open the page" in line:
-                    # get the code
-                    line = line.split(
-                        "To sign in, use a web browser to open the page https://www.microsoft.com/link and enter the code "
-                    )[1]
-                    line = line.split(" to authenticate.")[0]
-                    self.STATE = "AUTHENTICATING:" + line
-                    break
-        else:
-            self.STATE = "CONNECTING"
-            self.logger.print("Authenticated!")
-
         @On(self.bot, "spawn")
         def handle(*args):
             self.STATE = "CONNECTED"
@@ -88,6 +101,7 @@ class Server:
                 self.inventory.append(item)
 
             self.clearNMPCache()
+            self.events.publish(Joined(key, self.getInfo()))
 
             # disconnect the bot
             self.bot.quit()
@@ -95,23 +109,31 @@ class Server:
         @On(self.bot, "end")
         def handle(*args):
             self.logger.info("Bot ended!")
-            self.STATE = "DISCONNECTED:WHITELISTED"
+            if self.STATE != "CONNECTED":
+                self.STATE = "DISCONNECTED:WHITELISTED"
+            self.events.publish(
+                SessionEnded(key, str(args[1]) if len(args) > 1 else "end")
+            )
 
         @On(self.bot, "error")
         def handle(*args):
-            text = args if len(args) < 100 else args[:100]
             self.logger.error("Bot errored!{} ".format(args))
             self.STATE = "ERROR"
+            self.events.publish(SessionEnded(key, "error: {}".format(args[1:])))
 
         @On(self.bot, "disconnected")
         def handle(*args):
             self.logger.error("Bot disconnected! {}".format(args))
             self.STATE = "DISCONNECTED:ERROR"
+            self.events.publish(SessionEnded(key, "error: disconnected"))
 
         @On(self.bot, "kicked")
         def handle(*args):
             self.logger.error("Bot kicked! {}".format(args))
             self.STATE = "DISCONNECTED:KICKED"
+            self.events.publish(Kicked(key, str(args[1]) if len(args) > 1 else ""))
+
+        return subscription
 
     def getPlayers(self):
         return self.names
@@ -0,0 +1,190 @@
+import threading
+import time
+import traceback
+from typing import Dict, List, Optional, Tuple
+
+import pymongo
+from pymongo import UpdateOne
+
+from metrics import BUFFERED, MONGO_BATCH, MONGO_SECONDS
+
+SECONDS_PER_DAY = 86400
+
+
+class Sightings:
+    """Bucketed time-series of probe results, one document per host per day
+
+    Each bucket looks like:
+        {
+            "_id": "1.2.3.4:19650",
+            "host": "1.2.3.4",
+            "day": 19650,            # days since the unix epoch
+            "samples": [[ts, players, ping], ...],
+            "count": int,
+            "first": ts,
+            "last": ts,
+            "downsampled": bool,
+        }
+    """
+
+    def __init__(
+        self,
+        col: pymongo.collection.Collection,
+        logger,
+        flushSize: int = 500,
+        flushInterval: float = 5.0,
+    ):
+        """Initializes the Sightings class
+
+        Args:
+            col (pymongo.collection.Collection): The sightings collection
+            logger (Logger): The logger class
+            flushSize (int, optional): Buffered samples that trigger a flush. Defaults to 500.
+            flushInterval (float, optional): Max seconds between flushes. Defaults to 5.0.
+        """
+        self.col = col
+        self.logger = logger
+        self.flushSize = flushSize
+        self.flushInterval = flushInterval
+
+        self._lock = threading.Lock()
+        self._buffer: List[Tuple[str, float, int, int]] = []
+        self._lastFlush = time.time()
+        self._indexed = False
+
+    def ensureIndexes(self) -> None:
+        if self._indexed:
+            return
+        self.col.create_index([("host", pymongo.ASCENDING), ("day", pymongo.ASCENDING)])
+        self.col.create_index(
+            [("day", pymongo.ASCENDING), ("downsampled", pymongo.ASCENDING)]
+        )
+        self._indexed = True
+
+    def record(self, host: str, timestamp: float, players, ping) -> None:
+        """Buffers one sample, flushing in bulk once the buffer is large or old"""
+        sample = (
+            str(host),
+            float(timestamp),
+            int(players) if isinstance(players, int) else -1,
+            int(ping) if isinstance(ping, int) else -1,
+        )
+        with self._lock:
+            self._buffer.append(sample)
+            BUFFERED.labels("sightings").set(len(self._buffer))
+            due = (
+                len(self._buffer) >= self.flushSize
+                or time.time() - self._lastFlush >= self.flushInterval
+            )
+        if due:
+            self.flush()
+
+    def flush(self) -> int:
+        """Writes buffered samples with a single unordered bulk write
+
+        Returns:
+            int: number of samples written
+        """
+        with self._lock:
+            buffer, self._buffer = self._buffer, []
+            self._lastFlush = time.time()
+            BUFFERED.labels("sightings").set(0)
+        if not buffer:
+            return 0
+
+        buckets: Dict[Tuple[str, int], List[List]] = {}
+        for host, timestamp, players, ping in buffer:
+            day = int(timestamp // SECONDS_PER_DAY)
+            buckets.setdefault((host, day), []).append(
+                [round(timestamp, 1), players, ping]
+            )
+
+        requests = [
+            UpdateOne(
+                {"_id": f"{host}:{day}"},
+                {
+                    "$setOnInsert": {"host": host, "day": day, "downsampled": False},
+                    "$push": {"samples": {"$each": samples}},
+                    "$inc": {"count": len(samples)},
+                    "$min": {"first": samples[0][0]},
+                    "$max": {"last": samples[-1][0]},
+                },
+                upsert=True,
+            )
+            for (host, day), samples in buckets.items()
+        ]
+        try:
+            self.ensureIndexes()
+            MONGO_BATCH.labels("sightings").observe(len(requests))
+            with MONGO_SECONDS.labels("sightings", "bulk_write").time():
+                self.col.bulk_write(requests, ordered=False)
+        except Exception:
+            self.logger.error("Failed to write {} sightings".format(len(buffer)))
+            self.logger.error(traceback.format_exc())
+            return 0
+        return len(buffer)
+
+    def downsample(
+        self,
+        olderThanDays: int = 30,
+        resolution: int = 3600,
+        batchSize: int = 500,
+        now: Optional[float] = None,
+    ) -> int:
+        """Collapses old buckets to one averaged sample per resolution window
+
+        Args:
+            olderThanDays (int, optional): Only buckets older than this. Defaults to 30.
+            resolution (int, optional): Window size in seconds. Defaults to 3600.
+            batchSize (int, optional): Buckets rewritten per bulk write. Defaults to 500.
+
+        Returns:
+            int: number of buckets downsampled
+        """
+        cutoff = int(((now or time.time()) // SECONDS_PER_DAY) - olderThanDays)
+        cursor = self.col.find(
+            {"day": {"$lt": cutoff}, "downsampled": {"$ne": True}},
+            {"samples": 1},
+            batch_size=batchSize,
+        )
+        done = 0
+        requests = []
+        for bucket in cursor:
+            windows: Dict[int, List[List]] = {}
+            for timestamp, players, ping in bucket.get("samples") or []:
+                windows.setdefault(int(timestamp // resolution), []).append(
+                    [players, ping]
+                )
+            samples = []
+            for window, values in sorted(windows.items()):
+                players = [p for p, _ in values if p >= 0]
+                pings = [p for _, p in values if p >= 0]
+                samples.append(
+                    [
+                        float(window * resolution),
+                        round(sum(players) / len(players)) if players else -1,
+                        round(sum(pings) / len(pings)) if pings else -1,
+                    ]
+                )
+            requests.append(
+                UpdateOne(
+                    {"_id": bucket["_id"]},
+                    {
+                        "$set": {
+                            "samples": samples,
+                            "count": len(samples),
+                            "downsampled": True,
+                            "resolution": resolution,
+                        }
+                    },
+                )
+            )
+            if len(requests) >= batchSize:
+                self.col.bulk_write(requests, ordered=False)
+                done += len(requests)
+                requests = []
+        if requests:
+            self.col.bulk_write(requests, ordered=False)
+            done += len(requests)
+        self.logger.info(f"Downsampled {done} sighting buckets")
+        return done
@@ -0,0 +1,57 @@
+import re
+from typing import Dict, List
+
+from .text import renderComponent
+
+VERSION_NOISE = re.compile(r"§\S*[|]*\s*")
+
+
+def flattenMotd(rawMotd) -> str:
+    """Joins a status description into plain text, without color codes
+
+    Args:
+        rawMotd (str | dict | list): the description field of a status response
+
+    Returns:
+        str: the text of the component and all of its nested extras
+    """
+    return renderComponent(rawMotd)[0]
+
+
+def dedupePlayers(players: List[dict]) -> List[dict]:
+    """Drops repeated players, keeping the last occurrence of each"""
+    return [
+        player for n, player in enumerate(players) if player not in players[n + 1 :]
+    ]
+
+
+def parseStatus(raw: dict, Text) -> Dict:
+    """Normalizes a raw status response into server document fields
+
+    No network calls are made, so this is what the corpus replay benchmark
+    measures. Player sample names still have to be resolved against Mojang.
+
+    Args:
+        raw (dict): the status JSON as sent by the server
+        Text (Text): the text class, for cFilter
+
+    Returns:
+        dict: lastOnline* fields, favicon and the raw sample names
+    """
+    version = raw.get("version") or {}
+    players = raw.get("players") or {}
+    return {
+        "lastOnlinePlayers": players.get("online", 0),
+        "lastOnlinePlayersMax": players.get("max", 0),
+        "lastOnlineVersion": Text.cFilter(
+            VERSION_NOISE.sub("", str(version.get("name", "")))
+        ),
+        "lastOnlineVersionProtocol": Text.cFilter(str(version.get("protocol", ""))),
+        "lastOnlineDescription": Text.cFilter(flattenMotd(raw.get("description", ""))),
+        "favicon": raw.get("favicon"),
+        "sample": [
+            str(player.get("name", ""))
+            for player in players.get("sample") or []
+            if isinstance(player, dict)
+        ],
+    }
@@ -0,0 +1,352 @@
+import concurrent.futures
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from quarry.net.auth import OfflineProfile
+from quarry.net.client import ClientFactory, ClientProtocol
+from twisted.internet import defer, reactor
+
+from metrics import PROBE_SECONDS, TABLIST_SESSIONS
+
+from .events import Kicked, SessionEnded
+
+# Outcomes a session resolves to
+OK = "ok"
+KICKED = "kicked"
+ONLINE_MODE = "online_mode"
+TIMEOUT = "timeout"
+ERROR = "error"
+
+DEFAULT_USERNAME = "pilot1782"
+DEFAULT_TIMEOUT = 5.0
+DEFAULT_CONCURRENCY = 256
+
+_reactorLock = threading.Lock()
+_reactorThread = None
+
+
+def tabListResult(
+    host: str,
+    port: int,
+    outcome: str,
+    players: Optional[List[str]] = None,
+    reason: str = "",
+) -> Dict:
+    """The schema every session resolves to
+
+    players is only filled for OK, lower-cased and without our own name.
+    """
+    return {
+        "host": host,
+        "port": int(port),
+        "outcome": outcome,
+        "players": players or [],
+        "reason": reason,
+    }
+
+
+def _chatText(message) -> str:
+    try:
+        return message.to_string()
+    except Exception:
+        return str(message)
+
+
+def startReactor() -> None:
+    """Runs the Twisted reactor in a daemon thread, once per process
+
+    Twisted reactors cannot be restarted, so every session shares this one.
+    """
+    global _reactorThread
+    with _reactorLock:
+        if reactor.running or (
+            _reactorThread is not None and _reactorThread.is_alive()
+        ):
+            return
+        _reactorThread = threading.Thread(
+            target=reactor.run,
+            kwargs={"installSignalHandlers": False},
+            name="tablist-reactor",
+            daemon=True,
+        )
+        _reactorThread.start()
+
+
+class PlayerListProtocol(ClientProtocol):
+    """Joins with an offline profile and reads the tab list
+
+    Every way a session can end is reported to the factory, which resolves
+    the session once and ignores whatever follows.
+    """
+
+    def setup(self):
+        self.players = {}
+
+    def names(self) -> List[str]:
+        own = self.factory.profile.display_name.lower()
+        return [
+            name
+            for name in dict.fromkeys(
+                str(data["name"]).lower() for data in self.players.values()
+            )
+            if name != own
+        ]
+
+    def packet_player_list_item(self, buff):
+        # 1.7.x
+        if self.protocol_version <= 5:
+            p_player_name = buff.unpack_string()
+            p_online = buff.unpack("?")
+            p_ping = buff.unpack("h")
+
+            if p_online:
+                self.players[p_player_name] = {"name": p_player_name, "ping": p_ping}
+            elif p_player_name in self.players:
+                del self.players[p_player_name]
+        # 1.8.x
+        else:
+            p_action = buff.unpack_varint()
+            p_count = buff.unpack_varint()
+            for i in range(p_count):
+                p_uuid = buff.unpack_uuid()
+                if p_action == 0:  # ADD_PLAYER
+                    p_player_name = buff.unpack_string()
+                    p_properties_count = buff.unpack_varint()
+                    for j in range(p_properties_count):
+                        buff.unpack_string()
+                        buff.unpack_string()
+                        if buff.unpack("?"):
+                            buff.unpack_string()
+                    p_gamemode = buff.unpack_varint()
+                    p_ping = buff.unpack_varint()
+                    if buff.unpack("?"):
+                        buff.unpack_chat()
+
+                    # 1.19+
+                    if self.protocol_version >= 759 and buff.unpack("?"):
+                        buff.unpack("Q")
+                        buff.read(buff.unpack_varint())
+                        buff.read(buff.unpack_varint())
+
+                    self.players[p_uuid] = {
+                        "name": p_player_name,
+                        "gamemode": p_gamemode,
+                        "ping": p_ping,
+                    }
+                elif p_action == 1:  # UPDATE_GAMEMODE
+                    buff.unpack_varint()
+                elif p_action == 2:  # UPDATE_LATENCY
+                    buff.unpack_varint()
+                elif p_action == 3:  # UPDATE_DISPLAY_NAME
+                    if buff.unpack("?"):
+                        buff.unpack_chat()
+                elif p_action == 4:  # REMOVE_PLAYER
+                    self.players.pop(p_uuid, None)
+
+    def packet_chunk_data(self, buff):
+        # the tab list is sent before the first chunk
+        buff.discard()
+        self.factory.resolve(OK, self.names())
+        self.close()
+
+    def packet_login_encryption_request(self, buff):
+        buff.discard()
+        self.factory.resolve(ONLINE_MODE, reason="encryption requested")
+        self.close()
+
+    def packet_login_disconnect(self, buff):
+        try:
+            reason = _chatText(buff.unpack_chat())
+        except Exception:
+            reason = ""
+        buff.discard()
+        self.factory.resolve(KICKED, reason=reason)
+        self.close()
+
+    packet_disconnect = packet_login_disconnect
+
+    def protocol_error(self, err):
+        self.factory.resolve(ERROR, reason=str(err))
+        self.close()
+
+    def connection_lost(self, reason=None):
+        super().connection_lost(reason)
+        if self.in_game:
+            self.factory.resolve(OK, self.names())
+        else:
+            self.factory.resolve(ERROR, reason="connection closed before login")
+
+
+class PlayerListFactory(ClientFactory):
+    """One session: connects, and fires outcome exactly once"""
+
+    protocol = PlayerListProtocol
+    log_level = logging.WARNING
+
+    def __init__(self, host: str, port: int, profile, timeout: float):
+        super().__init__(profile)
+        self.host = host
+        self.port = int(port)
+        self.connection_timeout = timeout
+        self.outcome = defer.Deferred()
+        self.session = None
+
+    def buildProtocol(self, addr):
+        self.session = super().buildProtocol(addr)
+        return self.session
+
+    def resolve(
+        self, outcome: str, players: Optional[List[str]] = None, reason: str = ""
+    ) -> None:
+        if not self.outcome.called:
+            self.outcome.callback(
+                tabListResult(self.host, self.port, outcome, players, reason)
+            )
+
+    def expire(self) -> None:
+        """Ends a session that ran out of time, keeping a tab list if we joined"""
+        session = self.session
+        if session is not None and session.in_game:
+            self.resolve(OK, session.names())
+        else:
+            self.resolve(TIMEOUT)
+        if session is not None:
+            session.close()
+
+    def clientConnectionFailed(self, connector, reason):
+        self.resolve(ERROR, reason=reason.getErrorMessage())
+
+    def clientConnectionLost(self, connector, reason):
+        pass
+
+
+class TabListService:
+    """Collects offline-mode tab lists over one long-lived reactor
+
+    Sessions are started from any thread and run side by side on the shared
+    reactor thread, at most concurrency of them at once. Each resolves its own
+    future with a tabListResult, so nothing is shared between hosts and no
+    log has to be read back to learn how a session ended. With a bus, the
+    outcome is also published as Kicked and SessionEnded events keyed by
+    (host, port, username).
+    """
+
+    def __init__(
+        self,
+        logger,
+        username: str = DEFAULT_USERNAME,
+        timeout: float = DEFAULT_TIMEOUT,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        events=None,
+    ):
+        """Initializes the TabListService class
+
+        Args:
+            logger (Logger): The logger class
+            username (str, optional): Offline name to join with. Defaults to "pilot1782".
+            timeout (float, optional): Seconds per session. Defaults to 5.0.
+            concurrency (int, optional): Sessions open at once. Defaults to 256.
+            events (EventBus, optional): Bus session outcomes are published to. Defaults to None.
+        """
+        self.logger = logger
+        self.username = username
+        self.timeout = timeout
+        self.slots = defer.DeferredSemaphore(concurrency)
+        self.events = events
+
+    def submit(
+        self, host: str, port=25565, protocol: Optional[int] = None
+    ) -> concurrent.futures.Future:
+        """Starts a session for host:port
+
+        Args:
+            host (str): the server address
+            port (int, optional): the server port. Defaults to 25565.
+            protocol (int, optional): protocol version from the status, skips
+                quarry's own version ping. Defaults to None.
+
+        Returns:
+            concurrent.futures.Future: resolves to a tabListResult
+        """
+        future = concurrent.futures.Future()
+        if protocol is not None and protocol not in ClientFactory.minecraft_versions:
+            future.set_result(
+                tabListResult(
+                    host, port, ERROR, reason=f"unsupported protocol {protocol}"
+                )
+            )
+            return future
+        TABLIST_SESSIONS.inc()
+        future.add_done_callback(lambda _: TABLIST_SESSIONS.dec())
+        startReactor()
+        reactor.callFromThread(self._start, host, int(port), protocol, future)
+        return future
+
+    def fetch(self, host: str, port=25565, protocol: Optional[int] = None) -> Dict:
+        """Runs a session for host:port and waits for its result, see submit"""
+        return self._result(self.submit(host, port, protocol), host, port)
+
+    def fetchMany(
+        self, targets: Iterable[Tuple[str, int]]
+    ) -> Dict[Tuple[str, int], Dict]:
+        """Runs sessions for many (host, port) pairs in parallel
+
+        Returns:
+            dict: tabListResult per (host, port)
+        """
+        futures = {(host, int(port)): self.submit(host, port) for host, port in targets}
+        return {
+            target: self._result(future, *target) for target, future in futures.items()
+        }
+
+    def _result(self, future: concurrent.futures.Future, host: str, port) -> Dict:
+        # queued sessions wait for a slot, the reactor enforces each deadline
+        try:
+            return future.result()
+        except Exception as exc:
+            self.logger.error(f"Tab list session for {host}:{port} failed: {exc}")
+            return tabListResult(host, port, ERROR, reason=str(exc))
+
+    def _start(self, host: str, port: int, protocol: Optional[int], future) -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        deferred = self.slots.run(self._session, host, port, protocol)
+        deferred.addErrback(
+            lambda failure: tabListResult(
+                host, port, ERROR, reason=failure.getErrorMessage()
+            )
+        )
+        deferred.addCallback(future.set_result)
+
+    def _session(self, host: str, port: int, protocol: Optional[int]) -> defer.Deferred:
+        factory = PlayerListFactory(
+            host, port, OfflineProfile(self.username), self.timeout
+        )
+        if protocol is not None:
+            factory.force_protocol_version = protocol
+        timer = reactor.callLater(self.timeout, factory.expire)
+        started = time.perf_counter()
+
+        def done(result):
+            if timer.active():
+                timer.cancel()
+            PROBE_SECONDS.labels("tablist").observe(time.perf_counter() - started)
+            self.logger.debug(
+                "Tab list {}:{} {} {}".format(
+                    host, port, result["outcome"], result["reason"]
+                ).strip()
+            )
+            if self.events is not None:
+                key = (host, port, self.username)
+                if result["outcome"] == KICKED:
+                    self.events.publish(Kicked(key, result["reason"]))
+                self.events.publish(
+                    SessionEnded(key, result["reason"] or result["outcome"])
+                )
+            return result
+
+        factory.outcome.addCallback(done)
+        factory.connect(host, port)
+        return factory.outcome
@@ -0,0 +1,164 @@
+import datetime
+import random
+import socket
+import threading
+import traceback
+from typing import List
+
+import pymongo
+
+from .probe import statusRequest
+
+# masscan sweeps 25565-25577; hosts answering on most of them are suspicious
+DEFAULT_PORT_THRESHOLD = 8
+DEFAULT_TTL_DAYS = 7
+DEFAULT_SAMPLE_RATE = 0.05
+CONNECT_TIMEOUT = 1.0
+# ports outside the sweep used to see if the host accepts any connection
+CONTROL_PORT_RANGE = (40000, 60000)
+
+
+class Tarpits:
+    """Flags hosts that accept connections on every port before they are probed
+
+    Tarpits and SYN-cookie middleboxes show up in masscan with (nearly) every
+    swept port open, and each port then costs a full status timeout. A host is
+    only tested when it has at least portThreshold open ports:
+
+    - it accepts a connection on a random port outside the sweep, or
+    - one of its open ports takes the connection but never answers a status
+      request.
+
+    Flagged hosts are stored in the tarpits collection with a TTL index, so
+    they are skipped (or sampled on a single port) until they expire.
+    """
+
+    def __init__(
+        self,
+        col: pymongo.collection.Collection,
+        logger,
+        portThreshold: int = DEFAULT_PORT_THRESHOLD,
+        ttlDays: float = DEFAULT_TTL_DAYS,
+        sampleRate: float = DEFAULT_SAMPLE_RATE,
+    ):
+        """Initializes the Tarpits class
+
+        Args:
+            col (pymongo.collection.Collection): The tarpits collection
+            logger (Logger): The logger class
+            portThreshold (int, optional): Open ports that trigger the test. Defaults to 8.
+            ttlDays (float, optional): Days a flagged host is skipped. Defaults to 7.
+            sampleRate (float, optional): Chance a flagged host still gets one port probed. Defaults to 0.05.
+        """
+        self.col = col
+        self.logger = logger
+        self.portThreshold = portThreshold
+        self.ttlDays = ttlDays
+        self.sampleRate = sampleRate
+
+        self._lock = threading.Lock()
+        self._flagged = set()
+        self.stats = {"tested": 0, "flagged": 0, "skipped": 0, "sampled": 0}
+
+    def load(self) -> None:
+        """Creates the TTL index and loads unexpired flagged hosts"""
+        try:
+            self.col.create_index("expiresAt", expireAfterSeconds=0)
+            now = datetime.datetime.now(datetime.timezone.utc)
+            flagged = {
+                doc["_id"]
+                for doc in self.col.find({"expiresAt": {"$gt": now}}, {"_id": 1})
+            }
+        except Exception:
+            self.logger.error(traceback.format_exc())
+            return
+        with self._lock:
+            self._flagged |= flagged
+        self.logger.info(f"Loaded {len(flagged)} flagged tarpit hosts")
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _acceptsAnyPort(self, ip: str) -> bool:
+        port = random.randint(*CONTROL_PORT_RANGE)
+        try:
+            with socket.create_connection((ip, port), timeout=CONNECT_TIMEOUT):
+                return True
+        except OSError:
+            return False
+
+    def _answersStatus(self, ip: str, port: int) -> bool:
+        try:
+            with socket.create_connection((ip, port), timeout=CONNECT_TIMEOUT) as sock:
+                sock.settimeout(CONNECT_TIMEOUT)
+                sock.sendall(statusRequest(ip, port))
+                return bool(sock.recv(1))
+        except OSError:
+            return False
+
+    def _flag(self, ip: str, reason: str, ports: List[int]) -> None:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        with self._lock:
+            self._flagged.add(ip)
+            self.stats["flagged"] += 1
+        self.logger.info(
+            f"{ip} flagged as tarpit ({reason}, {len(ports)} ports)", sample=True
+        )
+        try:
+            self.col.update_one(
+                {"_id": ip},
+                {
+                    "$set": {
+                        "reason": reason,
+                        "ports": ports,
+                        "flaggedAt": now,
+                        "expiresAt": now + datetime.timedelta(days=self.ttlDays),
+                    },
+                    "$inc": {"count": 1},
+                },
+                upsert=True,
+            )
+        except Exception:
+            self.logger.error(traceback.format_exc())
+
+    def isTarpit(self, ip: str, ports: List[int]) -> bool:
+        """Classifies a host from its open ports, testing it if they look suspicious
+
+        Args:
+            ip (str): the host ip
+            ports (List[int]): the open ports masscan reported
+
+        Returns:
+            bool: True if the host is (or was recently) flagged
+        """
+        if ip in self._flagged:
+            return True
+        if len(ports) < self.portThreshold:
+            return False
+        self._count("tested")
+        if self._acceptsAnyPort(ip):
+            self._flag(ip, "accepts-any-port", ports)
+            return True
+        if not self._answersStatus(ip, random.choice(ports)):
+            self._flag(ip, "silent", ports)
+            return True
+        return False
+
+    def filterPorts(self, ip: str, ports: List[int]) -> List[int]:
+        """Returns the ports of ip worth probing
+
+        Args:
+            ip (str): the host ip
+            ports (List[int]): the open ports masscan reported
+
+        Returns:
+            List[int]: every port for normal hosts, one sampled port or none for tarpits
+        """
+        if not self.isTarpit(ip, ports):
+            return ports
+        if ports and random.random() < self.sampleRate:
+            self._count("sampled")
+            return [random.choice(ports)]
+        self._count("skipped")
+        return []
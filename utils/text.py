@@ -1,8 +1,212 @@
 import datetime
 import re
 import socket
+import threading
+import time
 import traceback
 import unicodedata
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Iterable, List, Tuple
+
+from metrics import DNS_LOOKUPS, DNS_SECONDS
+
+ESC = "\u001b"
+# cFilter strips a § and every code character after it
+CFILTER_CODES = re.compile(r"§[0-9a-fk-or]*")
+CFILTER_TABLE = str.maketrans({"|": None})
+# renderers read § plus exactly one code character
+LEGACY_CODE = re.compile("§(.)", re.DOTALL)
+MAX_COMPONENT_DEPTH = 64
+# resolveHost and resolveIP answers, failures are kept for less time
+DNS_CACHE_SIZE = 100000
+DNS_CACHE_TTL = 3600
+DNS_NEGATIVE_TTL = 300
+
+COLOR_NAMES = {
+    "black": "0",
+    "dark_blue": "1",
+    "dark_green": "2",
+    "dark_aqua": "3",
+    "dark_red": "4",
+    "dark_purple": "5",
+    "gold": "6",
+    "gray": "7",
+    "dark_gray": "8",
+    "blue": "9",
+    "green": "a",
+    "aqua": "b",
+    "red": "c",
+    "light_purple": "d",
+    "yellow": "e",
+    "white": "f",
+}
+# 30: Gray   <- §0 §7 §8
+# 31: Red    <- §4 §c
+# 32: Green  <- §2 §a
+# 33: Yellow <- §6 §e
+# 34: Blue   <- §1 §9
+# 35: Pink   <- §5 §d
+# 36: Cyan   <- §3 §b
+# 37: White  <- §f
+ANSI_COLORS = {
+    "0": ESC + "[30m",
+    "1": ESC + "[34m",
+    "2": ESC + "[32m",
+    "3": ESC + "[36m",
+    "4": ESC + "[31m",
+    "5": ESC + "[35m",
+    "6": ESC + "[33m",
+    "7": ESC + "[30m",
+    "8": ESC + "[30m",
+    "9": ESC + "[34m",
+    "a": ESC + "[32m",
+    "b": ESC + "[36m",
+    "c": ESC + "[31m",
+    "d": ESC + "[35m",
+    "e": ESC + "[33m",
+    "f": ESC + "[37m",
+}
+ANSI_RESET = ESC + "[0m"
+PALETTE = {
+    "0": (0, 0, 0),
+    "1": (0, 0, 170),
+    "2": (0, 170, 0),
+    "3": (0, 170, 170),
+    "4": (170, 0, 0),
+    "5": (170, 0, 170),
+    "6": (255, 170, 0),
+    "7": (170, 170, 170),
+    "8": (85, 85, 85),
+    "9": (85, 85, 255),
+    "a": (85, 255, 85),
+    "b": (85, 255, 255),
+    "c": (255, 85, 85),
+    "d": (255, 85, 255),
+    "e": (255, 255, 85),
+    "f": (255, 255, 255),
+}
+
+
+@lru_cache(maxsize=1024)
+def _nearestColor(hexColor: str):
+    try:
+        value = int(hexColor[1:], 16)
+    except ValueError:
+        return None
+    rgb = (value >> 16 & 255, value >> 8 & 255, value & 255)
+    return min(
+        PALETTE,
+        key=lambda code: sum((a - b) ** 2 for a, b in zip(PALETTE[code], rgb)),
+    )
+
+
+def _componentColor(value, inherited):
+    if not value:
+        return inherited
+    value = str(value).lower()
+    if value in COLOR_NAMES:
+        return COLOR_NAMES[value]
+    if value.startswith("#") and len(value) == 7:
+        return _nearestColor(value) or inherited
+    if value == "reset":
+        return None
+    return inherited
+
+
+class _Renderer:
+    """Walks a chat component once, collecting plain and ANSI text side by side"""
+
+    __slots__ = ("plain", "ansi", "color")
+
+    def __init__(self):
+        self.plain = []
+        self.ansi = []
+        self.color = None
+
+    def _emit(self, text: str, color) -> None:
+        if not text:
+            return
+        if color != self.color:
+            self.ansi.append(ANSI_COLORS[color] if color else ANSI_RESET)
+            self.color = color
+        self.plain.append(text)
+        self.ansi.append(text)
+
+    def _legacy(self, text: str, color) -> None:
+        if "§" not in text:
+            self._emit(text, color)
+            return
+        base = color
+        parts = LEGACY_CODE.split(text)
+        if parts[-1].endswith("§"):
+            parts[-1] = parts[-1][:-1]
+        self._emit(parts[0], color)
+        for idx in range(1, len(parts), 2):
+            code = parts[idx].lower()
+            if code in ANSI_COLORS:
+                color = code
+            elif code == "r":
+                color = base
+            self._emit(parts[idx + 1], color)
+
+    def walk(self, component, color=None, depth: int = 0) -> None:
+        if depth > MAX_COMPONENT_DEPTH:
+            return
+        if isinstance(component, str):
+            self._legacy(component, color)
+        elif isinstance(component, dict):
+            color = _componentColor(component.get("color"), color)
+            text = component.get("text")
+            if text is None:
+                text = component.get("fallback") or component.get("translate")
+            if text is not None:
+                self._legacy(str(text), color)
+            extra = component.get("extra")
+            if isinstance(extra, list):
+                for child in extra:
+                    self.walk(child, color, depth + 1)
+        elif isinstance(component, list):
+            for child in component:
+                self.walk(child, color, depth + 1)
+        elif component is not None:
+            self._legacy(str(component), color)
+
+    def result(self) -> Tuple[str, str, str]:
+        plain = "".join(self.plain)
+        ansi = "".join(self.ansi)
+        markdown = ansi
+        if not markdown.isascii():
+            # compatibility forms keep fancy fonts readable in Discord
+            markdown = unicodedata.normalize("NFKD", markdown)
+        return plain, ansi, "```ansi\n" + markdown + "\n```"
+
+
+def renderComponent(component) -> Tuple[str, str, str]:
+    """Renders a chat component (str with § codes, dict or list) in one pass
+
+    Nested extra lists are followed to any depth, children inherit their
+    parent's color and § codes inside text apply until the next code.
+
+    Args:
+        component (str | dict | list): a description or any other chat component
+
+    Returns:
+        Tuple[str, str, str]: plain text, ANSI colored text, markdown ansi block
+    """
+    renderer = _Renderer()
+    renderer.walk(component)
+    return renderer.result()
+
+
+def renderComponents(components: Iterable) -> List[Tuple[str, str, str]]:
+    """renderComponent over many descriptions, e.g. a page of servers"""
+    results = []
+    for component in components:
+        renderer = _Renderer()
+        renderer.walk(component)
+        results.append(renderer.result())
+    return results
 
 
 class Text:
@@ -13,6 +217,58 @@ class Text:
             logger (Logger): The logger class
         """
         self.logger = logger
+        # (kind, name) -> (expires, answer, not found error type and args)
+        self._dnsCache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._dnsLock = threading.Lock()
+
+    def _lookup(self, kind: str, name: str, resolve, notFound):
+        """Calls resolve(name) through the DNS cache
+
+        Answers are kept for DNS_CACHE_TTL. notFound errors are answers too,
+        kept for DNS_NEGATIVE_TTL and raised again on a hit, as a new exception
+        so threads never share one traceback. Anything else is raised and not
+        cached.
+        """
+        key = (kind, name)
+        now = time.monotonic()
+        with self._dnsLock:
+            entry = self._dnsCache.get(key)
+            if entry is not None and entry[0] > now:
+                self._dnsCache.move_to_end(key)
+            else:
+                entry = None
+        if entry is not None:
+            DNS_LOOKUPS.labels(kind, "hit").inc()
+            if entry[2] is not None:
+                errorType, args = entry[2]
+                raise errorType(*args)
+            return entry[1]
+
+        answer, error = None, None
+        started = time.perf_counter()
+        try:
+            answer, ttl = resolve(name), DNS_CACHE_TTL
+        except notFound as exc:
+            error, ttl = exc, DNS_NEGATIVE_TTL
+        except Exception:
+            DNS_LOOKUPS.labels(kind, "error").inc()
+            raise
+        finally:
+            DNS_SECONDS.labels(kind).observe(time.perf_counter() - started)
+
+        DNS_LOOKUPS.labels(kind, "miss").inc()
+        with self._dnsLock:
+            self._dnsCache[key] = (
+                now + ttl,
+                answer,
+                (type(error), error.args) if error is not None else None,
+            )
+            self._dnsCache.move_to_end(key)
+            while len(self._dnsCache) > DNS_CACHE_SIZE:
+                self._dnsCache.popitem(last=False)
+        if error is not None:
+            raise error
+        return answer
 
     def cFilter(self, text: str, trim: bool = True) -> str:
         """Removes all color bits from a string
@@ -24,101 +280,44 @@ class Text:
         Returns:
             [str]: The string without color bits
         """
-        # remove all color bits
-        text = re.sub(r"§[0-9a-fk-or]*", "", text).replace("|", "")
+        if "§" in text:
+            text = CFILTER_CODES.sub("", text)
+        text = text.translate(CFILTER_TABLE)
         if trim:
             text = text.strip()
-
-        text = text.replace("@", "@ ")  # fix @ mentions
+        if "@" in text:
+            text = text.replace("@", "@ ")  # fix @ mentions
         return text
 
-    def markFilter(self, text: str) -> str:
+    def render(self, component) -> Tuple[str, str, str]:
+        """Renders a chat component as plain, ANSI and markdown text, see renderComponent"""
+        return renderComponent(component)
+
+    def renderMany(self, components: Iterable) -> List[Tuple[str, str, str]]:
+        """Renders many chat components in one call, see renderComponents"""
+        return renderComponents(components)
+
+    def markFilter(self, text) -> str:
         """Changes color tags to those that work with markdown
 
         Args:
-            text (str): text to change
+            text (str | dict): text or chat component to change
 
         Returns:
-            str: text with markdown color tags
+            str: text in an ansi code block
         """
+        return renderComponent(text)[2]
 
-        # color char prefix \u001b[{color}m
-        # color #s
-        # 30: Gray   <- §7
-        # 31: Red    <- §c
-        # 32: Green  <- §a
-        # 33: Yellow <- §e
-        # 34: Blue   <- §9
-        # 35: Pink   <- §d
-        # 36: Cyan   <- §b
-        # 37: White  <- §f
-
-        # use the ansi color codes
-        text = self.colorAnsi(text)
-
-        text = "```ansi\n" + text + "\n```"
-
-        # loop through and escape all unicode chars that are not \u001b or \n
-        text = "".join(
-            [
-                char
-                if char == "\u001b" or char == "\n"
-                else unicodedata.normalize("NFKD", char)
-                for char in text
-            ]
-        )
-
-        return text
-
-    def colorAnsi(self, text: str) -> str:
+    def colorAnsi(self, text) -> str:
         """Changes color tags to those that work with ansi code blocks
 
-        Args:​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​​
-            text (str): text to change
+        Args:
+            text (str | dict): text or chat component to change
 
         Returns:
             str: text with ansi color tags
         """
-        # 30: Gray   <- §7
-        # 31: Red    <- §c
-        # 32: Green  <- §a
-        # 33: Yellow <- §e
-        # 34: Blue   <- §9
-        # 35: Pink   <- §d
-        # 36: Cyan   <- §b
-        # 37: White  <- §f
-        colorChar = ""  # \u001b
-        ansi = {
-            "§0": colorChar + "[30m",
-            "§1": colorChar + "[34m",
-            "§2": colorChar + "[32m",
-            "§3": colorChar + "[36m",
-            "§4": colorChar + "[31m",
-            "§5": colorChar + "[35m",
-            "§6": colorChar + "[33m",
-            "§7": colorChar + "[30m",
-            "§9": colorChar + "[34m",
-            "§a": colorChar + "[32m",
-            "§b": colorChar + "[36m",
-            "§c": colorChar + "[31m",
-            "§d": colorChar + "[35m",
-            "§e": colorChar + "[33m",
-            "§f": colorChar + "[37m",
-            "§l": "",  # text styles
-            "§k": "",
-            "§m": "",
-            "§n": "",
-            "§o": "",
-            "§r": "",
-        }
-
-        for color in ansi:
-            text = text.replace(color, ansi[color])
-
-        # remove remaining color codes
-        text = re.sub(r"§[0-9a-fk-or]*", "", text)
-
-        return text
+        return renderComponent(text)[1]
 
     def colorMine(self, color: str) -> str:
         # given a color like 'yellow' return the color code like '§e'
@@ -161,7 +360,7 @@ class Text:
             return ip
 
         try:
-            host = socket.gethostbyaddr(ip)
+            host = self._lookup("reverse", ip, socket.gethostbyaddr, socket.herror)
 
             # test if the host is online
             if host[0] == "":
@@ -183,7 +382,7 @@ class Text:
             str: IP address
         """
         try:
-            ip = socket.gethostbyname(host)
+            ip = self._lookup("forward", host, socket.gethostbyname, socket.gaierror)
             return ip
         except socket.gaierror as exc:
             self.logger.info(f"Hostname not found: {exc}")